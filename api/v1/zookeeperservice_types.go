@@ -26,6 +26,7 @@ type ZooKeeper struct {
 	CustomLabels         map[string]string       `json:"customLabels,omitempty"`
 	Diagnostics          Diagnostics             `json:"diagnostics,omitempty"`
 	AuditEnabled         bool                    `json:"auditEnabled,omitempty"`
+	LogShipping          LogShipping             `json:"logShipping,omitempty"`
 }
 
 // Storage defines volumes of ZooKeeper
@@ -52,6 +53,13 @@ type SnapshotStorage struct {
 	NfsPath string `json:"nfsPath,omitempty"`
 }
 
+// LogShipping defines sidecar that ships transaction logs of ZooKeeper to the snapshot storage
+type LogShipping struct {
+	Enabled     bool                    `json:"enabled,omitempty"`
+	DockerImage string                  `json:"dockerImage,omitempty"`
+	Resources   v1.ResourceRequirements `json:"resources,omitempty"`
+}
+
 // Ssl defines Ssl ZooKeeper settings
 type Ssl struct {
 	CipherSuites            []string `json:"cipherSuites,omitempty"`
@@ -144,6 +144,22 @@ func (in *IntegrationTests) DeepCopy() *IntegrationTests {
 	return out
 }
 
+// DeepCopyInto is an autogenerated deepcopy function, copying the receiver, writing into out. in must be non-nil.
+func (in *LogShipping) DeepCopyInto(out *LogShipping) {
+	*out = *in
+	in.Resources.DeepCopyInto(&out.Resources)
+}
+
+// DeepCopy is an autogenerated deepcopy function, copying the receiver, creating a new LogShipping.
+func (in *LogShipping) DeepCopy() *LogShipping {
+	if in == nil {
+		return nil
+	}
+	out := new(LogShipping)
+	in.DeepCopyInto(out)
+	return out
+}
+
 // DeepCopyInto is an autogenerated deepcopy function, copying the receiver, writing into out. in must be non-nil.
 func (in *Monitoring) DeepCopyInto(out *Monitoring) {
 	*out = *in
@@ -390,6 +406,7 @@ func (in *ZooKeeper) DeepCopyInto(out *ZooKeeper) {
 		}
 	}
 	out.Diagnostics = in.Diagnostics
+	in.LogShipping.DeepCopyInto(&out.LogShipping)
 }
 
 // DeepCopy is an autogenerated deepcopy function, copying the receiver, creating a new ZooKeeper.
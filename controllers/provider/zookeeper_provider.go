@@ -166,7 +166,8 @@ func (zrp ZooKeeperResourceProvider) NewServerDeploymentForCR(serverId int) *app
 		dataVolumeSource = corev1.VolumeSource{EmptyDir: &corev1.EmptyDirVolumeSource{}}
 	}
 	var backupVolumeSource corev1.VolumeSource
-	if zrp.spec.SnapshotStorage.PersistentVolumeType == "" || zrp.spec.SnapshotStorage.PersistentVolumeType == "standalone" {
+	sharedSnapshotStorage := zrp.spec.SnapshotStorage.PersistentVolumeType != "" && zrp.spec.SnapshotStorage.PersistentVolumeType != "standalone"
+	if !sharedSnapshotStorage {
 		backupVolumeSource = corev1.VolumeSource{
 			EmptyDir: &corev1.EmptyDirVolumeSource{},
 		}
@@ -261,6 +262,40 @@ func (zrp ZooKeeperResourceProvider) NewServerDeploymentForCR(serverId int) *app
 		volumeMounts = append(volumeMounts, corev1.VolumeMount{Name: "ssl-certs", MountPath: "/opt/zookeeper/tls"})
 	}
 
+	containers := []corev1.Container{
+		{
+			Name:    "zookeeper",
+			Command: zrp.getCommand(),
+			Args:    zrp.getArgs(),
+			Image:   zrp.spec.DockerImage,
+			Ports: []corev1.ContainerPort{
+				{ContainerPort: 2181, Protocol: corev1.ProtocolTCP},
+				{ContainerPort: 2182, Protocol: corev1.ProtocolTCP},
+				{ContainerPort: 2888, Protocol: corev1.ProtocolTCP},
+				{ContainerPort: 3888, Protocol: corev1.ProtocolTCP},
+				{ContainerPort: zrp.spec.JolokiaPort, Protocol: corev1.ProtocolTCP},
+				{ContainerPort: 8080, Protocol: corev1.ProtocolTCP},
+			},
+			LivenessProbe:   &livenessProbe,
+			ReadinessProbe:  &readinessProbe,
+			Env:             buildEnvs(envVars, zrp.spec.EnvironmentVariables, zrp.logger),
+			Resources:       zrp.spec.Resources,
+			VolumeMounts:    volumeMounts,
+			ImagePullPolicy: corev1.PullAlways,
+			SecurityContext: getDefaultContainerSecurityContext(),
+		},
+	}
+
+	// The transactional archive has one writer, so logs are shipped from the first server only.
+	// Logs can be shipped to a persistent volume shared with the backup daemon only.
+	if zrp.spec.LogShipping.Enabled && serverId == 1 {
+		if sharedSnapshotStorage {
+			containers = append(containers, zrp.getLogShippingContainer())
+		} else {
+			zrp.logger.Info("Transaction log shipping requires snapshot storage on a shared persistent volume, it is skipped")
+		}
+	}
+
 	serverDeployment := &appsv1.Deployment{
 		ObjectMeta: metav1.ObjectMeta{
 			Name:      deploymentName,
@@ -274,31 +309,9 @@ func (zrp ZooKeeperResourceProvider) NewServerDeploymentForCR(serverId int) *app
 			Template: corev1.PodTemplateSpec{
 				ObjectMeta: metav1.ObjectMeta{Labels: zooKeeperCustomLabels},
 				Spec: corev1.PodSpec{
-					Volumes:        volumes,
-					InitContainers: zrp.getInitContainers(),
-					Containers: []corev1.Container{
-						{
-							Name:    "zookeeper",
-							Command: zrp.getCommand(),
-							Args:    zrp.getArgs(),
-							Image:   zrp.spec.DockerImage,
-							Ports: []corev1.ContainerPort{
-								{ContainerPort: 2181, Protocol: corev1.ProtocolTCP},
-								{ContainerPort: 2182, Protocol: corev1.ProtocolTCP},
-								{ContainerPort: 2888, Protocol: corev1.ProtocolTCP},
-								{ContainerPort: 3888, Protocol: corev1.ProtocolTCP},
-								{ContainerPort: zrp.spec.JolokiaPort, Protocol: corev1.ProtocolTCP},
-								{ContainerPort: 8080, Protocol: corev1.ProtocolTCP},
-							},
-							LivenessProbe:   &livenessProbe,
-							ReadinessProbe:  &readinessProbe,
-							Env:             buildEnvs(envVars, zrp.spec.EnvironmentVariables, zrp.logger),
-							Resources:       zrp.spec.Resources,
-							VolumeMounts:    volumeMounts,
-							ImagePullPolicy: corev1.PullAlways,
-							SecurityContext: getDefaultContainerSecurityContext(),
-						},
-					},
+					Volumes:            volumes,
+					InitContainers:     zrp.getInitContainers(),
+					Containers:         containers,
 					SecurityContext:    &zrp.spec.SecurityContext,
 					Hostname:           deploymentName,
 					ServiceAccountName: zrp.GetServiceAccountName(),
@@ -313,6 +326,29 @@ func (zrp ZooKeeperResourceProvider) NewServerDeploymentForCR(serverId int) *app
 	return serverDeployment
 }
 
+func (zrp ZooKeeperResourceProvider) getLogShippingContainer() corev1.Container {
+	return corev1.Container{
+		Name:  "log-shipper",
+		Image: zrp.spec.LogShipping.DockerImage,
+		Command: []string{
+			"python3",
+			"/opt/zookeeper/scripts/ship_transaction_logs.py",
+			"/var/opt/zookeeper/data/version-2",
+			"--storage", "/opt/zookeeper/backup-storage",
+		},
+		Ports: []corev1.ContainerPort{
+			{Name: "shipping-metrics", ContainerPort: 9102, Protocol: corev1.ProtocolTCP},
+		},
+		Resources: zrp.spec.LogShipping.Resources,
+		VolumeMounts: []corev1.VolumeMount{
+			{Name: "data", MountPath: "/var/opt/zookeeper/data", ReadOnly: true},
+			{Name: "backup-storage", MountPath: "/opt/zookeeper/backup-storage"},
+		},
+		ImagePullPolicy: corev1.PullAlways,
+		SecurityContext: getDefaultContainerSecurityContext(),
+	}
+}
+
 func (zrp ZooKeeperResourceProvider) GetZooKeeperCustomLabels(zooKeeperLabels map[string]string) map[string]string {
 	globalLabels := zrp.cr.Spec.Global.CustomLabels
 	customLabels := zrp.spec.CustomLabels
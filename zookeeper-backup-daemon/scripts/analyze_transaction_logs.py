@@ -0,0 +1,267 @@
+#!/usr/bin/python
+# Copyright 2024-2025 NetCracker Technology Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import heapq
+import json
+import logging
+from collections import Counter
+from datetime import datetime, timezone
+
+from parse_transaction_logs import Txn, TxnHeader, EOS, UnknownType, LOG_FILE_HEADER_STRUCT, SESSIONCREATE, \
+    SESSIONCLOSE, CREATE, CREATE2, CREATECONTAINER, CREATETTL, DELETE, DELETECONTAINER, SETDATA, SETACL, MULTI
+from process_zookeeper_logs import find_transaction_logs
+
+READ_BUFFER_SIZE = 1024 * 1024
+DEFAULT_CAPACITY = 1000
+DEFAULT_TOP = 20
+DEFAULT_PREFIX_DEPTH = 2
+MINUTE = 60 * 1000
+# Minutes are grouped by number of events into power of two buckets: 0, 1, 2-3, 4-7 and so on
+HISTOGRAM_BUCKETS = 64
+
+WRITE_TYPES = (CREATE, CREATE2, CREATECONTAINER, CREATETTL, DELETE, DELETECONTAINER, SETDATA, SETACL)
+DATA_TYPES = (CREATE, CREATE2, CREATECONTAINER, CREATETTL, SETDATA)
+
+
+class HeavyHitters(object):
+    """
+    Misra-Gries summary of the heaviest items of a stream, weighted or not. At most 2 * capacity counters are kept,
+    when there are more, the (capacity + 1)-th largest count is subtracted from all counters and those that drop
+    to zero are removed. A kept count underestimates the true weight of an item by at most error, and every item
+    heavier than total / capacity is kept.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self.counters = {}
+        self.total = 0
+        self.error = 0
+
+    def add(self, item, weight=1):
+        self.total += weight
+        counters = self.counters
+        counters[item] = counters.get(item, 0) + weight
+        if len(counters) > 2 * self.capacity:
+            self.prune()
+
+    def prune(self):
+        threshold = heapq.nlargest(self.capacity + 1, self.counters.values())[-1]
+        self.error += threshold
+        self.counters = {item: count - threshold for item, count in self.counters.items() if count > threshold}
+
+    def top(self, count):
+        return heapq.nlargest(count, self.counters.items(), key=lambda item: item[1])
+
+
+class MinuteRates(object):
+    """
+    Streaming aggregates of events per minute: the number of minutes, the minimum and the peak number of events
+    in a minute, and a histogram of minutes by number of events. Only the current minute is counted, so memory does
+    not depend on the time span. Events are expected in time order, an event logged before the current minute,
+    e.g. after the clock of the leader was set back, is counted in the current minute.
+    """
+
+    def __init__(self):
+        self.minute = None
+        self.count = 0
+        self.total = 0
+        self.minutes = 0
+        self.low = None
+        self.peak = 0
+        self.buckets = [0] * HISTOGRAM_BUCKETS
+
+    def add(self, time_ms):
+        minute = time_ms // MINUTE
+        if self.minute is None or minute > self.minute:
+            self.start_minute(minute)
+        else:
+            self.buckets[self.count.bit_length()] -= 1
+        self.count += 1
+        self.total += 1
+        self.peak = max(self.peak, self.count)
+        self.buckets[self.count.bit_length()] += 1
+
+    def start_minute(self, minute):
+        if self.minute is not None:
+            self.low = self.count if self.low is None else min(self.low, self.count)
+            # Minutes without events between the previous and the new one
+            idle = minute - self.minute - 1
+            if idle:
+                self.low = 0
+                self.minutes += idle
+                self.buckets[0] += idle
+        self.minute = minute
+        self.minutes += 1
+        self.count = 0
+
+    def report(self):
+        return {
+            'minutes': self.minutes,
+            'min': self.count if self.low is None else min(self.low, self.count),
+            'peak': self.peak,
+            'histogram': [{'from': (1 << bucket) >> 1, 'to': (1 << bucket) - 1, 'minutes': minutes}
+                          for bucket, minutes in enumerate(self.buckets) if minutes],
+        }
+
+
+class TransactionLogAnalytics(object):
+    """
+    Aggregates statistics of transaction logs in one pass. Memory does not depend on the number of transactions
+    and paths: heavy paths are tracked by HeavyHitters summaries, rates by MinuteRates aggregates, the rest are
+    counters per transaction type and per multi size.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, prefix_depth=DEFAULT_PREFIX_DEPTH):
+        self.prefix_depth = prefix_depth
+        self.transactions = 0
+        self.unknown = 0
+        self.first_zxid = None
+        self.last_zxid = None
+        self.first_time = None
+        self.last_time = None
+        self.types = Counter()
+        self.minutes = MinuteRates()
+        self.sessions_created = MinuteRates()
+        self.sessions_closed = MinuteRates()
+        self.multi_sizes = Counter()
+        self.writes_per_prefix = HeavyHitters(capacity)
+        self.bytes_per_path = HeavyHitters(capacity)
+        self.set_data_per_path = HeavyHitters(capacity)
+
+    def prefix(self, path):
+        parts = path.split('/', self.prefix_depth + 1)
+        return '/'.join(parts[:self.prefix_depth + 1]) or '/'
+
+    def add_header(self, header):
+        self.transactions += 1
+        if self.first_zxid is None:
+            self.first_zxid, self.first_time, self.last_time = header.zxid, header.time, header.time
+        self.last_zxid = header.zxid
+        self.first_time = min(self.first_time, header.time)
+        self.last_time = max(self.last_time, header.time)
+        self.minutes.add(header.time)
+        self.types[header.type] += 1
+        if header.type == SESSIONCREATE:
+            self.sessions_created.add(header.time)
+        elif header.type == SESSIONCLOSE:
+            self.sessions_closed.add(header.time)
+
+    def add_transaction(self, transaction):
+        header = transaction.header
+        self.add_header(header)
+        if header.type == MULTI:
+            self.multi_sizes[len(transaction.entry.txns)] += 1
+            for txn_type, entry in transaction.entry.txns:
+                self.add_write(txn_type, entry)
+        else:
+            self.add_write(header.type, transaction.entry)
+
+    def add_write(self, txn_type, entry):
+        if txn_type not in WRITE_TYPES:
+            return
+        self.writes_per_prefix.add(self.prefix(entry.path))
+        if txn_type in DATA_TYPES and entry.data:
+            self.bytes_per_path.add(entry.path, len(entry.data))
+        if txn_type == SETDATA:
+            self.set_data_per_path.add(entry.path)
+
+    def add_log(self, log_file):
+        with open(log_file, 'rb', buffering=READ_BUFFER_SIZE) as stream:
+            stream.seek(LOG_FILE_HEADER_STRUCT.size)
+            while True:
+                try:
+                    transaction = Txn(stream)
+                except EOS:
+                    break
+                except UnknownType:
+                    # The record is read before its body is decoded, so the stream is at the next record
+                    self.unknown += 1
+                    continue
+                self.add_transaction(transaction)
+
+    def report(self, top=DEFAULT_TOP):
+        minutes = max((self.last_time - self.first_time) / MINUTE, 1) if self.transactions else 1
+
+        def heavy_hitters(summary, key, value):
+            return {
+                'total': summary.total,
+                'max_error': summary.error,
+                'top': [{key: item, value: count} for item, count in summary.top(top)],
+            }
+
+        set_data = heavy_hitters(self.set_data_per_path, 'path', 'count')
+        for item in set_data['top']:
+            item['per_minute'] = round(item['count'] / minutes, 3)
+        multi_count = sum(self.multi_sizes.values())
+        return {
+            'transactions': self.transactions,
+            'unknown_transactions': self.unknown,
+            'first_zxid': hex(self.first_zxid) if self.first_zxid is not None else None,
+            'last_zxid': hex(self.last_zxid) if self.last_zxid is not None else None,
+            'start_time': format_time(self.first_time),
+            'end_time': format_time(self.last_time),
+            'types': {TxnHeader.op2type(txn_type): count for txn_type, count in self.types.most_common()},
+            'rate_per_minute': {'average': round(self.transactions / minutes, 3), **self.minutes.report()},
+            'writes_per_prefix': heavy_hitters(self.writes_per_prefix, 'prefix', 'writes'),
+            'bytes_per_path': heavy_hitters(self.bytes_per_path, 'path', 'bytes'),
+            'set_data_per_path': set_data,
+            'sessions': {
+                'created': self.sessions_created.total,
+                'closed': self.sessions_closed.total,
+                'peak_created_per_minute': self.sessions_created.peak,
+                'peak_closed_per_minute': self.sessions_closed.peak,
+            },
+            'multi': {
+                'count': multi_count,
+                'average_size': round(sum(size * count for size, count in self.multi_sizes.items()) /
+                                      multi_count, 3) if multi_count else 0,
+                'max_size': max(self.multi_sizes, default=0),
+                'sizes': {size: count for size, count in sorted(self.multi_sizes.items())},
+            },
+        }
+
+
+def format_time(time_ms):
+    if time_ms is None:
+        return None
+    return datetime.fromtimestamp(time_ms / 1000, timezone.utc).isoformat(timespec='milliseconds')
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='[%(asctime)s,%(msecs)03d][%(levelname)s] %(message)s',
+                        datefmt='%Y-%m-%dT%H:%M:%S')
+    parser = argparse.ArgumentParser(
+        description='Aggregates write load statistics of ZooKeeper transaction logs, e.g. of a transactional backup.')
+    parser.add_argument('logs', nargs='+', help='transaction log files or folders with them')
+    parser.add_argument('--top', type=int, default=DEFAULT_TOP, help='number of heaviest paths to report')
+    parser.add_argument('--capacity', type=int, default=DEFAULT_CAPACITY,
+                        help='number of paths tracked by each heavy hitters summary')
+    parser.add_argument('--prefix-depth', type=int, default=DEFAULT_PREFIX_DEPTH,
+                        help='number of path components in prefixes writes are grouped by')
+    parser.add_argument('--output', help='file to write JSON report to, it is printed when it is not set')
+    args = parser.parse_args()
+
+    analytics = TransactionLogAnalytics(args.capacity, args.prefix_depth)
+    for transaction_log in find_transaction_logs(args.logs):
+        analytics.add_log(transaction_log)
+        logging.info(f"Transaction log '{transaction_log}' is analyzed, "
+                     f"{analytics.transactions} transactions in total.")
+    output = json.dumps(analytics.report(args.top), indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(output + '\n')
+    else:
+        print(output)
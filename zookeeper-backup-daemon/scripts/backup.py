@@ -22,11 +22,14 @@ import ast
 
 import requests
 
-from process_znode_hierarchy import backup
-from process_zookeeper_logs import get_snapshot_and_transaction_logs, \
-    filter_and_store_transaction_logs, copy_snapshot, \
+from process_znode_hierarchy import backup, backup_from_tree, parallel_backup
+from process_zookeeper_logs import get_snapshot_and_transaction_logs, check_transaction_logs_continuity, \
+    filter_and_store_transaction_logs, filter_and_store_snapshot, copy_snapshot, get_zxid_from_file_name, \
     create_directory, remove_directory_with_content, is_file_system_shared
+from transactional_archive import Manifest, Watermark, get_archive_folder, read_watermark, write_watermark, \
+    write_manifest, remove_unreferenced_chains, archive_lock
 from zookeeper_client import ZooKeeperClient
+from znode_tree import build_znode_tree
 
 REQUEST_HEADERS = {
     'Accept': 'application/json',
@@ -56,21 +59,32 @@ class Backup:
                                        self._zookeeper_username,
                                        self._zookeeper_password)
         self._storage_folder = storage_folder
+        self._verify_checksums = os.getenv("ZOOKEEPER_BACKUP_VERIFY_CHECKSUMS", "true").lower() == "true"
+        self._filter_workers = int(os.getenv("ZOOKEEPER_BACKUP_FILTER_WORKERS", "0")) or None
+        self._incremental = os.getenv("ZOOKEEPER_BACKUP_INCREMENTAL", "true").lower() == "true"
+        self._snapshot_interval = int(os.getenv("ZOOKEEPER_BACKUP_SNAPSHOT_INTERVAL", "24"))
+        self._traversal_window = int(os.getenv("ZOOKEEPER_BACKUP_TRAVERSAL_WINDOW", "256"))
+        self._sessions = int(os.getenv("ZOOKEEPER_BACKUP_SESSIONS", "1"))
+        self._hierarchical_format = os.getenv("ZOOKEEPER_BACKUP_HIERARCHICAL_FORMAT", "zip").lower()
+        self._compression_level = int(os.getenv("ZOOKEEPER_BACKUP_COMPRESSION_LEVEL", "6"))
 
-    def transactional_backup(self):
+    def transactional_backup(self, znodes=None):
         try:
             create_directory(ZOOKEEPER_BACKUP_TMP_DIR)
-            zookeeper_servers = self.__get_zookeeper_servers()
-            logging.info(f'ZooKeeper servers: {", ".join(zookeeper_servers)}.')
-            zookeeper_leader = self.__find_zookeeper_leader(zookeeper_servers)
-            logging.info(f'ZooKeeper leader: {zookeeper_leader}.')
-            if zookeeper_leader is None:
-                raise Exception(f"ZooKeeper leader isn't found in servers: {zookeeper_servers}.")
-
-            self.__copy_logs_from_zookeeper_leader(zookeeper_leader)
+            self.__copy_logs_from_zookeeper()
+            if self._incremental and not znodes:
+                self.__archive_transaction_logs()
+                return
             snapshot, transaction_logs = get_snapshot_and_transaction_logs(ZOOKEEPER_BACKUP_TMP_DIR)
-            copy_snapshot(snapshot, self._storage_folder)
-            filter_and_store_transaction_logs(transaction_logs, self._storage_folder)
+            check_transaction_logs_continuity(snapshot, transaction_logs)
+            if znodes:
+                # The archive keeps transactions of the whole tree, backups of subtrees are stored in their folders
+                logging.info(f'Transactions of znodes {znodes} are backed up.')
+                filter_and_store_snapshot(snapshot, self._storage_folder, znodes)
+            else:
+                copy_snapshot(snapshot, self._storage_folder)
+            filter_and_store_transaction_logs(transaction_logs, self._storage_folder, self._verify_checksums,
+                                              self._filter_workers, znodes=znodes)
         except Exception:
             logging.exception('Exception occurred during transactional backup:')
             raise
@@ -78,7 +92,105 @@ class Backup:
             remove_directory_with_content(ZOOKEEPER_BACKUP_TMP_DIR)
 
     def hierarchical_backup(self, znodes):
-        backup(self._client, self._storage_folder, znodes)
+        if self._sessions > 1:
+            servers = self.__get_zookeeper_followers()
+            logging.info(f'Znodes are read by {self._sessions} sessions to servers: {", ".join(servers)}.')
+            parallel_backup(self._client, self._storage_folder, znodes, servers, self._sessions,
+                            self._traversal_window, self._hierarchical_format, self._compression_level)
+        else:
+            backup(self._client, self._storage_folder, znodes, self._traversal_window, self._hierarchical_format,
+                   self._compression_level)
+
+    def offline_hierarchical_backup(self, znodes):
+        try:
+            create_directory(ZOOKEEPER_BACKUP_TMP_DIR)
+            self.__copy_logs_from_zookeeper()
+            snapshot, transaction_logs = get_snapshot_and_transaction_logs(ZOOKEEPER_BACKUP_TMP_DIR)
+            check_transaction_logs_continuity(snapshot, transaction_logs)
+            tree = build_znode_tree(snapshot, transaction_logs)
+            backup_from_tree(tree, self._storage_folder, znodes, self._hierarchical_format,
+                             self._compression_level)
+        except Exception:
+            logging.exception('Exception occurred during offline hierarchical backup:')
+            raise
+        finally:
+            remove_directory_with_content(ZOOKEEPER_BACKUP_TMP_DIR)
+
+    def __archive_transaction_logs(self):
+        """
+        Stores only transactions after the watermark of the archive, i.e. after the last transaction stored by
+        previous backups, and refers to the snapshot and logs they stored in the manifest of the backup.
+        A new snapshot starts a new chain in the archive when the snapshot is shared by the configured number of
+        backups, or when the logs of ZooKeeper do not continue the watermark.
+        """
+        archive_folder = get_archive_folder(self._storage_folder)
+        create_directory(archive_folder)
+        with archive_lock(archive_folder):
+            self.__archive_transaction_logs_after_watermark(archive_folder)
+
+    def __archive_transaction_logs_after_watermark(self, archive_folder):
+        watermark = read_watermark(archive_folder)
+        snapshot, transaction_logs = get_snapshot_and_transaction_logs(ZOOKEEPER_BACKUP_TMP_DIR)
+        snapshot_zxid = get_zxid_from_file_name(snapshot)
+        if watermark and (watermark.backups >= self._snapshot_interval and
+                          snapshot_zxid > get_zxid_from_file_name(watermark.snapshot)):
+            logging.info(f'Snapshot of archived chain {watermark.chain} is shared by {watermark.backups} backups, '
+                         f'a new chain is started.')
+            watermark = None
+        if watermark:
+            _, transaction_logs = get_snapshot_and_transaction_logs(ZOOKEEPER_BACKUP_TMP_DIR, watermark.zxid)
+            try:
+                last_zxid = check_transaction_logs_continuity(snapshot, transaction_logs, watermark.zxid)
+            except Exception as e:
+                logging.warning(f'Transaction logs do not continue archived chain {watermark.chain}, '
+                                f'a new chain is started: {e}')
+                watermark = None
+                _, transaction_logs = get_snapshot_and_transaction_logs(ZOOKEEPER_BACKUP_TMP_DIR)
+        if watermark:
+            chain_folder = os.path.join(archive_folder, watermark.chain)
+            statistics = filter_and_store_transaction_logs(transaction_logs, chain_folder, self._verify_checksums,
+                                                           self._filter_workers, watermark.zxid)
+            archived = [log.stored_file for log in statistics if log.stored_file]
+            logging.info(f'{len(archived)} transaction logs after zxid 0x{watermark.zxid:x} are added '
+                         f'to archived chain {watermark.chain}.')
+            watermark = Watermark(watermark.chain, watermark.snapshot, last_zxid, watermark.logs + archived,
+                                  watermark.backups + 1)
+        else:
+            last_zxid = check_transaction_logs_continuity(snapshot, transaction_logs)
+            chain = os.path.basename(os.path.abspath(self._storage_folder))
+            chain_folder = os.path.join(archive_folder, chain)
+            remove_directory_with_content(chain_folder)
+            create_directory(chain_folder)
+            copy_snapshot(snapshot, chain_folder)
+            statistics = filter_and_store_transaction_logs(transaction_logs, chain_folder, self._verify_checksums,
+                                                           self._filter_workers, snapshot_zxid)
+            archived = [os.path.basename(snapshot)] + [log.stored_file for log in statistics if log.stored_file]
+            logging.info(f'Archived chain {chain} is started from snapshot {os.path.basename(snapshot)}.')
+            watermark = Watermark(chain, os.path.basename(snapshot), last_zxid, archived[1:], 1)
+        write_manifest(self._storage_folder, Manifest(
+            watermark.chain, watermark.snapshot, watermark.logs, get_zxid_from_file_name(watermark.snapshot),
+            last_zxid, archived))
+        write_watermark(archive_folder, watermark)
+        remove_unreferenced_chains(archive_folder, watermark)
+
+    def __copy_logs_from_zookeeper(self):
+        zookeeper_servers = self.__get_zookeeper_servers()
+        logging.info(f'ZooKeeper servers: {", ".join(zookeeper_servers)}.')
+        zookeeper_leader = self.__find_zookeeper_leader(zookeeper_servers)
+        logging.info(f'ZooKeeper leader: {zookeeper_leader}.')
+        if zookeeper_leader is None:
+            raise Exception(f"ZooKeeper leader isn't found in servers: {zookeeper_servers}.")
+        self.__copy_logs_from_zookeeper_leader(zookeeper_leader)
+
+    def __get_zookeeper_followers(self):
+        """
+        Returns followers and observers of the ensemble, reads are kept off the leader since it handles all writes.
+        The service address is returned when the ensemble has no other servers.
+        """
+        zookeeper_servers = self.__get_zookeeper_servers()
+        zookeeper_leader = self.__find_zookeeper_leader(zookeeper_servers)
+        followers = [server for server in zookeeper_servers if server != zookeeper_leader]
+        return followers or [self._zookeeper_host]
 
     def __get_zookeeper_servers(self):
         zk = self._client.connect_to_zookeeper()
@@ -125,9 +237,17 @@ if __name__ == "__main__":
     if args.mode and args.mode == 'transactional':
         if not is_file_system_shared():
             raise Exception('Configuration is not suitable to make transactional backup.')
+        znodes = ast.literal_eval(args.znodes) if args.znodes else []
         logging.info(f'Start transactional backup to folder: {args.folder}.')
-        backup_instance.transactional_backup()
+        backup_instance.transactional_backup(znodes)
         logging.info('Transactional backup is successful.')
+    elif args.mode and args.mode == 'offline':
+        if not is_file_system_shared():
+            raise Exception('Configuration is not suitable to make offline hierarchical backup.')
+        znodes = ast.literal_eval(args.znodes) if args.znodes else []
+        logging.info(f'Start offline hierarchical backup to folder: {args.folder}.')
+        backup_instance.offline_hierarchical_backup(znodes)
+        logging.info('Offline hierarchical backup is successful.')
     else:
         znodes = ast.literal_eval(args.znodes) if args.znodes else []
         logging.info(f'Start hierarchical backup to folder: {args.folder}.')
@@ -0,0 +1,153 @@
+#!/usr/bin/python
+# Copyright 2024-2025 NetCracker Technology Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import logging
+import os
+from os.path import join
+
+from process_zookeeper_logs import get_snapshot_and_transaction_logs, get_zxid_from_file_name, \
+    filter_and_store_transaction_log, create_directory, remove_directory_with_content
+from transaction_log_index import INDEX_FOLDER, get_index_file
+from transactional_archive import ARCHIVE_FOLDER, Watermark, archive_lock, read_manifest, read_watermark, \
+    write_watermark, remove_unreferenced_chains
+from znode_tree import build_znode_tree, write_snapshot
+
+COMPACTED_CHAIN_PREFIX = 'compacted-'
+
+
+def compact(snapshot, transaction_logs, output_folder, zxid=None):
+    """
+    Applies the transaction logs to the snapshot offline and writes the result as a new snapshot, so a restore
+    starts from it instead of replaying the logs.
+    *Args:*\n
+        _snapshot_ (str) - path to the snapshot;\n
+        _transaction_logs_ (list) - paths to the logs that continue the snapshot, sorted by zxid;\n
+        _output_folder_ (str) - folder to write the snapshot to;\n
+        _zxid_ (int) - zxid of the last transaction to apply (optional);\n
+    *Returns:*\n
+        str - path to the written snapshot
+    """
+    tree = build_znode_tree(snapshot, transaction_logs, zxid, strict=True)
+    # The snapshot is named by the last applied transaction, never by a zxid the tree has not reached. Filtered logs
+    # may end with dropped transactions before the zxid, which do not change persistent znodes, so logs that follow
+    # the zxid continue the snapshot. Archived logs are written completely, so a damaged or truncated log raises
+    # CorruptTransaction instead of ending the replay early.
+    snapshot_file = join(output_folder, f'snapshot.{tree.zxid:x}')
+    with open(f'{snapshot_file}.partial', 'wb') as stream:
+        write_snapshot(tree, stream)
+        stream.flush()
+        os.fsync(stream.fileno())
+    os.replace(f'{snapshot_file}.partial', snapshot_file)
+    logging.info(f"Snapshot '{snapshot_file}' of {len(tree)} znodes is written.")
+    return snapshot_file
+
+
+def compact_archive(archive_folder):
+    """
+    Compacts the current chain of the transactional archive: its snapshot and logs are folded into a snapshot
+    as of the watermark, which starts a new chain. Transactions archived meanwhile are moved to the new chain.
+    The old chain is removed as soon as no backup refers to it.
+    *Returns:*\n
+        str - name of the new chain or None if there is nothing to compact
+    """
+    with archive_lock(archive_folder):
+        watermark = read_watermark(archive_folder)
+    if watermark is None or not watermark.logs:
+        logging.info('Archive has no transaction logs to compact.')
+        return None
+    chain_folder = join(archive_folder, watermark.chain)
+    chain = f'{COMPACTED_CHAIN_PREFIX}{watermark.zxid:x}'
+    new_chain_folder = join(archive_folder, chain)
+    remove_directory_with_content(new_chain_folder)
+    create_directory(new_chain_folder)
+    try:
+        # The chain is read without the lock, backups and the shipper only append files to it
+        snapshot = compact(join(chain_folder, watermark.snapshot),
+                           [join(chain_folder, log) for log in watermark.logs], new_chain_folder, watermark.zxid)
+        with archive_lock(archive_folder):
+            current = read_watermark(archive_folder)
+            if current is None or current.chain != watermark.chain:
+                raise Exception(f'Archived chain {watermark.chain} is replaced during compaction.')
+            logs = []
+            if current.zxid > watermark.zxid:
+                logs = move_transaction_logs(chain_folder, current.logs, new_chain_folder, watermark.zxid)
+            compacted = Watermark(chain, os.path.basename(snapshot), current.zxid, logs, 0)
+            write_watermark(archive_folder, compacted)
+            remove_unreferenced_chains(archive_folder, compacted)
+    except Exception:
+        remove_directory_with_content(new_chain_folder)
+        raise
+    logging.info(f'Archived chain {watermark.chain} is compacted into chain {chain} at zxid 0x{watermark.zxid:x}.')
+    return chain
+
+
+def move_transaction_logs(chain_folder, logs, new_chain_folder, after_zxid):
+    # Logs that start after the zxid and the one that contains it are copied without the transactions up to it
+    first_log = 0
+    for position, log in enumerate(logs):
+        if get_zxid_from_file_name(log) <= after_zxid:
+            first_log = position
+    stored = []
+    for log in logs[first_log:]:
+        statistics = filter_and_store_transaction_log(join(chain_folder, log), new_chain_folder,
+                                                      after_zxid=after_zxid)
+        if statistics.stored_file:
+            stored.append(statistics.stored_file)
+    return stored
+
+
+def compact_backup(storage_folder):
+    """
+    Compacts a transactional backup that keeps the snapshot and logs in its folder: they are replaced with
+    a snapshot as of the last transaction of the logs.
+    """
+    if read_manifest(storage_folder):
+        raise Exception(f"Backup '{storage_folder}' refers to the transactional archive, compact the archive instead.")
+    snapshot, transaction_logs = get_snapshot_and_transaction_logs(storage_folder)
+    if not transaction_logs:
+        logging.info(f"Backup '{storage_folder}' has no transaction logs to compact.")
+        return snapshot
+    compacted = compact(snapshot, transaction_logs, storage_folder)
+    if compacted == snapshot:
+        return compacted
+    for file_name in [snapshot] + transaction_logs:
+        os.remove(file_name)
+        index_file = get_index_file(storage_folder, file_name)
+        if os.path.isfile(index_file):
+            os.remove(index_file)
+    index_folder = join(storage_folder, INDEX_FOLDER)
+    if os.path.isdir(index_folder) and not os.listdir(index_folder):
+        os.rmdir(index_folder)
+    logging.info(f"Snapshot and {len(transaction_logs)} transaction logs of backup '{storage_folder}' are replaced "
+                 f"with '{os.path.basename(compacted)}'.")
+    return compacted
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.DEBUG if os.getenv('ZOOKEEPER_BACKUP_DAEMON_DEBUG') else logging.INFO,
+                        format='[%(asctime)s,%(msecs)03d][%(levelname)s][category=Compaction] %(message)s',
+                        datefmt='%Y-%m-%dT%H:%M:%S')
+    parser = argparse.ArgumentParser(
+        description='Folds archived transaction logs into a new snapshot, so restores replay fewer transactions.')
+    parser.add_argument('--storage', default=os.getenv('ZOOKEEPER_BACKUP', '/opt/zookeeper/backup-storage'),
+                        help='backup storage with the transactional archive to compact')
+    parser.add_argument('--backup', help='compact this backup with the snapshot and logs in its folder instead')
+    args = parser.parse_args()
+
+    if args.backup:
+        compact_backup(args.backup)
+    else:
+        compact_archive(join(args.storage, ARCHIVE_FOLDER))
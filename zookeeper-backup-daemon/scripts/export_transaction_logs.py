@@ -0,0 +1,226 @@
+#!/usr/bin/python
+# Copyright 2024-2025 NetCracker Technology Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import ast
+import logging
+import os
+import struct
+
+from parse_transaction_logs import Txn, EOS, UnknownType, LOG_FILE_HEADER_STRUCT, MULTI
+from process_zookeeper_logs import find_transaction_logs
+
+READ_BUFFER_SIZE = 1024 * 1024
+FLUSH_ROWS = 64 * 1024
+
+NPY_MAGIC = b'\x93NUMPY\x01\x00'
+# The header is padded to a fixed size, so it is rewritten in place with the final shape when rows are appended
+NPY_HEADER_SIZE = 128
+NPY_HEADER_LENGTH_STRUCT = struct.Struct('<H')
+
+PATHS_FILE = 'paths.txt'
+NO_PATH = -1
+NO_DATA = -1
+NO_MULTI = -1
+
+# Column name, NumPy type description and struct format of one value
+COLUMNS = (
+    ('zxid', '<u8', 'Q'),
+    ('time', '<i8', 'q'),
+    ('type', '<i4', 'i'),
+    ('session', '<u8', 'Q'),
+    ('path', '<i4', 'i'),
+    ('data_length', '<i4', 'i'),
+    ('multi_index', '<i2', 'h'),
+)
+
+
+class NpyColumn(object):
+    """
+    One-dimensional array in the NumPy .npy format (version 1.0) that rows are appended to. Values are buffered
+    and packed in blocks, the header with the number of rows is rewritten on flush, so the file is valid for
+    numpy.load(file, mmap_mode='r') after every flush. Existing files are opened for appending.
+    """
+
+    def __init__(self, file_name, descr, value_format):
+        self.file_name = file_name
+        self.descr = descr
+        self.value_format = value_format
+        self.item_size = struct.calcsize('<' + value_format)
+        self.values = []
+        if os.path.exists(file_name):
+            self.file = open(file_name, 'r+b')
+            self.rows = self.read_header()
+            self.file.seek(NPY_HEADER_SIZE + self.rows * self.item_size)
+            self.file.truncate()
+        else:
+            self.file = open(file_name, 'w+b')
+            self.rows = 0
+            self.write_header()
+
+    def header(self):
+        header = repr({'descr': self.descr, 'fortran_order': False, 'shape': (self.rows,)})
+        padding = NPY_HEADER_SIZE - len(NPY_MAGIC) - NPY_HEADER_LENGTH_STRUCT.size - len(header) - 1
+        return (NPY_MAGIC + NPY_HEADER_LENGTH_STRUCT.pack(NPY_HEADER_SIZE - len(NPY_MAGIC) -
+                                                          NPY_HEADER_LENGTH_STRUCT.size) +
+                header.encode('latin1') + b' ' * padding + b'\n')
+
+    def write_header(self):
+        position = self.file.tell()
+        self.file.seek(0)
+        self.file.write(self.header())
+        self.file.seek(max(position, NPY_HEADER_SIZE))
+
+    def read_header(self):
+        prefix = self.file.read(len(NPY_MAGIC) + NPY_HEADER_LENGTH_STRUCT.size)
+        if not prefix.startswith(NPY_MAGIC):
+            raise ValueError(f"'{self.file_name}' is not a .npy file of version 1.0.")
+        length, = NPY_HEADER_LENGTH_STRUCT.unpack_from(prefix, len(NPY_MAGIC))
+        header = ast.literal_eval(self.file.read(length).decode('latin1'))
+        if len(prefix) + length != NPY_HEADER_SIZE or header['descr'] != self.descr or header['fortran_order']:
+            raise ValueError(f"'{self.file_name}' was not written by this export.")
+        return header['shape'][0]
+
+    def last(self):
+        """Returns the last value of the column or None when it is empty."""
+        if self.values:
+            return self.values[-1]
+        if not self.rows:
+            return None
+        position = self.file.tell()
+        self.file.seek(NPY_HEADER_SIZE + (self.rows - 1) * self.item_size)
+        value, = struct.unpack('<' + self.value_format, self.file.read(self.item_size))
+        self.file.seek(position)
+        return value
+
+    def flush(self):
+        if self.values:
+            self.file.write(struct.pack(f'<{len(self.values)}{self.value_format}', *self.values))
+            self.rows += len(self.values)
+            self.values = []
+        self.write_header()
+        self.file.flush()
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+
+class TransactionLogExport(object):
+    """
+    Columnar export of transaction records into a folder with one .npy array per column and a dictionary of paths,
+    the path column holds line numbers of paths.txt. A multi transaction is exported as one row per
+    sub-operation, all with the zxid of the multi and the position of the sub-operation in multi_index. Records
+    that are not newer than the last exported one are skipped, so overlapping backups can be exported into the
+    same folder.
+    """
+
+    def __init__(self, folder):
+        self.folder = folder
+        os.makedirs(folder, exist_ok=True)
+        self.columns = [NpyColumn(os.path.join(folder, f'{name}.npy'), descr, value_format)
+                        for name, descr, value_format in COLUMNS]
+        rows = {column.rows for column in self.columns}
+        if len(rows) > 1:
+            raise ValueError(f"Columns in '{folder}' have different lengths, the export is broken.")
+        self.path_ids = {}
+        paths_file = os.path.join(folder, PATHS_FILE)
+        if os.path.exists(paths_file):
+            with open(paths_file, encoding='utf-8') as file:
+                for line in file:
+                    self.path_ids[line[:-1]] = len(self.path_ids)
+        self.paths = open(paths_file, 'a', encoding='utf-8')
+        self.last_zxid = self.columns[0].last()
+        self.exported = 0
+        self.skipped = 0
+        self.unknown = 0
+
+    def path_id(self, path):
+        path_id = self.path_ids.get(path)
+        if path_id is None:
+            path_id = self.path_ids[path] = len(self.path_ids)
+            # Paths can't contain control characters, so one path per line is unambiguous
+            self.paths.write(path + '\n')
+        return path_id
+
+    def add_row(self, header, txn_type, entry, multi_index):
+        path = getattr(entry, 'path', None)
+        data = getattr(entry, 'data', None)
+        values = (header.zxid, header.time, txn_type, header.client_id,
+                  self.path_id(path) if path is not None else NO_PATH,
+                  len(data) if data is not None else NO_DATA, multi_index)
+        for column, value in zip(self.columns, values):
+            column.values.append(value)
+        self.exported += 1
+
+    def add_transaction(self, transaction):
+        header = transaction.header
+        if self.last_zxid is not None and header.zxid <= self.last_zxid:
+            self.skipped += 1
+            return
+        self.last_zxid = header.zxid
+        if header.type == MULTI:
+            for index, (txn_type, entry) in enumerate(transaction.entry.txns):
+                self.add_row(header, txn_type, entry, index)
+        else:
+            self.add_row(header, header.type, transaction.entry, NO_MULTI)
+        if len(self.columns[0].values) >= FLUSH_ROWS:
+            self.flush()
+
+    def add_log(self, log_file):
+        with open(log_file, 'rb', buffering=READ_BUFFER_SIZE) as stream:
+            stream.seek(LOG_FILE_HEADER_STRUCT.size)
+            while True:
+                try:
+                    transaction = Txn(stream)
+                except EOS:
+                    break
+                except UnknownType:
+                    self.unknown += 1
+                    continue
+                self.add_transaction(transaction)
+        self.flush()
+
+    def flush(self):
+        # The dictionary is flushed first, so every path id in the columns is resolvable
+        self.paths.flush()
+        for column in self.columns:
+            column.flush()
+
+    def close(self):
+        self.paths.close()
+        for column in self.columns:
+            column.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='[%(asctime)s,%(msecs)03d][%(levelname)s] %(message)s',
+                        datefmt='%Y-%m-%dT%H:%M:%S')
+    parser = argparse.ArgumentParser(
+        description='Exports ZooKeeper transaction logs into memory-mappable NumPy arrays, one file per column.')
+    parser.add_argument('logs', nargs='+', help='transaction log files or folders with them')
+    parser.add_argument('--output', required=True,
+                        help='folder to write arrays to, rows are appended when it already has an export')
+    args = parser.parse_args()
+
+    export = TransactionLogExport(args.output)
+    try:
+        for transaction_log in find_transaction_logs(args.logs):
+            export.add_log(transaction_log)
+            logging.info(f"Transaction log '{transaction_log}' is exported, {export.exported} rows in total.")
+    finally:
+        export.close()
+    logging.info(f'{export.exported} rows and {len(export.path_ids)} paths are exported to {args.output}, '
+                 f'{export.skipped} already exported and {export.unknown} unknown transactions are skipped.')
@@ -0,0 +1,347 @@
+#!/usr/bin/python
+# Copyright 2024-2025 NetCracker Technology Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import gzip
+import struct
+import zlib
+
+from parse_transaction_logs import INT_STRUCT, LONG_STRUCT
+
+SNAPSHOT_FILE_MAGIC, = INT_STRUCT.unpack(b'ZKSN')
+SNAPSHOT_FILE_VERSION = 2
+# ZooKeeper writes snapshots with an unused database id of -1
+SNAPSHOT_DB_ID = -1
+# Snapshots are written without a separator after the last node, the list of nodes ends with the root path instead
+END_OF_NODES = '/'
+SEAL_PATH = '/'
+
+GZIP_SUFFIX = '.gz'
+
+READ_CHUNK_SIZE = 1024 * 1024
+WRITE_CHUNK_SIZE = 1024 * 1024
+
+SNAPSHOT_FILE_HEADER_STRUCT = struct.Struct('>i i q')
+SESSION_STRUCT = struct.Struct('>q i')
+# ACL reference of a node followed by its StatPersisted: czxid, mzxid, ctime, mtime, version, cversion, aversion,
+# ephemeralOwner and pzxid
+NODE_TAIL_STRUCT = struct.Struct('>q q q q q i i i q q')
+DIGEST_STRUCT = struct.Struct('>q i q')
+
+# Containers and TTL nodes are marked with special ephemeral owners, they are not bound to sessions
+CONTAINER_EPHEMERAL_OWNER = -0x8000000000000000
+TTL_EPHEMERAL_OWNER_PREFIX = -1
+
+
+class CorruptSnapshot(Exception):
+    def __init__(self, offset, reason):
+        super().__init__(offset, reason)
+        self.offset = offset
+        self.reason = reason
+
+    def __str__(self):
+        return f'Corrupt snapshot at offset {self.offset}: {self.reason}'
+
+
+class SnapshotStream(object):
+    """
+    Reader over a snapshot stream that keeps one chunk of the file in memory at a time and computes Adler-32
+    of the bytes it has passed, as ZooKeeper checks the snapshot on load.
+    """
+
+    def __init__(self, stream, chunk_size=READ_CHUNK_SIZE):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.buffer = b''
+        self.position = 0
+        self.buffer_offset = 0
+        self.adler = zlib.adler32(b'')
+
+    @property
+    def offset(self):
+        return self.buffer_offset + self.position
+
+    def fill(self, count):
+        """Makes count bytes available from the current position, reading the next chunk of the stream."""
+        consumed = self.buffer[:self.position]
+        self.adler = zlib.adler32(consumed, self.adler)
+        self.buffer_offset += len(consumed)
+        self.buffer = self.buffer[self.position:] + self.stream.read(max(count, self.chunk_size))
+        self.position = 0
+        if len(self.buffer) < count:
+            raise CorruptSnapshot(self.offset, f'unexpected end of file, {count} bytes are expected')
+
+    def unpack(self, structure):
+        if self.position + structure.size > len(self.buffer):
+            self.fill(structure.size)
+        values = structure.unpack_from(self.buffer, self.position)
+        self.position += structure.size
+        return values
+
+    def read(self, count):
+        if count < 0:
+            raise CorruptSnapshot(self.offset, f'negative length {count}')
+        if self.position + count > len(self.buffer):
+            self.fill(count)
+        start = self.position
+        self.position += count
+        return self.buffer[start:self.position]
+
+    def read_int(self):
+        return self.unpack(INT_STRUCT)[0]
+
+    def read_long(self):
+        return self.unpack(LONG_STRUCT)[0]
+
+    def read_buffer(self):
+        length = self.read_int()
+        return self.read(length) if length >= 0 else None
+
+    def read_string(self):
+        length = self.read_int()
+        if length < 0:
+            return None
+        try:
+            return str(self.read(length), 'utf-8')
+        except UnicodeDecodeError as e:
+            reason = f'string of {length} bytes is not valid UTF-8: {e.reason}'
+        raise CorruptSnapshot(self.offset - length, reason)
+
+    def checksum(self):
+        return zlib.adler32(self.buffer[:self.position], self.adler)
+
+    def at_end(self):
+        if self.position < len(self.buffer):
+            return False
+        data = self.stream.read(self.chunk_size)
+        if not data:
+            return True
+        self.adler = zlib.adler32(self.buffer, self.adler)
+        self.buffer_offset += len(self.buffer)
+        self.buffer = data
+        self.position = 0
+        return False
+
+
+class SnapshotOutputStream(object):
+    """
+    Writer of the jute encoding of a snapshot that computes Adler-32 of the written bytes for the seals.
+    Values are collected into chunks, so a snapshot is written with a few large writes.
+    """
+
+    def __init__(self, stream, chunk_size=WRITE_CHUNK_SIZE):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.chunks = []
+        self.size = 0
+        self.adler = zlib.adler32(b'')
+
+    def write(self, data):
+        self.chunks.append(data)
+        self.size += len(data)
+        if self.size >= self.chunk_size:
+            self.flush()
+
+    def pack(self, structure, *values):
+        self.write(structure.pack(*values))
+
+    def write_int(self, value):
+        self.write(INT_STRUCT.pack(value))
+
+    def write_long(self, value):
+        self.write(LONG_STRUCT.pack(value))
+
+    def write_buffer(self, data):
+        if data is None:
+            self.write_int(-1)
+        else:
+            self.write_int(len(data))
+            self.write(data)
+
+    def write_string(self, value):
+        self.write_buffer(value.encode('utf-8') if value is not None else None)
+
+    def write_seal(self):
+        self.flush()
+        self.write_long(self.adler)
+        self.write_string(SEAL_PATH)
+
+    def flush(self):
+        data = b''.join(self.chunks)
+        self.adler = zlib.adler32(data, self.adler)
+        self.stream.write(data)
+        self.chunks = []
+        self.size = 0
+
+
+class SnapshotFileHeader(object):
+    MAGIC = SNAPSHOT_FILE_MAGIC
+
+    def __init__(self, stream):
+        self.magic, self.version, self.dbid = stream.unpack(SNAPSHOT_FILE_HEADER_STRUCT)
+
+    def is_valid(self):
+        return self.magic == self.MAGIC
+
+
+class StatPersisted(object):
+    __slots__ = ('czxid', 'mzxid', 'ctime', 'mtime', 'version', 'cversion', 'aversion', 'ephemeral_owner', 'pzxid')
+
+    def __init__(self, czxid, mzxid, ctime, mtime, version, cversion, aversion, ephemeral_owner, pzxid):
+        self.czxid = czxid
+        self.mzxid = mzxid
+        self.ctime = ctime
+        self.mtime = mtime
+        self.version = version
+        self.cversion = cversion
+        self.aversion = aversion
+        self.ephemeral_owner = ephemeral_owner
+        self.pzxid = pzxid
+
+    def __str__(self):
+        return f'czxid 0x{self.czxid:x} mzxid 0x{self.mzxid:x} pzxid 0x{self.pzxid:x} version {self.version} ' \
+               f'cversion {self.cversion} aversion {self.aversion} ephemeralOwner 0x{self.ephemeral_owner:x}'
+
+
+class DataNode(object):
+    """
+    Znode as it is serialized in a snapshot. The root node has the empty path, data is None for nodes
+    created with null data, acl is a reference to the ACL cache of the snapshot.
+    """
+    __slots__ = ('path', 'data', 'acl', 'stat')
+
+    def __init__(self, path, data, acl, stat):
+        self.path = path
+        self.data = data
+        self.acl = acl
+        self.stat = stat
+
+    @property
+    def ephemeral(self):
+        return is_session_owner(self.stat.ephemeral_owner)
+
+    def __str__(self):
+        size = len(self.data) if self.data is not None else 0
+        return f"{self.path or '/'} ({size} bytes) acl {self.acl} {self.stat}"
+
+
+class SnapshotDigest(object):
+
+    def __init__(self, zxid, version, digest):
+        self.zxid = zxid
+        self.version = version
+        self.digest = digest
+
+    def __str__(self):
+        return f'Digest version {self.version} of zxid 0x{self.zxid:x}: {self.digest:x}'
+
+
+class Snapshot(object):
+    """
+    Streaming reader of a ZooKeeper snapshot (snapshot.<zxid>, optionally gzipped). The file header, session
+    table and ACL cache are read on creation, nodes are then yielded one by one by nodes() in the order they are
+    serialized, i.e. every parent before its children. Only one chunk of the file and one node are held in memory,
+    so snapshots of any size are walked with bounded memory. The checksum and digest are read after the last node.
+    """
+
+    def __init__(self, stream, verify=True):
+        self.stream = SnapshotStream(stream)
+        self.verify = verify
+        self.header = SnapshotFileHeader(self.stream)
+        if not self.header.is_valid():
+            raise CorruptSnapshot(0, f'magic number 0x{self.header.magic & 0xffffffff:x} is not a snapshot magic')
+        self.sessions = self.read_sessions()
+        self.acls = self.read_acl_cache()
+        self.digest = None
+        self.last_processed_zxid = None
+        self.nodes_read = False
+
+    def read_sessions(self):
+        count = self.stream.read_int()
+        return dict(self.stream.unpack(SESSION_STRUCT) for _ in range(count))
+
+    def read_acl_cache(self):
+        stream = self.stream
+        acls = {}
+        for _ in range(stream.read_int()):
+            reference = stream.read_long()
+            acls[reference] = [(stream.read_int(), stream.read_string(), stream.read_string())
+                               for _ in range(stream.read_int())]
+        return acls
+
+    def nodes(self):
+        """Yields DataNode for every znode of the snapshot, then checks the seal of the file."""
+        if self.nodes_read:
+            raise ValueError('Nodes of a snapshot can be read only once.')
+        self.nodes_read = True
+        stream = self.stream
+        read_string = stream.read_string
+        read_buffer = stream.read_buffer
+        unpack = stream.unpack
+        path = read_string()
+        while path != END_OF_NODES:
+            if path is None:
+                raise CorruptSnapshot(stream.offset, 'null node path')
+            data = read_buffer()
+            acl, *stat = unpack(NODE_TAIL_STRUCT)
+            yield DataNode(path, data, acl, StatPersisted(*stat))
+            path = read_string()
+        self.read_seal()
+        self.read_digest()
+
+    def read_seal(self):
+        checksum = self.stream.checksum()
+        value = self.stream.read_long()
+        # The checksum is written as a Java long of an unsigned 32-bit Adler-32 value
+        if self.verify and value != checksum:
+            raise CorruptSnapshot(self.stream.offset, f'checksum mismatch, expected {value}, calculated {checksum}')
+        if self.stream.read_string() != SEAL_PATH:
+            raise CorruptSnapshot(self.stream.offset, 'snapshot seal is missing')
+
+    def read_digest(self):
+        # Snapshots of ZooKeeper 3.6+ end with the digest of the tree and 3.7+ with the last processed zxid,
+        # each section is sealed on its own, older snapshots end after the nodes
+        if self.stream.at_end():
+            return
+        self.digest = SnapshotDigest(*self.stream.unpack(DIGEST_STRUCT))
+        self.read_seal()
+        if self.stream.at_end():
+            return
+        self.last_processed_zxid = self.stream.read_long()
+        self.read_seal()
+
+
+def is_session_owner(ephemeral_owner):
+    return ephemeral_owner != 0 and ephemeral_owner != CONTAINER_EPHEMERAL_OWNER \
+        and ephemeral_owner >> 56 != TTL_EPHEMERAL_OWNER_PREFIX
+
+
+def open_snapshot_file(file_name):
+    """Opens a snapshot file for reading, gzipped snapshots are decompressed on the fly."""
+    if file_name.endswith(GZIP_SUFFIX):
+        return gzip.open(file_name, 'rb')
+    if file_name.endswith('.snappy'):
+        raise ValueError(f"Snapshot '{file_name}' is compressed with snappy, which is not supported.")
+    return open(file_name, 'rb')
+
+
+def read_snapshot_nodes(file_name, verify=True):
+    """
+    Yields nodes of a snapshot file, the file is kept open until all nodes are read.
+    *Args:*\n
+        _file_name_ (str) - path to the snapshot;\n
+        _verify_ (bool) - whether the checksum of the snapshot is checked after the last node;\n
+    """
+    with open_snapshot_file(file_name) as stream:
+        yield from Snapshot(stream, verify).nodes()
@@ -13,10 +13,10 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import binascii
 import logging
 import struct
 import time
+import zlib
 
 SESSIONCLOSE = -11
 SESSIONCREATE = -10
@@ -35,6 +35,14 @@ PING = 11
 GETCHILDREN2 = 12
 CHECK = 13
 MULTI = 14
+CREATE2 = 15
+RECONFIG = 16
+CHECKWATCHES = 17
+REMOVEWATCHES = 18
+CREATECONTAINER = 19
+DELETECONTAINER = 20
+CREATETTL = 21
+MULTIREAD = 22
 AUTH = 100
 SETWATCHES = 101
 SASL = 102
@@ -57,12 +65,33 @@ opcodes = {
     GETCHILDREN2: 'getchildren2',
     CHECK: 'check',
     MULTI: 'multi',
+    CREATE2: 'create2',
+    RECONFIG: 'reconfig',
+    CHECKWATCHES: 'checkwatches',
+    REMOVEWATCHES: 'removewatches',
+    CREATECONTAINER: 'createcontainer',
+    DELETECONTAINER: 'deletecontainer',
+    CREATETTL: 'createttl',
+    MULTIREAD: 'multiread',
     AUTH: 'auth',
     SETWATCHES: 'setwatches',
     SASL: 'sasl',
 }
 
 END_OF_STREAM = b'\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00'
+END_OF_RECORD = b'B'
+# The part of a log after a damaged record is checked for zeros in chunks of this size
+TAIL_CHUNK_SIZE = 1024 * 1024
+
+# Record layout structures are compiled once and shared by all decoders
+LOG_FILE_HEADER_STRUCT = struct.Struct('>i i q')
+TXN_PREFIX_STRUCT = struct.Struct('>q i')
+TXN_HEADER_STRUCT = struct.Struct('>Q I Q Q i')
+INT_STRUCT = struct.Struct('>i')
+LONG_STRUCT = struct.Struct('>q')
+BOOL_STRUCT = struct.Struct('B')
+
+LOG_FILE_MAGIC, = INT_STRUCT.unpack(b'ZKLG')
 
 
 # end of stream
@@ -72,79 +101,202 @@ class EOS(Exception):
 
 class UnknownType(Exception):
     def __init__(self, operation_type):
+        super().__init__(operation_type)
         self.type = operation_type
 
     def __str__(self):
         return f'Unknown type {self.type}'
 
 
+class CorruptTransaction(Exception):
+    def __init__(self, offset, zxid, reason):
+        super().__init__(offset, zxid, reason)
+        self.offset = offset
+        self.zxid = zxid
+        self.reason = reason
+
+    def __str__(self):
+        zxid = f'0x{self.zxid:x}' if self.zxid is not None else 'unknown'
+        return f'Corrupt transaction at offset {self.offset}, zxid {zxid}: {self.reason}'
+
+
+def damaged_record(offset, zxid, reason, tail, strict=False):
+    """
+    Returns the exception to raise for a record that is truncated or does not match its checksum. ZooKeeper
+    preallocates logs with zeros, so when only zeros or nothing follow the record, it is the record being written
+    when the log was copied: the record ends the stream with a warning, unless strict is set. A damaged record
+    followed by data is an error, so a damaged log is not taken for a shorter one.
+    *Args:*\n
+        _tail_ (iterable) - chunks of bytes following the record;\n
+    """
+    if not strict and all(chunk.count(0) == len(chunk) for chunk in tail):
+        logging.warning(f'Transaction record at offset {offset} is treated as the partly written end of the log, '
+                        f'{reason}.')
+        return EOS()
+    return CorruptTransaction(offset, zxid, reason)
+
+
+def buffer_tail(buffer, offset):
+    return (bytes(buffer[start:start + TAIL_CHUNK_SIZE]) for start in range(offset, len(buffer), TAIL_CHUNK_SIZE))
+
+
+def stream_tail(stream):
+    return iter(lambda: stream.read(TAIL_CHUNK_SIZE), b'')
+
+
 class LogFileHeader(object):
+    MAGIC = LOG_FILE_MAGIC
 
     def __init__(self, stream):
-        magic_struct = struct.Struct('4s')
-        self.MAGIC = int(binascii.hexlify(magic_struct.pack(b'ZKLG')), 16)
-        data_struct = struct.Struct('>i i q')
-        self.data_bytes = stream.read(data_struct.size)
-        self.magic, self.version, self.dbid = data_struct.unpack(self.data_bytes)
+        self.data_bytes = stream.read(LOG_FILE_HEADER_STRUCT.size)
+        self.magic, self.version, self.dbid = LOG_FILE_HEADER_STRUCT.unpack(self.data_bytes)
+
+    @classmethod
+    def from_buffer(cls, buffer):
+        header = cls.__new__(cls)
+        header.data_bytes = bytes(buffer[:LOG_FILE_HEADER_STRUCT.size])
+        header.magic, header.version, header.dbid = LOG_FILE_HEADER_STRUCT.unpack(header.data_bytes)
+        return header
 
     def is_valid(self):
         return self.magic == self.MAGIC
 
 
 class TransactionData(object):
-    def __init__(self, data):
-        self.initial = data
-        self.body = data
-        self.rest = data
+    """
+    Reader over the body of one transaction record. It keeps an offset into a memoryview instead of
+    slicing the remaining bytes, so decoding a record is linear in its size and payloads are not copied.
+    """
+
+    def __init__(self, data, offset=0, end=None):
+        self.view = data if isinstance(data, memoryview) else memoryview(data)
+        self.offset = offset
+        self.end = len(self.view) if end is None else end
+
+    def remaining(self):
+        return self.end - self.offset
 
     def read(self, count):
-        part = self.rest[:count]
-        self.rest = self.rest[count:]
-        logging.debug(f'Read by TransactionData is {part}.')
-        return part
+        start = self.offset
+        if count < 0 or start + count > self.end:
+            raise struct.error(f'Unable to read {count} bytes at offset {start}, record ends at {self.end}')
+        self.offset = start + count
+        return self.view[start:self.offset]
+
+    def unpack(self, structure):
+        if self.offset + structure.size > self.end:
+            raise struct.error(f'Unable to read {structure.size} bytes at offset {self.offset}, '
+                               f'record ends at {self.end}')
+        values = structure.unpack_from(self.view, self.offset)
+        self.offset += structure.size
+        return values
 
     def __str__(self):
-        return f'Initial is {self.initial}, rest is {self.rest}'
+        return f'Record of {self.end} bytes, offset is {self.offset}'
 
 
 class Txn(object):
 
-    def __init__(self, stream):
-        s = struct.Struct('>q i')
-        txn_head = stream.read(s.size)
-        self.crc, self.txn_len = s.unpack(txn_head)
-
-        if not self.txn_len:
+    def __init__(self, stream, strict=False):
+        """
+        Reads the next record of a log stream. EOS is raised at the end of stream marker, at the end of the file
+        right after a record, and at a truncated or damaged record followed only by zeros, i.e. the partly written
+        last record of a log copied from a running server. Other damaged records and records that can not be decoded
+        raise CorruptTransaction. When strict is set, e.g. for archived logs that are written completely, a partly
+        written last record raises CorruptTransaction as well.
+        """
+        offset = stream.tell()
+        txn_head = stream.read(TXN_PREFIX_STRUCT.size)
+        if not txn_head:
             raise EOS()
+        if len(txn_head) < TXN_PREFIX_STRUCT.size:
+            raise damaged_record(offset, None, f'record prefix is truncated to {len(txn_head)} bytes', (), strict)
+        crc, txn_len = TXN_PREFIX_STRUCT.unpack(txn_head)
 
-        transaction_data = TransactionData(stream.read(self.txn_len))
+        if not txn_len:
+            raise EOS()
+        if txn_len < 0:
+            raise CorruptTransaction(offset, None, f'negative record length {txn_len}')
+
+        # Prefix, body and end of record byte are kept in one buffer, so the record can be written as is
+        record = bytearray(TXN_PREFIX_STRUCT.size + txn_len + 1)
+        record[:TXN_PREFIX_STRUCT.size] = txn_head
+        view = memoryview(record)
+        body = view[TXN_PREFIX_STRUCT.size:TXN_PREFIX_STRUCT.size + txn_len]
+        if stream.readinto(view[TXN_PREFIX_STRUCT.size:]) < txn_len + 1:
+            raise damaged_record(offset, read_zxid(record, 0), f'record of {txn_len} bytes is truncated', (), strict)
+        if zlib.adler32(body) != crc:
+            raise damaged_record(offset, read_zxid(record, 0), f'checksum mismatch, expected {crc}',
+                                 stream_tail(stream), strict)
+        if view[-1:] != END_OF_RECORD:
+            raise damaged_record(offset, read_zxid(record, 0), 'end of record marker is missing',
+                                 stream_tail(stream), strict)
+        try:
+            self._decode(view, 0)
+        except (struct.error, UnicodeDecodeError) as e:
+            raise CorruptTransaction(offset, read_zxid(record, 0), f'record cannot be decoded, {e}') from None
+
+    @classmethod
+    def from_buffer(cls, buffer, offset, scope=None):
+        """
+        Decodes the record that starts at the given offset of a buffer holding a whole log, e.g. a mmapped file,
+        without copying it. Checksums are not checked, see verify_transaction_log, but a truncated record or
+        a record without the end of record marker ends the stream the same way as for Txn(stream).
+        When scope, a PathPrefixTrie, is set, records on znodes out of its subtrees are skipped as well.
+        """
+        if offset + TXN_PREFIX_STRUCT.size > len(buffer):
+            if offset < len(buffer):
+                raise damaged_record(offset, None, f'record prefix is truncated to {len(buffer) - offset} bytes', ())
+            logging.warning(f'Transaction log ends at offset {offset} without end of stream marker.')
+            raise EOS()
+        txn_len = TXN_PREFIX_STRUCT.unpack_from(buffer, offset)[1]
+        if not txn_len:
+            raise EOS()
+        end = offset + TXN_PREFIX_STRUCT.size + txn_len + 1
+        if txn_len > 0 and end > len(buffer):
+            raise damaged_record(offset, read_zxid(buffer, offset), f'record of {txn_len} bytes is truncated', ())
+        if txn_len > 0 and buffer[end - 1:end] != END_OF_RECORD:
+            raise damaged_record(offset, read_zxid(buffer, offset), 'end of record marker is missing',
+                                 buffer_tail(buffer, end))
+        txn = cls.__new__(cls)
+        txn._decode(buffer, offset, scope)
+        return txn
+
+    def _decode(self, buffer, offset, scope=None):
+        self.crc, self.txn_len = TXN_PREFIX_STRUCT.unpack_from(buffer, offset)
+        self.offset = offset
+        self.size = TXN_PREFIX_STRUCT.size + self.txn_len + 1
+        view = buffer if isinstance(buffer, memoryview) else memoryview(buffer)
+        self.record = view[offset:offset + self.size]
+
+        transaction_data = TransactionData(self.record, TXN_PREFIX_STRUCT.size, TXN_PREFIX_STRUCT.size + self.txn_len)
 
         self.header = h = TxnHeader(transaction_data)
-        if h.type == CREATE:
-            self.entry = TxnCreate(transaction_data)
-        elif h.type == DELETE:
-            self.entry = TxnDelete(transaction_data)
-        elif h.type == SETDATA:
-            self.entry = TxnSetData(transaction_data)
-        elif h.type == SETACL:
-            self.entry = TxnSetAcl(transaction_data)
-        elif h.type == SESSIONCREATE:
-            self.entry = TxnSessionCreate(transaction_data)
-        elif h.type == SESSIONCLOSE:
-            self.entry = TxnSessionClose(transaction_data)
-        elif h.type == ERROR:
-            self.entry = TxnError(transaction_data)
+        try:
+            entry_type, keep = txn_types[h.type]
+        except KeyError:
+            raise UnknownType(h.type)
+        self.entry = entry_type(transaction_data) if entry_type else None
+        if scope is None:
+            self.skip = not keep(self.entry)
         elif h.type == MULTI:
-            self.entry = None
+            self.entry.retain(scope)
+            self.skip = not self.entry.kept
         else:
-            raise UnknownType(h.type)
-
-        eor = stream.read(1)
+            self.skip = not keep(self.entry) or not in_scope(self.entry, scope)
 
-        self.transaction_bytes = txn_head + transaction_data.initial + eor
+        # A kept multi with dropped sub-operations is re-encoded, any other kept record is passed through as is
+        self.rewritten_record = None
+        if not self.skip and h.type == MULTI and self.entry.stripped:
+            header_start = TXN_PREFIX_STRUCT.size
+            self.rewritten_record = self.entry.encode_record(
+                self.record[header_start:header_start + TXN_HEADER_STRUCT.size])
 
-        if h.type == SESSIONCREATE or h.type == SESSIONCLOSE or h.type == CREATE and self.entry.ephemeral == 1:
-            self.transaction_bytes = b''
+    @property
+    def transaction_bytes(self):
+        if self.skip:
+            return b''
+        return self.rewritten_record if self.rewritten_record is not None else self.record.tobytes()
 
     def __str__(self):
         return f'{self.header} -- {self.entry}' if self.entry else f'{self.header} -- Unrecognized operation'
@@ -153,10 +305,14 @@ class Txn(object):
 class TxnHeader(object):
 
     def __init__(self, record):
-        s = struct.Struct('>Q I Q Q i')
-        logging.debug('Header bytes are %s.', record)
-        self.client_id, self.cxid, self.zxid, self.time, self.type = s.unpack(record.read(s.size))
-        record.body = record.rest
+        self.client_id, self.cxid, self.zxid, self.time, self.type = record.unpack(TXN_HEADER_STRUCT)
+
+    @classmethod
+    def from_buffer(cls, buffer, offset):
+        header = cls.__new__(cls)
+        header.client_id, header.cxid, header.zxid, header.time, header.type = \
+            TXN_HEADER_STRUCT.unpack_from(buffer, offset)
+        return header
 
     @staticmethod
     def op2type(operation_type):
@@ -168,20 +324,55 @@ class TxnHeader(object):
             self.cxid, self.op2type(self.type))
 
 
+class LazyTxn(object):
+    """
+    Transaction record with only the length/CRC prefix and the header decoded. The body is read from the stream
+    and decoded into a Txn on first access to any of its attributes, e.g. entry, so the stream must stay open
+    while the record is in use.
+    """
+
+    def __init__(self, stream, offset, crc, txn_len, header):
+        self.stream = stream
+        self.offset = offset
+        self.crc = crc
+        self.txn_len = txn_len
+        self.size = TXN_PREFIX_STRUCT.size + txn_len + 1
+        self.header = header
+        self._txn = None
+
+    def load(self):
+        if self._txn is None:
+            position = self.stream.tell()
+            self.stream.seek(self.offset)
+            self._txn = Txn(self.stream)
+            self.stream.seek(position)
+        return self._txn
+
+    def __getattr__(self, name):
+        # Called only for attributes the lazy record does not have, i.e. the ones of the decoded body
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.load(), name)
+
+    def __str__(self):
+        return str(self.load())
+
+
 class TxnEntry(object):
 
     def read_string(self, record):
         length = self.read_int(record)
-        s = struct.Struct(str(length) + 's')
-        string = s.unpack(record.read(s.size))
-        return string
+        if length < 0:
+            return None
+        return str(record.read(length), 'utf-8')
 
     def read_data(self, record):
         length = self.read_int(record)
+        if length < 0:
+            return None
         return record.read(length)
 
     def read_acls(self, record):
-        logging.debug('Read acl')
         count = self.read_int(record)
         return [self.read_acl(record) for _ in range(count)]
 
@@ -191,35 +382,33 @@ class TxnEntry(object):
 
     @staticmethod
     def read_int(record):
-        s = struct.Struct('>i')
-        integer, = s.unpack(record.read(s.size))
+        integer, = record.unpack(INT_STRUCT)
         return integer
 
+    @staticmethod
+    def read_long(record):
+        long, = record.unpack(LONG_STRUCT)
+        return long
+
     @staticmethod
     def read_bool(record):
-        s = struct.Struct('B')
-        boolean = s.unpack(record.read(s.size))
-        return boolean == 0
+        boolean, = record.unpack(BOOL_STRUCT)
+        return boolean != 0
 
 
 class TxnCreate(TxnEntry):
 
     def __init__(self, record):
-        try:
-            self.path = self.read_string(record)
-            self.data = ''
-            self.acls = self.read_acls(record)
-            self.ephemeral = self.read_bool(record)
-        except struct.error:
-            logging.debug('Creation record contains "data", so it should be taken into account when parsing.')
-            record.rest = record.body
-            self.path = self.read_string(record)
-            self.data = self.read_data(record)
-            self.acls = self.read_acls(record)
-            self.ephemeral = self.read_bool(record)
+        self.path = self.read_string(record)
+        self.data = self.read_data(record)
+        self.acls = self.read_acls(record)
+        self.ephemeral = self.read_bool(record)
+        # parentCVersion is absent in records written by servers older than 3.4
+        self.parent_cversion = self.read_int(record) if record.remaining() >= INT_STRUCT.size else -1
 
     def __str__(self):
-        return f"Create path {self.path} data '{self.data}' acls - {self.acls} ephemeral {self.ephemeral}"
+        return f"Create path {self.path} data '{bytes(self.data or b'')}' acls - {self.acls} " \
+               f"ephemeral {self.ephemeral}"
 
 
 class TxnDelete(TxnEntry):
@@ -231,6 +420,33 @@ class TxnDelete(TxnEntry):
         return "Delete path %s" % self.path
 
 
+class TxnCreateContainer(TxnEntry):
+    ephemeral = False
+
+    def __init__(self, record):
+        self.path = self.read_string(record)
+        self.data = self.read_data(record)
+        self.acls = self.read_acls(record)
+        self.parent_cversion = self.read_int(record)
+
+    def __str__(self):
+        return f"CreateContainer path {self.path} data '{bytes(self.data or b'')}' acls - {self.acls}"
+
+
+class TxnCreateTTL(TxnEntry):
+    ephemeral = False
+
+    def __init__(self, record):
+        self.path = self.read_string(record)
+        self.data = self.read_data(record)
+        self.acls = self.read_acls(record)
+        self.parent_cversion = self.read_int(record)
+        self.ttl = self.read_long(record)
+
+    def __str__(self):
+        return f"CreateTTL path {self.path} data '{bytes(self.data or b'')}' acls - {self.acls} ttl {self.ttl}ms"
+
+
 class TxnSetData(TxnEntry):
 
     def __init__(self, record):
@@ -239,7 +455,7 @@ class TxnSetData(TxnEntry):
         self.version = self.read_int(record)
 
     def __str__(self):
-        return f"SetData path {self.path} data '{self.data}' version {self.version}"
+        return f"SetData path {self.path} data '{bytes(self.data or b'')}' version {self.version}"
 
 
 class TxnSetAcl(TxnEntry):
@@ -253,6 +469,16 @@ class TxnSetAcl(TxnEntry):
         return f"SetAcl path {self.path} acls - {self.acls} version {self.version}"
 
 
+class TxnCheckVersion(TxnEntry):
+
+    def __init__(self, record):
+        self.path = self.read_string(record)
+        self.version = self.read_int(record)
+
+    def __str__(self):
+        return f"CheckVersion path {self.path} version {self.version}"
+
+
 class TxnSessionCreate(TxnEntry):
 
     def __init__(self, record):
@@ -271,6 +497,47 @@ class TxnSessionClose(TxnEntry):
         return "SessionClose"
 
 
+class TxnMulti(TxnEntry):
+
+    def __init__(self, record):
+        self.txns = []
+        self.kept = []
+        # Encoded sub-operations, which are copied as is into a re-encoded record
+        self.records = []
+        for _ in range(self.read_int(record)):
+            start = record.offset
+            txn_type = self.read_int(record)
+            data = self.read_data(record)
+            entry_type, keep = txn_types.get(txn_type, (None, None))
+            if entry_type is None or entry_type is TxnMulti:
+                raise UnknownType(txn_type)
+            entry = entry_type(TransactionData(data))
+            self.txns.append((txn_type, entry))
+            self.records.append(record.view[start:record.offset])
+            if keep(entry):
+                self.kept.append(self.records[-1])
+
+    def retain(self, scope):
+        """Keeps only sub-operations on znodes of the scope, the other ones are stripped as dropped."""
+        self.kept = [sub_record for (txn_type, entry), sub_record in zip(self.txns, self.records)
+                     if txn_types[txn_type][1](entry) and in_scope(entry, scope)]
+
+    @property
+    def stripped(self):
+        return len(self.kept) < len(self.txns)
+
+    def encode_record(self, header):
+        """
+        Builds a complete log record of the multi without dropped sub-operations. The digest that may follow
+        the multi is not copied because it no longer matches, ZooKeeper skips the check for records without one.
+        """
+        body = b''.join([header, INT_STRUCT.pack(len(self.kept))] + self.kept)
+        return TXN_PREFIX_STRUCT.pack(zlib.adler32(body), len(body)) + body + END_OF_RECORD
+
+    def __str__(self):
+        return 'Multi [%s]' % ', '.join(str(entry) for _, entry in self.txns)
+
+
 class Acl(TxnEntry):
     def __init__(self, record):
         self.perms = self.read_int(record)
@@ -332,4 +599,126 @@ class TxnError(TxnEntry):
         self.err = self.read_int(record)
 
     def __str__(self):
-        return f'Error {self.errorcodes[self.err]}'
+        return f'Error {self.errorcodes.get(self.err, self.err)}'
+
+
+def read_zxid(buffer, offset):
+    """Returns zxid of the record starting at offset, or None if the record is too short to hold a header."""
+    header_start = offset + TXN_PREFIX_STRUCT.size
+    if header_start + TXN_HEADER_STRUCT.size > len(buffer):
+        return None
+    return TXN_HEADER_STRUCT.unpack_from(buffer, header_start)[2]
+
+
+def scan_transaction_headers(buffer, offset=LOG_FILE_HEADER_STRUCT.size):
+    """
+    Yields offset and header fields (client id, cxid, zxid, time, type) of every record of a log held in buffer
+    up to the end of the stream. Record bodies are skipped without being decoded.
+    """
+    size = len(buffer)
+    while offset + TXN_PREFIX_STRUCT.size + TXN_HEADER_STRUCT.size <= size:
+        txn_len = TXN_PREFIX_STRUCT.unpack_from(buffer, offset)[1]
+        end = offset + TXN_PREFIX_STRUCT.size + txn_len + 1
+        if txn_len <= 0 or end > size:
+            return
+        yield offset, TXN_HEADER_STRUCT.unpack_from(buffer, offset + TXN_PREFIX_STRUCT.size)
+        offset = end
+
+
+def scan_transactions(stream, offset=LOG_FILE_HEADER_STRUCT.size):
+    """
+    Yields LazyTxn for every record of a log stream up to the end of the stream. Only the prefix and the header
+    of a record are read, the stream then seeks past the body, so a scan runs at the speed of the disk.
+    """
+    head_size = TXN_PREFIX_STRUCT.size + TXN_HEADER_STRUCT.size
+    stream.seek(offset)
+    while True:
+        head = stream.read(head_size)
+        if len(head) < TXN_PREFIX_STRUCT.size:
+            return
+        crc, txn_len = TXN_PREFIX_STRUCT.unpack_from(head)
+        if txn_len <= 0 or len(head) < head_size:
+            return
+        yield LazyTxn(stream, offset, crc, txn_len, TxnHeader.from_buffer(head, TXN_PREFIX_STRUCT.size))
+        offset += TXN_PREFIX_STRUCT.size + txn_len + 1
+        stream.seek(offset)
+
+
+def verify_transaction_log(buffer, offset=LOG_FILE_HEADER_STRUCT.size):
+    """
+    Checks Adler-32 checksums of all records of a log held in buffer, e.g. a memoryview of a mmapped file,
+    up to the end of the stream. Only record prefixes are decoded, so the check runs at the speed of zlib.
+    Raises CorruptTransaction for the first record whose body does not match its checksum, unless only zeros follow
+    the record, which ends the stream the same way as for Txn(stream).
+    *Returns:*\n
+        int - number of verified records
+    """
+    size = len(buffer)
+    records = 0
+    while offset + TXN_PREFIX_STRUCT.size <= size:
+        crc, txn_len = TXN_PREFIX_STRUCT.unpack_from(buffer, offset)
+        if not txn_len:
+            break
+        body_start = offset + TXN_PREFIX_STRUCT.size
+        end = body_start + txn_len + 1
+        if txn_len < 0:
+            raise CorruptTransaction(offset, read_zxid(buffer, offset), f'negative record length {txn_len}')
+        try:
+            if end > size:
+                raise damaged_record(offset, read_zxid(buffer, offset), f'record of {txn_len} bytes is truncated', ())
+            if zlib.adler32(buffer[body_start:body_start + txn_len]) != crc:
+                raise damaged_record(offset, read_zxid(buffer, offset), f'checksum mismatch, expected {crc}',
+                                     buffer_tail(buffer, end))
+            if buffer[end - 1:end] != END_OF_RECORD:
+                raise damaged_record(offset, read_zxid(buffer, offset), 'end of record marker is missing',
+                                     buffer_tail(buffer, end))
+        except EOS:
+            break
+        offset = end
+        records += 1
+    return records
+
+
+def keep_transaction(entry):
+    return True
+
+
+def drop_transaction(entry):
+    return False
+
+
+def keep_persistent_node(entry):
+    return not entry.ephemeral
+
+
+def keep_multi(entry):
+    return bool(entry.kept) or not entry.txns
+
+
+def in_scope(entry, scope):
+    # Records without a path, e.g. errors of failed operations, change no znodes of the scope
+    path = getattr(entry, 'path', None)
+    return path is not None and scope.matches(path)
+
+
+# Transaction types written to the log by ZooKeeper 3.6 - 3.9 servers, mapped to the entry that decodes the record
+# body and the policy deciding whether the record is kept in a filtered log. Session records and ephemeral nodes are
+# bound to client sessions, which do not survive a restore, so ephemeral creates are also stripped from multi records.
+# Reconfig records are dropped because ensemble membership of the restored cluster is defined by its own
+# configuration rather than by the backup.
+txn_types = {
+    SESSIONCREATE: (TxnSessionCreate, drop_transaction),
+    SESSIONCLOSE: (TxnSessionClose, drop_transaction),
+    ERROR: (TxnError, keep_transaction),
+    CREATE: (TxnCreate, keep_persistent_node),
+    CREATE2: (TxnCreate, keep_persistent_node),
+    CREATECONTAINER: (TxnCreateContainer, keep_transaction),
+    CREATETTL: (TxnCreateTTL, keep_transaction),
+    DELETE: (TxnDelete, keep_transaction),
+    DELETECONTAINER: (TxnDelete, keep_transaction),
+    SETDATA: (TxnSetData, keep_transaction),
+    RECONFIG: (TxnSetData, drop_transaction),
+    SETACL: (TxnSetAcl, keep_transaction),
+    CHECK: (TxnCheckVersion, keep_transaction),
+    MULTI: (TxnMulti, keep_multi),
+}
@@ -0,0 +1,61 @@
+# Copyright 2024-2025 NetCracker Technology Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Children of a trie node that is the root of a selected subtree are not stored, every path below it matches
+SUBTREE = None
+
+
+class PathPrefixTrie(object):
+    """
+    Set of znode subtrees given by their root paths, compiled into a trie of path components, so a path is checked
+    against all subtrees in one walk over its components instead of one prefix comparison per subtree.
+    Ancestors of the subtrees match as well, since the subtrees can not be restored without them.
+    """
+
+    def __init__(self, paths):
+        self.paths = sorted({f'/{path.strip("/")}' for path in paths})
+        self.root = {}
+        for path in self.paths:
+            self.add(path)
+
+    def add(self, path):
+        names = [name for name in path.split('/') if name]
+        if not names:
+            self.root = SUBTREE
+            return
+        node = self.root
+        for name in names[:-1]:
+            if node is SUBTREE:
+                return
+            node = node.setdefault(name, {})
+            if node is SUBTREE:
+                return
+        if node is not SUBTREE:
+            node[names[-1]] = SUBTREE
+
+    def matches(self, path):
+        """Returns True for a znode in one of the subtrees or for an ancestor of one of them."""
+        node = self.root
+        if node is SUBTREE or path == '/':
+            return True
+        for name in path[1:].split('/'):
+            if name not in node:
+                return False
+            node = node[name]
+            if node is SUBTREE:
+                return True
+        return True
+
+    def __str__(self):
+        return ', '.join(self.paths)
@@ -13,85 +13,494 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import locale
 import logging
+import queue
 import re
 import shutil
+import threading
+import time
 import zipfile
 import os
+from collections import deque
 
+from kazoo.exceptions import KazooException, NoNodeError, RolledBackError, RuntimeInconsistency
+from kazoo.security import ACL, Id
 
-def backup(client, storage_folder, znodes):
+from parse_snapshot import StatPersisted
+from znode_archive import ARCHIVE_FILE, DEFAULT_COMPRESSION_LEVEL, ZnodeArchiveWriter, get_root_name, \
+    read_archive_index, read_znode_archive
+from znode_tree import OPEN_ACL
+
+DEFAULT_TRAVERSAL_WINDOW = 256
+ZIP_FORMAT = 'zip'
+STREAM_FORMAT = 'stream'
+ZOOKEEPER_ROOT = 'zookeeper'
+# Entries of znodes.zip waiting for compression, the traversal waits when the writer falls behind
+ZIP_WRITER_QUEUE_SIZE = 4096
+ZIP_CONTENT_ENCODING = locale.getpreferredencoding(False)
+# Unix modes of the entries in the upper bits as make_archive() writes them, directories are marked for MS-DOS too
+DIRECTORY_ATTRIBUTES = (0o40755 << 16) | 0x10
+FILE_ATTRIBUTES = 0o100644 << 16
+# Requests larger than jute.maxbuffer of the server, 1 MB by default, are rejected, so half of it is used by default
+DEFAULT_RESTORE_BATCH_SIZE = 512 * 1024
+# Header, lengths, flags and open ACL of a create operation of a multi request in addition to its path and data
+CREATE_OPERATION_SIZE = 64
+# Pause of a session that has nothing to request and nothing to steal while other sessions walk their subtrees
+IDLE_INTERVAL = 0.01
+
+
+class ZnodeTreeTraversal(object):
+    """
+    Walks znode subtrees of a live ensemble with asynchronous requests and passes znodes to the sink. Data and
+    children of a znode are requested together, as well as ACLs when the sink stores them, and requests for up to
+    window znodes are outstanding on the session at once, so the walk is bound by the throughput of the ensemble rather
+    than by the round trip time. Ephemeral znodes are not stored, as well as znodes that are deleted while the tree
+    is walked.
+    """
+
+    def __init__(self, zk, sink, window=DEFAULT_TRAVERSAL_WINDOW, server=None):
+        self.zk = zk
+        self.server = server
+        self.sink = sink
+        self.window = max(1, window)
+        # Paths to request, taken from the end, so the walk goes depth first and the list stays short
+        self.pending = deque()
+        # Responses are completed by the event thread of the client and processed by the walking thread
+        self.completed = queue.Queue()
+        self.in_flight = 0
+        self.stored = 0
+        self.skipped = 0
+        self.duration = 0.0
+
+    def visit(self, root):
+        started = time.perf_counter()
+        self.pending.append(root)
+        try:
+            while self.pending or self.in_flight:
+                while self.pending and self.in_flight < self.window:
+                    self.request(self.pending.pop())
+                path, *responses = self.completed.get()
+                self.in_flight -= 1
+                self.process(path, *responses, path == root)
+        finally:
+            self.duration += time.perf_counter() - started
+
+    def walk(self, shared):
+        """
+        Walks the tree together with the other traversals of the shared walk. When the traversal has no pending
+        paths, it steals the oldest pending path of the most loaded traversal, i.e. the root of the largest
+        unvisited subtree, so sessions stay busy until the whole tree is walked.
+        """
+        started = time.perf_counter()
+        try:
+            while not shared.is_done():
+                while self.in_flight < self.window:
+                    path = self.take() or self.steal(shared.traversals)
+                    if path is None:
+                        break
+                    self.request(path)
+                if not self.in_flight:
+                    time.sleep(IDLE_INTERVAL)
+                    continue
+                path, *responses = self.completed.get()
+                self.in_flight -= 1
+                self.process(path, *responses, path in shared.roots, shared)
+                shared.complete()
+        except Exception as e:
+            shared.fail(e)
+        finally:
+            self.duration += time.perf_counter() - started
+
+    def take(self):
+        try:
+            return self.pending.pop()
+        except IndexError:
+            return None
+
+    def steal(self, traversals):
+        victim = max(traversals, key=lambda traversal: len(traversal.pending))
+        try:
+            return victim.pending.popleft()
+        except IndexError:
+            return None
+
+    def request(self, path):
+        data = self.zk.get_async(path)
+        children = self.zk.get_children_async(path)
+        acls = self.zk.get_acls_async(path) if self.sink.acls else None
+        # Responses of a session arrive in the order of requests, so the last one completes the znode
+        last = children if acls is None else acls
+        last.rawlink(lambda result: self.completed.put((path, data, children, acls)))
+        self.in_flight += 1
+
+    def process(self, path, data, children, acls, is_root, shared=None):
+        try:
+            value, stat = data.get()
+            names = children.get()
+            if acls is not None:
+                acls, _ = acls.get()
+        except NoNodeError:
+            if is_root:
+                raise
+            logging.debug(f"Node '{path}' is deleted during backup, it is skipped.")
+            self.skipped += 1
+            return
+        logging.debug(f"Node '{path}' has {len(names)} children, owner is {stat.ephemeralOwner}.")
+        if stat.ephemeralOwner:
+            self.skipped += 1
+            return
+        if acls is None:
+            self.sink.store(path, value)
+        else:
+            self.sink.store(path, value, get_stat_persisted(stat),
+                            tuple((acl.perms, acl.id.scheme, acl.id.id) for acl in acls))
+        self.stored += 1
+        separator = "" if path == "/" else "/"
+        # Children are counted before they can be stolen and completed by other sessions
+        if shared is not None:
+            shared.add(len(names))
+        self.pending.extend(f'{path}{separator}{child}' for child in names)
+
+    def __str__(self):
+        throughput = self.stored / self.duration if self.duration else 0.0
+        return f'{self.stored} znodes are stored in {self.duration:.3f}s ({throughput:.1f} znodes/s), ' \
+               f'{self.skipped} ephemeral or deleted znodes are skipped'
+
+
+class SharedTreeWalk(object):
+    """
+    Traversals that walk the tree on several sessions, one thread per session. The walk is done when no path is
+    pending or requested by any of them, or when one of them fails.
+    """
+
+    def __init__(self, traversals, roots):
+        self.traversals = traversals
+        self.roots = set(roots)
+        self.lock = threading.Lock()
+        self.outstanding = len(roots)
+        self.failure = None
+        traversals[0].pending.extend(reversed(roots))
+
+    def add(self, count):
+        with self.lock:
+            self.outstanding += count
+
+    def complete(self):
+        # Children are counted before their parent is uncounted, so the count drops to zero only at the end
+        with self.lock:
+            self.outstanding -= 1
+
+    def fail(self, failure):
+        with self.lock:
+            if self.failure is None:
+                self.failure = failure
+
+    def is_done(self):
+        return self.outstanding == 0 or self.failure is not None
+
+    def run(self):
+        started = time.perf_counter()
+        threads = [threading.Thread(target=traversal.walk, args=(self,), daemon=True) for traversal in self.traversals]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if self.failure is not None:
+            raise self.failure
+        duration = time.perf_counter() - started
+        stored = sum(traversal.stored for traversal in self.traversals)
+        skipped = sum(traversal.skipped for traversal in self.traversals)
+        logging.info(f'{stored} znodes are stored in {duration:.3f}s ({stored / duration if duration else 0.0:.1f} '
+                     f'znodes/s) by {len(self.traversals)} sessions, {skipped} ephemeral or deleted znodes are '
+                     f'skipped.')
+        for number, traversal in enumerate(self.traversals):
+            logging.info(f"Session {number} to '{traversal.server or 'service'}': {traversal}.")
+
+
+class ZnodeZipWriter(object):
+    """
+    Sink that writes znodes.zip in the layout of a directory per znode with the content file of its data, without
+    creating the directories on disk. Entries are compressed and written by a background thread, so compression
+    overlaps with reading znodes. The archive is written under a temporary name and renamed by finish().
+    """
+    acls = False
+
+    def __init__(self, file_name, compression_level=DEFAULT_COMPRESSION_LEVEL):
+        self.file_name = file_name
+        compression = zipfile.ZIP_DEFLATED if compression_level else zipfile.ZIP_STORED
+        self.archive = zipfile.ZipFile(f'{file_name}.partial', 'w', compression,
+                                       compresslevel=compression_level if compression_level else None)
+        self.entries = queue.Queue(ZIP_WRITER_QUEUE_SIZE)
+        self.failure = None
+        self.finished = False
+        self.writer = threading.Thread(target=self.write_entries, daemon=True)
+        self.writer.start()
+
+    def store(self, path, data, stat=None, acls=None):
+        if self.failure is not None:
+            raise self.failure
+        self.entries.put((path, data))
+
+    def write_entries(self):
+        while True:
+            entry = self.entries.get()
+            if entry is None:
+                return
+            # Entries are taken after a failure as well, so the traversal is not blocked on the full queue
+            if self.failure is None:
+                try:
+                    self.write_entry(*entry)
+                except Exception as e:
+                    self.failure = e
+
+    def write_entry(self, path, data):
+        # Paths of znodes given without the leading slash are stored the same way
+        name = path.strip('/')
+        if name:
+            self.write_directory(f'{name}/')
+        content_name = f'{name}/content' if name else 'content'
+        # A znode of overlapping subtrees, e.g. 'a' and 'a/b', is stored once
+        if data and content_name not in self.archive.NameToInfo:
+            # Data is stored as make_archive() stored content files written in text mode, restore reads them back
+            info = zipfile.ZipInfo(content_name, time.localtime()[:6])
+            info.compress_type = self.archive.compression
+            info.external_attr = FILE_ATTRIBUTES
+            # The level of the archive is applied only to entries written by name, it is passed for ZipInfo explicitly
+            self.archive.writestr(info, data.decode('cp437').encode(ZIP_CONTENT_ENCODING),
+                                  compresslevel=self.archive.compresslevel)
+
+    def write_directory(self, name):
+        # Directories of overlapping subtrees and of ancestors written before are not written again
+        if name in self.archive.NameToInfo:
+            return
+        # Ancestors of the stored subtrees are written as well, as make_archive() does
+        parent = name[:-1].rpartition('/')[0]
+        if parent:
+            self.write_directory(f'{parent}/')
+        info = zipfile.ZipInfo(name, time.localtime()[:6])
+        info.external_attr = DIRECTORY_ATTRIBUTES
+        self.archive.writestr(info, b'')
+
+    def stop_writer(self):
+        if self.writer.is_alive():
+            self.entries.put(None)
+            self.writer.join()
+
+    def finish(self):
+        self.stop_writer()
+        if self.failure is not None:
+            raise self.failure
+        self.archive.close()
+        os.replace(f'{self.file_name}.partial', self.file_name)
+        self.finished = True
+
+    def close(self):
+        if not self.finished:
+            self.stop_writer()
+            self.archive.close()
+            os.remove(f'{self.file_name}.partial')
+
+
+def open_znode_sink(storage_folder, archive_format=ZIP_FORMAT, compression_level=DEFAULT_COMPRESSION_LEVEL):
+    """
+    *Args:*\n
+        _storage_folder_ (str) - folder of the backup;\n
+        _archive_format_ (str) - 'zip' for znodes.zip of directories or 'stream' for the single file znodes.bin;\n
+        _compression_level_ (int) - zlib level of znodes.zip entries or znodes.bin blocks, 0 to store them
+        uncompressed;\n
+    *Returns:*\n
+        sink that stores znodes with store(), writes the archive with finish() and cleans up with close()
+    """
+    if archive_format == STREAM_FORMAT:
+        return ZnodeArchiveWriter(f'{storage_folder}/{ARCHIVE_FILE}', compression_level)
+    if archive_format != ZIP_FORMAT:
+        raise ValueError(f"Unknown format '{archive_format}' of hierarchical backup, '{ZIP_FORMAT}' or "
+                         f"'{STREAM_FORMAT}' is expected.")
+    return ZnodeZipWriter(f'{storage_folder}/znodes.zip', compression_level)
+
+
+def get_stat_persisted(stat):
+    return StatPersisted(stat.czxid, stat.mzxid, stat.ctime, stat.mtime, stat.version, stat.cversion, stat.aversion,
+                         stat.ephemeralOwner, stat.pzxid)
+
+
+def backup(client, storage_folder, znodes, window=DEFAULT_TRAVERSAL_WINDOW, archive_format=ZIP_FORMAT,
+           compression_level=DEFAULT_COMPRESSION_LEVEL):
     zk = client.connect_to_zookeeper()
-    znodes_folder = f'{storage_folder}/znodes'
+    sink = None
     try:
-        os.makedirs(znodes_folder)
-        if not znodes:
-            visit_nodes(zk, "/", znodes_folder)
-        else:
-            for znode in znodes:
-                visit_nodes(zk, znode, f'{znodes_folder}/')
-        shutil.make_archive(znodes_folder, 'zip', znodes_folder)
+        sink = open_znode_sink(storage_folder, archive_format, compression_level)
+        traversal = ZnodeTreeTraversal(zk, sink, window)
+        for znode in znodes or ["/"]:
+            traversal.visit(znode)
+        logging.info(f'Znode tree is walked with up to {traversal.window} znodes requested at once, {traversal}.')
+        sink.finish()
     finally:
         client.disconnect_from_zookeeper(zk)
-        if os.path.isdir(znodes_folder):
-            shutil.rmtree(znodes_folder)
+        if sink is not None:
+            sink.close()
 
 
-def visit_nodes(zk, path, storage_folder):
-    logging.debug(f'On node {path}.')
-    children = zk.get_children(path)
-    logging.debug(f"Node '{path}' has {len(children)} children.")
-    node_value = zk.get(path)
-    value = node_value[0]
-    data = node_value[1]
-    logging.debug(f'Node value is [{value}], [{data}].')
-    ephemeral_owner = data.ephemeralOwner
-    logging.debug(f'Owner is {ephemeral_owner}.')
-    if not ephemeral_owner:
-        store_data(path, value, storage_folder)
+def parallel_backup(client, storage_folder, znodes, servers, sessions, window=DEFAULT_TRAVERSAL_WINDOW,
+                    archive_format=ZIP_FORMAT, compression_level=DEFAULT_COMPRESSION_LEVEL):
+    """
+    Stores znodes in the same layout as backup() does, walking the tree on several sessions in parallel.
+    *Args:*\n
+        _client_ (ZooKeeperClient) - ZooKeeper client;\n
+        _storage_folder_ (str) - folder of the backup;\n
+        _znodes_ (list) - root znodes to store, the whole tree when empty;\n
+        _servers_ (list) - servers to connect sessions to in turn, None stands for the service address;\n
+        _sessions_ (int) - number of sessions;\n
+        _window_ (int) - number of znodes requested at once on each session (optional);\n
+        _archive_format_ (str) - format of the archive, see open_znode_sink() (optional);\n
+        _compression_level_ (int) - compression level of the archive (optional);\n
+    """
+    connections = []
+    sink = None
+    try:
+        sink = open_znode_sink(storage_folder, archive_format, compression_level)
+        traversals = []
+        for number in range(sessions):
+            server = servers[number % len(servers)]
+            connections.append(client.connect_to_zookeeper(server))
+            traversals.append(ZnodeTreeTraversal(connections[-1], sink, window, server))
+        SharedTreeWalk(traversals, list(znodes) if znodes else ["/"]).run()
+        sink.finish()
+    finally:
+        for zk in connections:
+            client.disconnect_from_zookeeper(zk)
+        if sink is not None:
+            sink.close()
 
-        for child in children:
-            separator = "" if path == "/" else "/"
-            new_path = f'{path}{separator}{child}'
-            visit_nodes(zk, new_path, storage_folder)
 
+def backup_from_tree(tree, storage_folder, znodes, archive_format=ZIP_FORMAT,
+                     compression_level=DEFAULT_COMPRESSION_LEVEL):
+    """
+    Stores znodes of an in-memory tree built from a snapshot and transaction logs in the same layout
+    as backup() does by traversing the live ensemble.
+    """
+    sink = open_znode_sink(storage_folder, archive_format, compression_level)
+    try:
+        roots = [f'/{znode.strip("/")}' for znode in znodes] if znodes else ['/']
+        for root in roots:
+            if tree.get(root) is None:
+                raise Exception(f"Znode '{root}' doesn't exist, it can't be backed up.")
+            for path, node in tree.walk_nodes(root):
+                sink.store(path, tree.get_data(node), tree.get_stat(node), tree.get_acl(node))
+        sink.finish()
+    finally:
+        sink.close()
 
-def store_data(path, value, storage_folder):
-    fpath = f'{storage_folder}{path}'
-    logging.debug(f'Path is {fpath}.')
 
-    try:
-        if not os.path.exists(fpath):
-            os.makedirs(fpath)
-    except OSError:
-        logging.error(f'Creation of the directory {fpath} failed.')
-        return
-    else:
-        logging.debug(f'The directory {fpath} is created successfully.')
+class BulkRestore(object):
+    """
+    Creates znodes in multi transactions of up to batch_size bytes instead of one request per znode. Znodes have to be
+    passed parents first, a batch is committed when it is full or on flush(). When an operation of a batch fails,
+    it is reported and the rest of the batch is committed again without it. When the whole request is rejected, e.g.
+    because it exceeds jute.maxbuffer, the batch is split in halves that are committed on their own until the failing
+    znode is found. Children of znodes that are not restored are skipped.
+    """
+
+    def __init__(self, zk, batch_size=DEFAULT_RESTORE_BATCH_SIZE):
+        self.zk = zk
+        self.batch_size = batch_size
+        self.batch = []
+        self.size = 0
+        self.restored = 0
+        self.errors = 0
+        self.not_restored = set()
+
+    def create(self, path, data):
+        size = CREATE_OPERATION_SIZE + len(path.encode('utf-8')) + len(data)
+        if self.batch and self.size + size > self.batch_size:
+            self.flush()
+        self.batch.append((path, data))
+        self.size += size
+
+    def flush(self):
+        batch = self.batch
+        self.batch = []
+        self.size = 0
+        self.commit(self.without_skipped(batch))
+
+    def commit(self, batch):
+        while batch:
+            try:
+                transaction = self.zk.transaction()
+                for path, data in batch:
+                    transaction.create(path, data)
+                results = transaction.commit()
+            except KazooException as e:
+                if len(batch) == 1:
+                    self.fail(batch[0][0], e)
+                    return
+                logging.debug(f'Batch of {len(batch)} znodes is rejected: {e!r}, it is split in halves.')
+                middle = len(batch) // 2
+                self.commit(batch[:middle])
+                self.commit(self.without_skipped(batch[middle:]))
+                return
+            # Operations before the failed one are rolled back and the following ones are not run
+            failed = next((number for number, result in enumerate(results) if isinstance(result, Exception)
+                           and not isinstance(result, (RolledBackError, RuntimeInconsistency))), None)
+            if failed is None:
+                self.restored += len(batch)
+                logging.debug(f'Batch of {len(batch)} znodes is restored, the last one is {batch[-1][0]}.')
+                return
+            self.fail(batch[failed][0], results[failed])
+            batch = self.without_skipped(batch[:failed] + batch[failed + 1:])
+
+    def fail(self, path, error):
+        logging.error(f"znode {path} isn't restored: {error!r}.")
+        self.errors += 1
+        self.not_restored.add(path)
 
-    if value:
-        cpath = f'{fpath}/content'
-        logging.debug(f'Path for file is {cpath}.')
-        f = open(cpath, 'w')
-        f.write(value.decode("cp437"))
-        f.close()
+    def without_skipped(self, batch):
+        kept = []
+        for path, data in batch:
+            if (path.rpartition('/')[0] or '/') in self.not_restored:
+                logging.debug(f"znode {path} isn't restored, its parent is not restored.")
+                self.not_restored.add(path)
+            else:
+                kept.append((path, data))
+        return kept
 
+    def __str__(self):
+        return f'{self.restored} znodes are restored, {self.errors} znodes failed, ' \
+               f'{len(self.not_restored) - self.errors} of their children are skipped'
 
-def restore(client, nodes_to_restore, storage_folder):
+
+def delete_existing_znode(zk, znode, bulk):
+    try:
+        if zk.exists(znode):
+            logging.debug(f'znode {znode} exists already, deleting it.')
+            zk.delete(znode, recursive=True)
+            logging.debug(f'znode {znode} deleted.')
+    except KazooException as e:
+        bulk.fail(znode, e)
+
+
+def restore(client, nodes_to_restore, storage_folder, batch_size=DEFAULT_RESTORE_BATCH_SIZE):
     zk = client.connect_to_zookeeper()
     znodes_folder = f'{storage_folder}/znodes'
+    bulk = BulkRestore(zk, batch_size)
     try:
-        if os.path.isfile(f'{znodes_folder}.zip'):
+        if os.path.isfile(f'{storage_folder}/{ARCHIVE_FILE}'):
+            restore_from_znode_archive(bulk, nodes_to_restore, f'{storage_folder}/{ARCHIVE_FILE}')
+        elif os.path.isfile(f'{znodes_folder}.zip'):
             if not nodes_to_restore:
                 nodes_to_restore = get_znodes_list_from_archive(znodes_folder)
             for znode in nodes_to_restore:
                 extract_znode_from_archive(znode, znodes_folder)
-                visit_nodes_while_restoring(zk, znode, znodes_folder)
+                visit_nodes_while_restoring(bulk, znode, znodes_folder)
         else:
             if not nodes_to_restore:
                 raise Exception('Restoring operation requires specifying nodes to recover.')
             for node in nodes_to_restore:
-                visit_nodes_while_restoring(zk, node, storage_folder)
+                visit_nodes_while_restoring(bulk, node, storage_folder)
+        logging.info(f'Znodes are restored in batches of up to {batch_size} bytes, {bulk}.')
+        if bulk.errors:
+            raise Exception(f'Restore is incomplete, {bulk.errors} znodes failed.')
     finally:
         client.disconnect_from_zookeeper(zk)
         if os.path.isdir(znodes_folder):
@@ -101,10 +510,46 @@ def restore(client, nodes_to_restore, storage_folder):
 def get_znodes_list_from_archive(znodes_folder):
     with zipfile.ZipFile(f'{znodes_folder}.zip') as file:
         nodes_to_restore = [x[:-1] for x in file.namelist() if re.fullmatch(r'^[^/]+/$', x)]
-    nodes_to_restore.remove("zookeeper")
+    nodes_to_restore.remove(ZOOKEEPER_ROOT)
     return nodes_to_restore
 
 
+def restore_from_znode_archive(bulk, nodes_to_restore, archive_file):
+    """
+    Restores znodes from znodes.bin in one sequential pass over the archive, the records are stored parents first.
+    Each restored znode that exists already is deleted with its children first.
+    *Args:*\n
+        _bulk_ (BulkRestore) - creator of znodes;\n
+        _nodes_to_restore_ (list) - znodes to restore with their children, all root znodes when empty;\n
+        _archive_file_ (str) - path to znodes.bin;\n
+    """
+    if nodes_to_restore:
+        roots = {f'/{node.strip("/")}' for node in nodes_to_restore}
+    else:
+        roots = {f'/{root}' for root in read_archive_index(archive_file).roots if root and root != ZOOKEEPER_ROOT}
+    # ACLs that may forbid creating children are set after all znodes are created, children first
+    acls = []
+    for record in read_znode_archive(archive_file, {get_root_name(root) for root in roots}):
+        path = record.path
+        if record.ephemeral or not any(path == root or path.startswith(f'{root}/') for root in roots):
+            continue
+        if path in roots:
+            delete_existing_znode(bulk.zk, path, bulk)
+            if path in bulk.not_restored:
+                continue
+        bulk.create(path, record.data or b'')
+        if record.acls != OPEN_ACL:
+            acls.append(record)
+    bulk.flush()
+    for record in reversed(acls):
+        if record.path in bulk.not_restored:
+            continue
+        try:
+            bulk.zk.set_acls(record.path, [ACL(perms, Id(scheme, acl_id)) for perms, scheme, acl_id in record.acls])
+        except KazooException as e:
+            logging.error(f"ACL of znode {record.path} isn't restored: {e!r}.")
+
+
 def extract_znode_from_archive(znode, znodes_folder):
     with zipfile.ZipFile(f'{znodes_folder}.zip') as archive:
         for file in archive.namelist():
@@ -112,29 +557,25 @@ def extract_znode_from_archive(znode, znodes_folder):
                 archive.extract(file, f'{znodes_folder}/')
 
 
-def visit_nodes_while_restoring(zk, node, storage_folder):
-    num_restored = 0
+def visit_nodes_while_restoring(bulk, node, storage_folder):
     path_to_node = f'{storage_folder}/{node}'
     logging.debug(f'Path to node {node} is {path_to_node}.')
+    # Directories are walked top down, so parents are created before their children
     for root, dirs, files in os.walk(path_to_node):
         logging.debug(f'Root is [{root}], dirs are [{dirs}], files are [{files}].')
         znode = "/" + os.path.relpath(root, storage_folder)
-        logging.debug(f'znode is {znode}.')
-        if zk.exists(znode):
-            logging.debug(f'znode {znode} exists already, deleting it.')
-            zk.delete(znode, recursive=True)
-            logging.debug(f'znode {znode} deleted.')
+        if root == path_to_node:
+            delete_existing_znode(bulk.zk, znode, bulk)
+            if znode in bulk.not_restored:
+                return
         data = ""
         if "content" in files:
-            f = open(f'{root}/content', 'r')
-            data = f.read()
-            f.close()
+            with open(f'{root}/content', 'r') as f:
+                data = f.read()
         try:
-            zk.create(znode, data.encode("cp437"))
-        except:
-            logging.error(f"znode {znode} isn't restored.")
-        else:
-            logging.debug(f'znode {znode} is restored with value {data}.')
-            num_restored = num_restored + 1
-
-    logging.debug(f'{num_restored} znode(s) is(are) restored.')
+            value = data.encode("cp437")
+        except UnicodeEncodeError as e:
+            bulk.fail(znode, e)
+            continue
+        bulk.create(znode, value)
+    bulk.flush()
@@ -14,16 +14,40 @@
 # limitations under the License.
 
 import logging
+import math
+import mmap
 import os
+import re
+import struct
 import sys
 import time
+from concurrent.futures import ProcessPoolExecutor
 from os.path import join, isfile
 from shutil import copy2, rmtree
 
-from parse_transaction_logs import LogFileHeader, Txn, END_OF_STREAM, EOS, UnknownType
+from parse_snapshot import Snapshot, SnapshotOutputStream, open_snapshot_file, SNAPSHOT_FILE_HEADER_STRUCT, \
+    NODE_TAIL_STRUCT, END_OF_NODES, GZIP_SUFFIX
+from parse_transaction_logs import LogFileHeader, Txn, TxnHeader, END_OF_STREAM, EOS, UnknownType, \
+    LOG_FILE_HEADER_STRUCT, TXN_PREFIX_STRUCT, CorruptTransaction, verify_transaction_log, read_zxid, \
+    scan_transaction_headers, scan_transactions
+from path_trie import PathPrefixTrie
+from transaction_log_index import TransactionLogIndex, get_index_file, read_index
 
+OUTPUT_BUFFER_SIZE = 4 * 1024 * 1024
+SCAN_BUFFER_SIZE = 64 * 1024
 
-def get_snapshot_and_transaction_logs(directory):
+# Quotas and the ensemble configuration of ZooKeeper
+ZOOKEEPER_SYSTEM_ZNODE = '/zookeeper'
+
+SNAPSHOT_FILE_PATTERN = re.compile(r'^snapshot\.[0-9a-fA-F]+(\.\w+)?$')
+TRANSACTION_LOG_FILE_PATTERN = re.compile(r'^log\.[0-9a-fA-F]+$')
+
+
+def get_snapshot_and_transaction_logs(directory, after_zxid=None):
+    """
+    Finds the last snapshot in the directory and transaction logs with transactions after its zxid,
+    or after after_zxid when it is set, e.g. to continue from transactions that are already backed up.
+    """
     logging.debug('Start to get snapshot and transaction logs.')
     snapshots = []
     transaction_logs = []
@@ -31,71 +55,409 @@ def get_snapshot_and_transaction_logs(directory):
     for file_name in os.listdir(directory):
         file_path = join(directory, file_name)
         if isfile(file_path):
-            if 'snapshot.' in file_name:
+            if SNAPSHOT_FILE_PATTERN.match(file_name):
                 snapshots.append(file_path)
-            if 'log.' in file_name:
+            if TRANSACTION_LOG_FILE_PATTERN.match(file_name):
                 transaction_logs.append(file_path)
 
     if not snapshots:
         logging.error('There are no snapshots in ZooKeeper to perform backup.')
         sys.exit(1)
 
-    # Find last created snapshot by modification time
-    last_snapshot = snapshots[0]
-    last_snapshot_stat_info = os.stat(last_snapshot)
-    for snapshot in snapshots:
-        snapshot_stat_info = os.stat(snapshot)
-        if snapshot_stat_info.st_mtime > last_snapshot_stat_info.st_mtime:
-            last_snapshot = snapshot
-            last_snapshot_stat_info = snapshot_stat_info
-
+    # Find last snapshot by the zxid it is taken at, modification times are not preserved reliably by copying
+    last_snapshot = max(snapshots, key=get_zxid_from_file_name)
+    snapshot_zxid = get_zxid_from_file_name(last_snapshot)
     logging.info(f'Last created snapshot is {last_snapshot}.')
 
-    # Find actual transaction logs that were written after last snapshot creation
-    actual_transaction_logs = []
-    for transaction_log in transaction_logs:
-        transaction_log_stat_info = os.stat(transaction_log)
-        if transaction_log_stat_info.st_mtime > last_snapshot_stat_info.st_mtime:
-            actual_transaction_logs.append(transaction_log)
+    # Find transaction logs with transactions after the snapshot: the log that starts at or just before
+    # the snapshot zxid, since it may contain the following transactions, and all logs that start after it
+    start_zxid = snapshot_zxid if after_zxid is None else after_zxid
+    transaction_logs.sort(key=get_zxid_from_file_name)
+    first_log = 0
+    for position, transaction_log in enumerate(transaction_logs):
+        if get_zxid_from_file_name(transaction_log) <= start_zxid:
+            first_log = position
+    actual_transaction_logs = transaction_logs[first_log:]
 
     logging.debug(f'Actual transaction logs are {actual_transaction_logs}.')
     return last_snapshot, actual_transaction_logs
 
 
-def filter_and_store_transaction_logs(transaction_logs_files, storage_folder):
+def check_transaction_logs_continuity(snapshot, transaction_logs, start_zxid=None):
+    """
+    Checks that the logs contain every transaction after the snapshot zxid, or after start_zxid when it is set,
+    up to the last logged one, scanning only record headers. Zxids must grow by one, except for the first
+    transaction of a new epoch. Raises an exception describing the first gap or overlap, since the backup
+    could not be restored.
+    """
+    snapshot_zxid = previous_zxid = get_zxid_from_file_name(snapshot) if start_zxid is None else start_zxid
+    for transaction_log in sorted(transaction_logs, key=get_zxid_from_file_name):
+        with open(transaction_log, 'rb', buffering=SCAN_BUFFER_SIZE) as stream:
+            for transaction in scan_transactions(stream):
+                zxid = transaction.header.zxid
+                if zxid <= previous_zxid:
+                    if previous_zxid == snapshot_zxid:
+                        # The first log may start before the snapshot zxid, such transactions are in the snapshot
+                        continue
+                    raise Exception(f"Transaction log '{transaction_log}' has transaction 0x{zxid:x} "
+                                    f"after 0x{previous_zxid:x}, transactions overlap.")
+                if zxid != previous_zxid + 1 and not is_new_epoch_start(previous_zxid, zxid):
+                    raise Exception(f"Transaction log '{transaction_log}' continues with transaction 0x{zxid:x} "
+                                    f"after 0x{previous_zxid:x}, transactions between them are missing.")
+                previous_zxid = zxid
+        logging.debug(f"Transaction log '{transaction_log}' is continuous up to 0x{previous_zxid:x}.")
+    start = f'snapshot {os.path.basename(snapshot)}' if start_zxid is None else f'zxid 0x{start_zxid:x}'
+    logging.info(f'Transaction logs are continuous from {start} up to zxid 0x{previous_zxid:x}.')
+    return previous_zxid
+
+
+def find_transaction_logs(paths):
+    """Expands folders to the transaction logs they contain, all logs are sorted by zxid."""
+    logs = []
+    for path in paths:
+        if os.path.isdir(path):
+            logs.extend(os.path.join(path, file_name) for file_name in os.listdir(path)
+                        if TRANSACTION_LOG_FILE_PATTERN.match(file_name))
+        else:
+            logs.append(path)
+    return sorted(logs, key=get_zxid_from_file_name)
+
+
+def is_new_epoch_start(previous_zxid, zxid):
+    # The high 32 bits of zxid are the leader epoch, counter of a new epoch starts from 1
+    return zxid >> 32 > previous_zxid >> 32 and zxid & 0xffffffff == 1
+
+
+class TransactionLogStatistics(object):
+
+    def __init__(self, file_name):
+        self.file_name = file_name
+        self.records = 0
+        self.dropped = 0
+        self.rewritten = 0
+        # Records at or before the zxid the log is stored after, e.g. stored by a previous backup
+        self.preceding = 0
+        # Records of types the parser does not know, they are stored as is
+        self.unknown = 0
+        self.first_zxid = None
+        self.stored_file = None
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.verified = False
+        self.verification_time = 0.0
+        self.filtering_time = 0.0
+
+    @staticmethod
+    def throughput(size, duration):
+        return size / 1024 / 1024 / duration if duration else 0.0
+
+    def __str__(self):
+        verification = f'checksums verified in {self.verification_time:.3f}s ' \
+                       f'({self.throughput(self.bytes_read, self.verification_time):.1f} MB/s)' \
+            if self.verified else 'checksums are not verified'
+        preceding = f', {self.preceding} preceding' if self.preceding else ''
+        unknown = f', {self.unknown} of unknown type' if self.unknown else ''
+        return f'{self.file_name}: {self.records} records, {self.dropped} dropped, {self.rewritten} rewritten' \
+               f'{preceding}{unknown}, ' \
+               f'{self.bytes_read} bytes read, {self.bytes_written} bytes written, ' \
+               f'filtered in {self.filtering_time:.3f}s ' \
+               f'({self.throughput(self.bytes_read, self.filtering_time):.1f} MB/s), {verification}'
+
+
+def get_zxid_from_file_name(file_name):
+    # Snapshots and logs are named by the zxid they start from in hex, e.g. 'log.100000001'
+    suffix = os.path.basename(file_name).split('.')[1]
+    return int(suffix, 16)
+
+
+def get_available_cpus():
+    cpus = len(os.sched_getaffinity(0))
+    quota = None
+    try:
+        # cgroup v2 keeps quota and period in one file, e.g. '200000 100000' or 'max 100000'
+        with open('/sys/fs/cgroup/cpu.max') as cpu_max:
+            limit, period = cpu_max.read().split()
+        if limit != 'max':
+            quota = int(limit) / int(period)
+    except (OSError, ValueError):
+        try:
+            with open('/sys/fs/cgroup/cpu/cpu.cfs_quota_us') as quota_file, \
+                    open('/sys/fs/cgroup/cpu/cpu.cfs_period_us') as period_file:
+                limit, period = int(quota_file.read()), int(period_file.read())
+            if limit > 0 and period > 0:
+                quota = limit / period
+        except (OSError, ValueError):
+            pass
+    if quota is not None:
+        cpus = min(cpus, math.ceil(quota))
+    return max(1, cpus)
+
+
+def filter_and_store_transaction_logs(transaction_logs_files, storage_folder, verify=False, workers=None,
+                                      after_zxid=None, znodes=None):
+    """
+    Filters and stores transaction logs, only transactions after after_zxid are stored when it is set, and only
+    transactions on the subtrees of znodes when they are set.
+    *Returns:*\n
+        list - TransactionLogStatistics of the logs in zxid order
+    """
     logging.debug('Try to filter logs.')
-    for transaction_logs_file in transaction_logs_files:
-        filter_and_store_transaction_log(transaction_logs_file, storage_folder)
+    transaction_logs_files = sorted(transaction_logs_files, key=get_zxid_from_file_name)
+    workers = min(workers or get_available_cpus(), len(transaction_logs_files))
+    statistics = []
+    if workers <= 1:
+        for transaction_logs_file in transaction_logs_files:
+            statistics.append(filter_and_store_transaction_log(transaction_logs_file, storage_folder, verify,
+                                                               after_zxid, znodes))
+    else:
+        logging.info(f'Filter {len(transaction_logs_files)} transaction logs with {workers} workers.')
+        failed = []
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(filter_and_store_transaction_log, transaction_logs_file, storage_folder,
+                                       verify, after_zxid, znodes) for transaction_logs_file in transaction_logs_files]
+            # Segments are independent, results are still collected in zxid order to report them in log order
+            for transaction_logs_file, future in zip(transaction_logs_files, futures):
+                try:
+                    statistics.append(future.result())
+                except Exception as e:
+                    logging.error(f"Transaction log '{transaction_logs_file}' is not stored: {e}")
+                    failed.append(os.path.basename(transaction_logs_file))
+        if failed:
+            raise Exception(f'Transaction logs {", ".join(failed)} are not stored.')
     logging.debug('Logs are filtered.')
+    return statistics
 
 
-def filter_and_store_transaction_log(transaction_logs_file, storage_folder):
+def filter_and_store_transaction_log(transaction_logs_file, storage_folder, verify=False, after_zxid=None,
+                                     znodes=None):
+    """
+    Filters the transaction log and stores it with the same name. When after_zxid is set, transactions up to it
+    are dropped and the log is stored under the name of the first following transaction, so it does not replace
+    a stored part of the same log, or it is not stored at all when there are no following transactions.
+    When znodes are set, only transactions and sub-operations of multi transactions on their subtrees or their
+    ancestors are stored.
+    """
     file_name = os.path.basename(transaction_logs_file)
-    input_file = open(transaction_logs_file, 'rb')
-    output_file = open(f'{storage_folder}/{file_name}', 'wb')
-    log_header = LogFileHeader(input_file)
-    if not log_header.is_valid():
-        logging.error(f"Not a valid ZooKeeper transaction log '{transaction_logs_file}'.")
-    output_file.write(log_header.data_bytes)
-
-    start = None
+    statistics = TransactionLogStatistics(file_name)
+    with open(transaction_logs_file, 'rb') as input_file:
+        if os.fstat(input_file.fileno()).st_size < LOG_FILE_HEADER_STRUCT.size:
+            logging.error(f"Not a valid ZooKeeper transaction log '{transaction_logs_file}', it is skipped.")
+            return statistics
+        with mmap.mmap(input_file.fileno(), 0, access=mmap.ACCESS_READ) as log:
+            if verify:
+                verify_transaction_log_checksums(log, statistics)
+            index = TransactionLogIndex()
+            output_name = file_name if after_zxid is None else f'{file_name}.partial'
+            with open(f'{storage_folder}/{output_name}', 'wb', buffering=OUTPUT_BUFFER_SIZE) as output_file:
+                filter_transaction_log(log, output_file, statistics, index, after_zxid,
+                                       PathPrefixTrie(znodes) if znodes else None)
+    if after_zxid is not None:
+        if statistics.first_zxid is None:
+            os.remove(f'{storage_folder}/{output_name}')
+            logging.info(f'Transaction log has no transactions after 0x{after_zxid:x}, {statistics}.')
+            return statistics
+        file_name = f'log.{statistics.first_zxid:x}'
+        os.replace(f'{storage_folder}/{output_name}', f'{storage_folder}/{file_name}')
+    statistics.stored_file = file_name
+    index_file = get_index_file(storage_folder, file_name)
+    os.makedirs(os.path.dirname(index_file), exist_ok=True)
+    index.write(index_file)
+    logging.info(f'Transaction log is stored, {statistics}.')
+    return statistics
+
+
+def verify_transaction_log_checksums(log, statistics):
+    started = time.perf_counter()
+    with memoryview(log) as view:
+        try:
+            verify_transaction_log(view)
+        except CorruptTransaction as e:
+            logging.error(f"Transaction log '{statistics.file_name}' is corrupted: {e}.")
+            raise
+        finally:
+            statistics.verification_time = time.perf_counter() - started
+    statistics.verified = True
+
+
+def filter_transaction_log(log, output_file, statistics, index=None, after_zxid=None, scope=None):
+    """
+    Walks records of the mapped log and writes consecutive kept records as one slice of the mapping,
+    so the output is produced with a few large writes instead of one write per transaction.
+    Kept records are registered in the index with their offsets in the output. Records up to after_zxid
+    are dropped when it is set, records out of the scope, a PathPrefixTrie, are dropped when it is set.
+    Records of unknown types, or multi records with unknown sub-operations, are kept as is, so the rest of the log
+    is not lost to a type the parser does not know.
+    """
+    started = time.perf_counter()
+    file_name = statistics.file_name
+    view = memoryview(log)
+    transaction = None
+    corruption = None
     try:
-        while True:
-            transaction = Txn(input_file)
-            if not start:
-                start = transaction.header.time
-                logging.debug('Log starts at %s and %ims' % (time.ctime(start / 1000), start % 1000))
-            diff = transaction.header.time - start
-            logging.debug('%09i,%03i %s' % (diff / 1000, diff % 1000, str(transaction)[33:]))
-            output_file.write(transaction.transaction_bytes)
-    except EOS:
-        output_file.write(END_OF_STREAM)
-    except UnknownType:
+        log_header = LogFileHeader.from_buffer(view)
+        if not log_header.is_valid():
+            logging.error(f"Not a valid ZooKeeper transaction log '{file_name}'.")
+
+        run_start = 0
+        # Offset in the output at which the pending run of kept records starts
+        output_offset = 0
+        offset = LOG_FILE_HEADER_STRUCT.size
+        start = None
+        try:
+            while True:
+                try:
+                    transaction = Txn.from_buffer(view, offset, scope)
+                    header, size = transaction.header, transaction.size
+                    skip, rewritten_record = transaction.skip, transaction.rewritten_record
+                except UnknownType as e:
+                    # The record is complete, Txn.from_buffer checks its length before decoding it
+                    transaction = None
+                    header = TxnHeader.from_buffer(view, offset + TXN_PREFIX_STRUCT.size)
+                    size = TXN_PREFIX_STRUCT.size + TXN_PREFIX_STRUCT.unpack_from(view, offset)[1] + 1
+                    skip, rewritten_record = False, None
+                    statistics.unknown += 1
+                    logging.warning(f"Transaction 0x{header.zxid:x} of '{file_name}' has unknown type {e.type}, "
+                                    f"it is stored as is.")
+                statistics.records += 1
+                if not start:
+                    start = header.time
+                    logging.debug('Log starts at %s and %ims' % (time.ctime(start / 1000), start % 1000))
+                if transaction and logging.getLogger().isEnabledFor(logging.DEBUG):
+                    diff = header.time - start
+                    logging.debug('%09i,%03i %s' % (diff / 1000, diff % 1000, str(transaction)[33:]))
+                preceding = after_zxid is not None and header.zxid <= after_zxid
+                if not preceding and statistics.first_zxid is None:
+                    statistics.first_zxid = header.zxid
+                if preceding or skip or rewritten_record is not None:
+                    if run_start < offset:
+                        output_file.write(view[run_start:offset])
+                        output_offset += offset - run_start
+                    if preceding:
+                        statistics.preceding += 1
+                    elif skip:
+                        statistics.dropped += 1
+                    else:
+                        if index is not None:
+                            index.add(header.zxid, header.time, output_offset)
+                        output_file.write(rewritten_record)
+                        output_offset += len(rewritten_record)
+                        statistics.rewritten += 1
+                    run_start = offset + size
+                elif index is not None:
+                    index.add(header.zxid, header.time, output_offset + offset - run_start)
+                offset += size
+        except EOS:
+            pass
+        except (struct.error, UnicodeDecodeError) as e:
+            # The exception is raised outside of this handler, so its traceback does not keep record views alive
+            corruption = CorruptTransaction(offset, read_zxid(view, offset), f'record cannot be decoded, {e}')
+        if corruption:
+            logging.error(f"Transaction log '{file_name}' is corrupted: {corruption}.")
+            raise corruption
+        if run_start < offset:
+            output_file.write(view[run_start:offset])
+            output_offset += offset - run_start
         output_file.write(END_OF_STREAM)
-        logging.exception('Log file %s processing completed with error:', file_name)
+        if index is not None:
+            index.end_offset = output_offset
+        statistics.bytes_read = offset
+        statistics.bytes_written = output_file.tell()
+    finally:
+        # Record views must be released before the mapping can be closed
+        transaction = None
+        view.release()
+        statistics.filtering_time = time.perf_counter() - started
+
+
+def truncate_transaction_logs(directory, target_zxid=None, target_time=None, storage_folder=None):
+    """
+    Truncates transaction logs in the directory after the last transaction with zxid not greater than target_zxid,
+    or with time (ms since epoch) not later than target_time. The segment with the cut point is ended with
+    END_OF_STREAM right after the kept records, later segments are removed.
+    *Args:*\n
+        _directory_ (str) - directory with the snapshot and logs to restore;\n
+        _target_zxid_ (int) - last zxid to restore (optional);\n
+        _target_time_ (int) - last transaction time to restore (optional);\n
+        _storage_folder_ (str) - backup folder with indexes of the logs (optional);\n
+    """
+    transaction_logs = sorted((file_name for file_name in os.listdir(directory) if file_name.startswith('log.')),
+                              key=get_zxid_from_file_name)
+    snapshots = [file_name for file_name in os.listdir(directory) if file_name.startswith('snapshot.')]
+    if snapshots:
+        snapshot = max(snapshots, key=get_zxid_from_file_name)
+        snapshot_zxid = get_zxid_from_file_name(snapshot)
+        if target_zxid is not None and target_zxid < snapshot_zxid:
+            raise Exception(f'Target zxid 0x{target_zxid:x} precedes the snapshot zxid 0x{snapshot_zxid:x}, '
+                            f'the backup can not be restored to it.')
+        if target_time is not None:
+            snapshot_time = get_snapshot_time(directory, snapshot, transaction_logs)
+            if target_time < snapshot_time:
+                raise Exception(f'Target time {target_time} precedes the snapshot time {snapshot_time}, '
+                                f'the backup can not be restored to it.')
 
-    output_file.close()
-    input_file.close()
+    cut = False
+    for file_name in transaction_logs:
+        log_file = join(directory, file_name)
+        if cut or target_zxid is not None and get_zxid_from_file_name(file_name) > target_zxid:
+            os.remove(log_file)
+            logging.info(f"Transaction log '{file_name}' follows the restore point and is removed.")
+            cut = True
+            continue
+        cut_offset = find_transaction_log_cut(log_file, target_zxid, target_time, storage_folder)
+        if cut_offset is not None:
+            with open(log_file, 'r+b') as file:
+                file.seek(cut_offset)
+                file.write(END_OF_STREAM)
+                file.truncate()
+            logging.info(f"Transaction log '{file_name}' is truncated at offset {cut_offset}.")
+            cut = True
+    if not cut:
+        logging.warning('Restore point follows the last backed up transaction, logs are restored entirely.')
+
+
+def get_snapshot_time(directory, snapshot, transaction_logs):
+    """
+    Returns time (ms since epoch) of the transaction the snapshot is named by, taken from the log that holds it.
+    When the logs start after the snapshot, modification time of the snapshot file is returned.
+    """
+    snapshot_zxid = get_zxid_from_file_name(snapshot)
+    logs = [file_name for file_name in transaction_logs if get_zxid_from_file_name(file_name) <= snapshot_zxid]
+    if logs:
+        with open(join(directory, logs[-1]), 'rb') as file, \
+                mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as log:
+            for _, (_, _, zxid, time_ms, _) in scan_transaction_headers(log):
+                if zxid == snapshot_zxid:
+                    return time_ms
+                if zxid > snapshot_zxid:
+                    break
+    return int(os.path.getmtime(join(directory, snapshot)) * 1000)
+
+
+def find_transaction_log_cut(log_file, target_zxid=None, target_time=None, storage_folder=None):
+    """
+    Finds offset of the first transaction after the restore point scanning only record headers.
+    When the log has an index, scanning starts from the closest sampled record.
+    *Returns:*\n
+        int - offset of the first transaction to drop, or None if the whole log precedes the restore point
+    """
+    offset = LOG_FILE_HEADER_STRUCT.size
+    index = read_index(log_file, storage_folder)
+    if index:
+        if (target_zxid is None or index.last_zxid <= target_zxid) and \
+                (target_time is None or index.max_time <= target_time):
+            return None
+        if target_zxid is not None:
+            offset = index.find(target_zxid)
+        if target_time is not None:
+            offset = min(offset, index.find_by_time(target_time))
+    with open(log_file, 'rb') as file:
+        if os.fstat(file.fileno()).st_size <= offset:
+            return None
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as log:
+            for record_offset, (_, _, zxid, time_ms, _) in scan_transaction_headers(log, offset):
+                if target_zxid is not None and zxid > target_zxid or target_time is not None and time_ms > target_time:
+                    return record_offset
+    return None
 
 
 def copy_zookeeper_logs(directory_from, directory_to):
@@ -110,6 +472,62 @@ def copy_snapshot(snapshot, storage_folder):
     copy2(snapshot, storage_folder)
 
 
+def filter_and_store_snapshot(snapshot, storage_folder, znodes):
+    """
+    Stores the snapshot with only the subtrees of znodes and their ancestors, the system subtree of ZooKeeper
+    is always kept. Sessions are not stored, so ephemeral znodes are dropped as from filtered logs. The digest
+    is not stored either, it does not match the filtered tree and ZooKeeper verifies it only when present.
+    A gzipped snapshot is stored uncompressed, without the suffix of the compression in its name.
+    """
+    scope = PathPrefixTrie(list(znodes) + [ZOOKEEPER_SYSTEM_ZNODE])
+    file_name = os.path.basename(snapshot)
+    if file_name.endswith(GZIP_SUFFIX):
+        file_name = file_name[:-len(GZIP_SUFFIX)]
+    output_file_name = join(storage_folder, file_name)
+    try:
+        with open_snapshot_file(snapshot) as input_file, \
+                open(f'{output_file_name}.partial', 'wb', buffering=OUTPUT_BUFFER_SIZE) as output_file:
+            stored, dropped = write_filtered_snapshot(Snapshot(input_file), output_file, scope)
+            output_file.flush()
+            os.fsync(output_file.fileno())
+        os.replace(f'{output_file_name}.partial', output_file_name)
+    except Exception:
+        if os.path.exists(f'{output_file_name}.partial'):
+            os.remove(f'{output_file_name}.partial')
+        raise
+    logging.info(f"Snapshot '{file_name}' is stored with {stored} znodes of {scope}, {dropped} znodes are dropped.")
+
+
+def write_filtered_snapshot(source, output_file, scope):
+    stored = dropped = 0
+    output = SnapshotOutputStream(output_file)
+    output.pack(SNAPSHOT_FILE_HEADER_STRUCT, source.header.magic, source.header.version, source.header.dbid)
+    output.write_int(0)
+    output.write_int(len(source.acls))
+    for reference, acl in source.acls.items():
+        output.write_long(reference)
+        output.write_int(len(acl))
+        for perms, scheme, acl_id in acl:
+            output.write_int(perms)
+            output.write_string(scheme)
+            output.write_string(acl_id)
+    for node in source.nodes():
+        # Children of a znode out of the scope are out of it as well, so no stored znode loses its parent
+        if node.path and (node.ephemeral or not scope.matches(node.path)):
+            dropped += 1
+            continue
+        stat = node.stat
+        output.write_string(node.path)
+        output.write_buffer(node.data)
+        output.pack(NODE_TAIL_STRUCT, node.acl, stat.czxid, stat.mzxid, stat.ctime, stat.mtime, stat.version,
+                    stat.cversion, stat.aversion, stat.ephemeral_owner, stat.pzxid)
+        stored += 1
+    output.write_string(END_OF_NODES)
+    output.write_seal()
+    output.flush()
+    return stored, dropped
+
+
 def create_directory(directory):
     if not os.path.exists(directory):
         os.makedirs(directory)
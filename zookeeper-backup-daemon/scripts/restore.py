@@ -17,11 +17,14 @@ import ast
 import logging
 import os
 import sys
+from datetime import datetime, timezone
 from os.path import join, isfile
 
 from process_znode_hierarchy import restore
 from process_zookeeper_logs import copy_zookeeper_logs, \
-    create_directory, remove_directory_with_content, is_file_system_shared
+    create_directory, remove_directory_with_content, is_file_system_shared, truncate_transaction_logs
+from transactional_archive import read_manifest, read_watermark, copy_archived_files, get_archive_folder, \
+    MANIFEST_FILE
 from zookeeper_client import ZooKeeperClient
 
 ZOOKEEPER_RESTORE_TMP_DIR = '/opt/zookeeper/backup-storage/recover'
@@ -48,19 +51,39 @@ class Restore:
                                        self._zookeeper_username,
                                        self._zookeeper_password)
         self._storage_folder = storage_folder
+        self._batch_size = int(os.getenv("ZOOKEEPER_RESTORE_BATCH_SIZE", "524288"))
 
     def determine_mode(self):
         for file_name in os.listdir(self._storage_folder):
             file_path = join(self._storage_folder, file_name)
             if isfile(file_path):
-                if 'snapshot.' in file_name or 'log.' in file_name:
+                if 'snapshot.' in file_name or 'log.' in file_name or file_name == MANIFEST_FILE:
                     return 'transactional'
         return 'hierarchical'
 
-    def transactional_recovery(self):
+    def transactional_recovery(self, target_zxid=None, target_time=None):
         try:
             create_directory(ZOOKEEPER_RESTORE_TMP_DIR)
-            copy_zookeeper_logs(self._storage_folder, ZOOKEEPER_RESTORE_TMP_DIR)
+            manifest = read_manifest(self._storage_folder)
+            if manifest:
+                # Incremental backups refer to the snapshot and logs stored in the archive, indexes are kept there
+                logs = manifest.logs
+                if target_zxid is None and target_time is None:
+                    # The last archived log can be appended to by the log shipper after the backup
+                    target_zxid = manifest.last_zxid
+                else:
+                    # Transactions shipped after the backup can be restored up to the restore point
+                    watermark = read_watermark(get_archive_folder(self._storage_folder))
+                    if watermark and watermark.chain == manifest.chain:
+                        logs = watermark.logs
+                index_folder = copy_archived_files(self._storage_folder, manifest, ZOOKEEPER_RESTORE_TMP_DIR, logs)
+            else:
+                copy_zookeeper_logs(self._storage_folder, ZOOKEEPER_RESTORE_TMP_DIR)
+                index_folder = self._storage_folder
+            if target_zxid is not None or target_time is not None:
+                logging.info(f'Restore point is zxid {hex(target_zxid) if target_zxid is not None else "-"}, '
+                             f'time {target_time if target_time is not None else "-"}.')
+                truncate_transaction_logs(ZOOKEEPER_RESTORE_TMP_DIR, target_zxid, target_time, index_folder)
             from PlatformLibrary import PlatformLibrary
             is_managed_by_operator: str = "true"
             if os.getenv("MANAGED_BY_OPERATOR") and os.getenv("MANAGED_BY_OPERATOR").lower() == "false":
@@ -79,13 +102,28 @@ class Restore:
             remove_directory_with_content(ZOOKEEPER_RESTORE_TMP_DIR)
 
     def hierarchical_recovery(self, znodes):
-        restore(self._client, znodes, self._storage_folder)
+        restore(self._client, znodes, self._storage_folder, self._batch_size)
+
+
+def parse_restore_time(value):
+    # Restore time is either milliseconds since epoch or ISO 8601 date and time, UTC unless an offset is given
+    if value.isdigit():
+        return int(value)
+    restore_time = datetime.fromisoformat(value)
+    if restore_time.tzinfo is None:
+        restore_time = restore_time.replace(tzinfo=timezone.utc)
+    return int(restore_time.timestamp() * 1000)
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument('folder')
     parser.add_argument('-d', '--znodes')
+    parser.add_argument('--zxid', type=lambda value: int(value, 0),
+                        help='restore transactional backup up to this zxid inclusive, e.g. 0x100000a2c')
+    parser.add_argument('--time', type=parse_restore_time,
+                        help='restore transactional backup up to this time inclusive, '
+                             'milliseconds since epoch or ISO 8601, e.g. 2025-01-31T10:15:00')
     args = parser.parse_args()
 
     restore_instance = Restore(args.folder)
@@ -94,7 +132,7 @@ if __name__ == "__main__":
     if determined_mode == 'transactional':
         if not is_file_system_shared():
             raise Exception('Configuration is not suitable to restore from transactional backup.')
-        restore_instance.transactional_recovery()
+        restore_instance.transactional_recovery(args.zxid, args.time)
         logging.info('Transactional recovery is successful.')
     else:
         znodes = ast.literal_eval(args.znodes) if args.znodes else []
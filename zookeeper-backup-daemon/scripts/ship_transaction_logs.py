@@ -0,0 +1,409 @@
+#!/usr/bin/python
+# Copyright 2024-2025 NetCracker Technology Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import logging
+import os
+import signal
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from os.path import join
+
+from parse_transaction_logs import Txn, LogFileHeader, UnknownType, LOG_FILE_HEADER_STRUCT, TXN_PREFIX_STRUCT, \
+    TXN_HEADER_STRUCT, END_OF_RECORD, END_OF_STREAM, read_zxid
+from process_zookeeper_logs import TRANSACTION_LOG_FILE_PATTERN, get_zxid_from_file_name, is_new_epoch_start
+from transactional_archive import ARCHIVE_FOLDER, archive_lock, read_watermark, write_watermark
+
+DEFAULT_SYNC_INTERVAL = 1.0
+DEFAULT_SYNC_RECORDS = 1000
+DEFAULT_POLL_INTERVAL = 0.2
+DEFAULT_METRICS_PORT = 9102
+READ_SIZE = 1024 * 1024
+
+
+class ShippingStopped(Exception):
+    pass
+
+
+class TransactionLogShipper(object):
+    """
+    Tails transaction logs of a ZooKeeper server as they grow and appends filtered records to the chain of the
+    transactional archive that the watermark points to. Records are written and fsynced in batches, after every
+    batch the watermark is moved to the last shipped transaction, so it never points past durable data.
+    Shipping starts once a transactional backup has started a chain, and follows the watermark when a backup
+    moves it, e.g. when it starts a new chain.
+    """
+
+    def __init__(self, data_directory, archive_folder, sync_interval=DEFAULT_SYNC_INTERVAL,
+                 sync_records=DEFAULT_SYNC_RECORDS, poll_interval=DEFAULT_POLL_INTERVAL):
+        self.data_directory = data_directory
+        self.archive_folder = archive_folder
+        self.sync_interval = sync_interval
+        self.sync_records = sync_records
+        self.poll_interval = poll_interval
+        self.stop_event = threading.Event()
+        # Position in the logs of the server
+        self.source = None
+        self.source_file = None
+        self.source_header = None
+        self.offset = 0
+        # State of the archive: the chain, the last shipped transaction and the log records are appended to
+        self.chain = None
+        self.zxid = None
+        self.output = None
+        self.output_name = None
+        # Records read but not yet written to the archive
+        self.pending = []
+        self.pending_zxid = None
+        self.pending_records = 0
+        self.pending_since = None
+        self.pending_time = None
+        # Metrics
+        self.last_time = None
+        self.records_total = 0
+        self.bytes_total = 0
+        self.syncs_total = 0
+        self.stalled_since = time.time()
+
+    def run(self):
+        logging.info(f"Start to ship transaction logs from '{self.data_directory}' to '{self.archive_folder}'.")
+        while not self.stop_event.is_set():
+            try:
+                progress = self.poll()
+            except ShippingStopped as e:
+                logging.warning(f'Shipping is stopped until the next transactional backup: {e}')
+                self.reset()
+                progress = False
+            if not progress:
+                self.stop_event.wait(self.poll_interval)
+        self.sync()
+        self.reset()
+        logging.info('Shipping of transaction logs is stopped.')
+
+    def stop(self):
+        self.stop_event.set()
+
+    def poll(self):
+        """Reads and ships the records logged since the previous poll, returns whether there were any."""
+        if self.chain is None and not self.resume():
+            return False
+        records = self.read_records()
+        if self.pending_since is not None and (self.pending_records >= self.sync_records or
+                                               time.monotonic() - self.pending_since >= self.sync_interval):
+            self.sync()
+        if not records and not self.pending:
+            self.stalled_since = None
+        return records > 0
+
+    def resume(self):
+        """Finds the chain and the log record to continue from, both are taken from the watermark."""
+        with archive_lock(self.archive_folder):
+            watermark = read_watermark(self.archive_folder)
+            if watermark is None:
+                return False
+            if watermark.logs:
+                truncate_after(join(self.archive_folder, watermark.chain, watermark.logs[-1]), watermark.zxid)
+        source = self.find_source(watermark.zxid)
+        if source is None:
+            return False
+        self.chain, self.zxid = watermark.chain, watermark.zxid
+        self.open_source(source)
+        logging.info(f"Shipping to chain {self.chain} is continued after zxid 0x{self.zxid:x} "
+                     f"from '{os.path.basename(source)}'.")
+        return True
+
+    def find_source(self, zxid):
+        # The log that starts at or just before the next transaction contains it
+        logs = self.list_logs()
+        candidates = [log for log in logs if get_zxid_from_file_name(log) <= zxid + 1]
+        if candidates:
+            return candidates[-1]
+        if logs:
+            logging.warning(f"Logs of the server start at '{os.path.basename(logs[0])}', transactions after "
+                            f"0x{zxid:x} are purged and can not be shipped until the next transactional backup.")
+        return None
+
+    def list_logs(self):
+        return sorted((join(self.data_directory, file_name) for file_name in os.listdir(self.data_directory)
+                       if TRANSACTION_LOG_FILE_PATTERN.match(file_name)), key=get_zxid_from_file_name)
+
+    def open_source(self, source):
+        self.close_source()
+        self.source = source
+        self.source_file = open(source, 'rb')
+        self.source_header = None
+        self.offset = LOG_FILE_HEADER_STRUCT.size
+
+    def close_source(self):
+        if self.source_file:
+            self.source_file.close()
+        self.source_file = None
+        # Records of one server log are shipped to one archived log
+        self.close_output()
+
+    def read_records(self):
+        """
+        Reads complete records after the current offset of the server log. ZooKeeper preallocates logs with zeros,
+        so the end of the written part is found by the record length and checksum rather than the file size.
+        When the log has no more records and a following log exists, shipping moves on to that log.
+        """
+        if self.source_header is None:
+            header = os.pread(self.source_file.fileno(), LOG_FILE_HEADER_STRUCT.size, 0)
+            if len(header) < LOG_FILE_HEADER_STRUCT.size:
+                return 0
+            self.source_header = header
+            if not LogFileHeader.from_buffer(header).is_valid():
+                raise ShippingStopped(f"'{self.source}' is not a valid transaction log.")
+        records = 0
+        data = self.read_source()
+        position = 0
+        while True:
+            size = complete_record_size(data, position)
+            if size is None:
+                break
+            self.add_record(data, position)
+            position += size
+            records += 1
+        self.offset += position
+        if not records and self.switch_source():
+            return self.read_records()
+        return records
+
+    def read_source(self):
+        return read_log(self.source_file.fileno(), self.offset)
+
+    def switch_source(self):
+        following = [log for log in self.list_logs()
+                     if get_zxid_from_file_name(log) > get_zxid_from_file_name(self.source)]
+        if not following:
+            return False
+        # The log could be completed right before the next one is created, it is read once more first
+        if complete_record_size(self.read_source(), 0) is not None:
+            return False
+        logging.info(f"Log '{os.path.basename(self.source)}' is shipped, continue with "
+                     f"'{os.path.basename(following[0])}'.")
+        self.sync()
+        if self.chain is None:
+            return False
+        self.open_source(following[0])
+        return True
+
+    def add_record(self, data, position):
+        zxid = read_zxid(data, position)
+        last_zxid = self.pending_zxid if self.pending_zxid is not None else self.zxid
+        if zxid <= last_zxid:
+            return
+        if zxid != last_zxid + 1 and not is_new_epoch_start(last_zxid, zxid):
+            raise ShippingStopped(f"'{os.path.basename(self.source)}' continues with transaction 0x{zxid:x} "
+                                  f"after 0x{last_zxid:x}.")
+        try:
+            transaction = Txn.from_buffer(data, position)
+            record = transaction.transaction_bytes
+        except UnknownType as e:
+            logging.warning(f'Transaction 0x{zxid:x} of unknown type {e} is shipped as is.')
+            record = bytes(data[position:position + complete_record_size(data, position)])
+        time_ms = TXN_HEADER_STRUCT.unpack_from(data, position + TXN_PREFIX_STRUCT.size)[3]
+        if self.pending_since is None:
+            self.pending_since = time.monotonic()
+            self.pending_time = time_ms
+        if record:
+            self.pending.append(record)
+        self.pending_zxid = zxid
+        self.pending_records += 1
+        self.last_time = time_ms
+
+    def sync(self):
+        """Appends pending records to the archive, fsyncs them and moves the watermark past them."""
+        if self.pending_zxid is None:
+            return
+        with archive_lock(self.archive_folder):
+            watermark = read_watermark(self.archive_folder)
+            if watermark is None or watermark.chain != self.chain or watermark.zxid != self.zxid:
+                # A backup has archived these transactions or started a new chain, pending records are read again
+                logging.info('Watermark is moved by a backup, shipping is continued from it.')
+                self.reset()
+                return
+            if self.pending:
+                if self.output is None:
+                    first_zxid = read_zxid(self.pending[0], 0)
+                    self.output_name = f'log.{first_zxid:x}'
+                    self.output = open(join(self.archive_folder, self.chain, self.output_name), 'wb')
+                    self.output.write(self.source_header)
+                    watermark.logs.append(self.output_name)
+                for record in self.pending:
+                    self.output.write(record)
+                    self.bytes_total += len(record)
+                self.output.flush()
+                os.fsync(self.output.fileno())
+            watermark.zxid = self.zxid = self.pending_zxid
+            write_watermark(self.archive_folder, watermark)
+        self.records_total += self.pending_records
+        self.syncs_total += 1
+        self.clear_pending()
+
+    def clear_pending(self):
+        self.pending = []
+        self.pending_zxid = None
+        self.pending_records = 0
+        self.pending_since = None
+        self.pending_time = None
+
+    def close_output(self):
+        if self.output:
+            self.output.close()
+        self.output = None
+        self.output_name = None
+
+    def reset(self):
+        if self.stalled_since is None:
+            self.stalled_since = time.time()
+        self.clear_pending()
+        self.close_source()
+        self.chain = None
+        self.zxid = None
+
+    def lag(self):
+        """Seconds since the oldest transaction that is logged by ZooKeeper but not shipped yet."""
+        now = time.time()
+        if self.pending_time is not None:
+            return max(now - self.pending_time / 1000, 0.0)
+        if self.stalled_since is not None:
+            return now - self.stalled_since
+        return 0.0
+
+    def metrics(self):
+        lines = [
+            ('zookeeper_log_shipping_up', 'Whether transaction logs are being shipped.', 'gauge',
+             1 if self.chain is not None else 0),
+            ('zookeeper_log_shipping_lag_seconds', 'Age of the oldest transaction that is not shipped yet.',
+             'gauge', round(self.lag(), 3)),
+            ('zookeeper_log_shipping_last_zxid', 'Zxid of the last shipped transaction.', 'gauge',
+             self.zxid if self.zxid is not None else -1),
+            ('zookeeper_log_shipping_last_transaction_timestamp_seconds', 'Time of the last read transaction.',
+             'gauge', self.last_time / 1000 if self.last_time is not None else 0),
+            ('zookeeper_log_shipping_records_total', 'Transactions shipped, including dropped ones.', 'counter',
+             self.records_total),
+            ('zookeeper_log_shipping_bytes_total', 'Bytes of records appended to the archive.', 'counter',
+             self.bytes_total),
+            ('zookeeper_log_shipping_syncs_total', 'Batches of records fsynced to the archive.', 'counter',
+             self.syncs_total),
+        ]
+        return ''.join(f'# HELP {name} {description}\n# TYPE {name} {metric_type}\n{name} {value}\n'
+                       for name, description, metric_type, value in lines)
+
+
+def complete_record_size(data, position):
+    """
+    Returns size of the record at position when the record is completely written, i.e. it has the end of record
+    byte and its checksum matches, or None when the record is not written yet or is being written.
+    """
+    if position + TXN_PREFIX_STRUCT.size + TXN_HEADER_STRUCT.size > len(data):
+        return None
+    crc, txn_len = TXN_PREFIX_STRUCT.unpack_from(data, position)
+    end = position + TXN_PREFIX_STRUCT.size + txn_len
+    if txn_len <= 0 or end + 1 > len(data) or data[end:end + 1] != END_OF_RECORD:
+        return None
+    if zlib.adler32(data[position + TXN_PREFIX_STRUCT.size:end]) != crc & 0xffffffff:
+        return None
+    return TXN_PREFIX_STRUCT.size + txn_len + 1
+
+
+def read_log(fd, offset):
+    """Reads a part of a log starting with the record at offset, a record larger than the read size is read whole."""
+    data = os.pread(fd, READ_SIZE, offset)
+    if len(data) >= TXN_PREFIX_STRUCT.size:
+        size = TXN_PREFIX_STRUCT.size + TXN_PREFIX_STRUCT.unpack_from(data)[1] + 1
+        if size > len(data) == READ_SIZE:
+            data = os.pread(fd, size, offset)
+    return data
+
+
+def truncate_after(log_file, zxid):
+    """
+    Cuts an archived log after the last complete record with zxid not greater than the given one, removing
+    records that were written but not covered by the watermark before the shipper stopped.
+    """
+    with open(log_file, 'r+b') as file:
+        offset = LOG_FILE_HEADER_STRUCT.size
+        while True:
+            data = read_log(file.fileno(), offset)
+            position = 0
+            size = complete_record_size(data, position)
+            while size is not None and read_zxid(data, position) <= zxid:
+                position += size
+                size = complete_record_size(data, position)
+            offset += position
+            # Reading goes on while the records end with the read part of the log
+            if size is not None or not position:
+                break
+        if os.pread(file.fileno(), len(END_OF_STREAM) + 1, offset) in (b'', END_OF_STREAM):
+            return
+        file.truncate(offset)
+    logging.info(f"Archived log '{os.path.basename(log_file)}' is truncated after zxid 0x{zxid:x}.")
+
+
+def serve_metrics(shipper, port):
+    class MetricsHandler(BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            if self.path != '/metrics':
+                self.send_error(404)
+                return
+            body = shipper.metrics().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, message_format, *args):
+            logging.debug(message_format % args)
+
+    server = ThreadingHTTPServer(('', port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logging.info(f'Shipping metrics are served on port {port}.')
+    return server
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.DEBUG if os.getenv('ZOOKEEPER_BACKUP_DAEMON_DEBUG') else logging.INFO,
+                        format='[%(asctime)s,%(msecs)03d][%(levelname)s][category=Shipping] %(message)s',
+                        datefmt='%Y-%m-%dT%H:%M:%S')
+    parser = argparse.ArgumentParser(
+        description='Continuously ships transaction logs of a ZooKeeper server to the transactional archive.')
+    parser.add_argument('data_directory', help='directory with transaction logs of the server, e.g. version-2')
+    parser.add_argument('--storage', default=os.getenv('ZOOKEEPER_BACKUP', '/opt/zookeeper/backup-storage'),
+                        help='backup storage with the transactional archive')
+    parser.add_argument('--sync-interval', type=float, default=DEFAULT_SYNC_INTERVAL,
+                        help='maximum seconds shipped records wait for fsync')
+    parser.add_argument('--sync-records', type=int, default=DEFAULT_SYNC_RECORDS,
+                        help='number of records that are fsynced at once without waiting for the interval')
+    parser.add_argument('--poll-interval', type=float, default=DEFAULT_POLL_INTERVAL,
+                        help='seconds to wait for new records when the log is read to its end')
+    parser.add_argument('--metrics-port', type=int, default=DEFAULT_METRICS_PORT,
+                        help='port of the Prometheus metrics endpoint, 0 disables it')
+    args = parser.parse_args()
+
+    archive = join(args.storage, ARCHIVE_FOLDER)
+    os.makedirs(archive, exist_ok=True)
+    log_shipper = TransactionLogShipper(args.data_directory, archive, args.sync_interval, args.sync_records,
+                                        args.poll_interval)
+    signal.signal(signal.SIGTERM, lambda signum, frame: log_shipper.stop())
+    signal.signal(signal.SIGINT, lambda signum, frame: log_shipper.stop())
+    if args.metrics_port:
+        serve_metrics(log_shipper, args.metrics_port)
+    log_shipper.run()
@@ -0,0 +1,142 @@
+# Copyright 2024-2025 NetCracker Technology Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import os
+import struct
+from array import array
+from bisect import bisect_right
+
+from parse_transaction_logs import LOG_FILE_HEADER_STRUCT, scan_transactions
+
+# Indexes are kept in a subdirectory of the backup, so they are neither taken for logs by ZooKeeper
+# nor copied to its data directory on restore
+INDEX_FOLDER = 'index'
+INDEX_FILE_SUFFIX = '.idx'
+INDEX_MAGIC = b'ZKIX'
+INDEX_VERSION = 2
+DEFAULT_INTERVAL = 256
+
+INDEX_HEADER_STRUCT = struct.Struct('>4s i i i i q q q')
+INDEX_ENTRY_STRUCT = struct.Struct('>Q q q')
+
+
+class TransactionLogIndex(object):
+    """
+    Sparse index of a stored transaction log: zxid, time and file offset of every N-th record,
+    sorted by zxid, plus zxid of the last record, the latest time and offset of the end of stream marker.
+    Times are wall clock times of the leader, which can go back after a leader change or a clock step, so the time
+    of a sampled record is kept as the latest time of the records up to it, which makes the times sorted as well.
+    """
+
+    def __init__(self, interval=DEFAULT_INTERVAL):
+        self.interval = interval
+        self.zxids = array('Q')
+        self.max_times = array('q')
+        self.offsets = array('q')
+        self.records = 0
+        self.last_zxid = -1
+        self.max_time = -1
+        self.end_offset = LOG_FILE_HEADER_STRUCT.size
+
+    def add(self, zxid, time, offset):
+        self.max_time = max(self.max_time, time)
+        if self.records % self.interval == 0:
+            self.zxids.append(zxid)
+            self.max_times.append(self.max_time)
+            self.offsets.append(offset)
+        self.records += 1
+        self.last_zxid = zxid
+
+    def find(self, zxid):
+        """
+        Returns offset of the sampled record that is the closest one to the given zxid from below,
+        reading from it reaches the requested record within one sampling interval.
+        """
+        position = bisect_right(self.zxids, zxid) - 1
+        return self.offsets[position] if position >= 0 else LOG_FILE_HEADER_STRUCT.size
+
+    def find_by_time(self, time):
+        """
+        Returns offset of the last sampled record such that no record up to it is later than the given time,
+        so reading from it reaches the first record that is later than the time.
+        """
+        position = bisect_right(self.max_times, time) - 1
+        return self.offsets[position] if position >= 0 else LOG_FILE_HEADER_STRUCT.size
+
+    def write(self, index_file):
+        with open(index_file, 'wb') as file:
+            file.write(INDEX_HEADER_STRUCT.pack(INDEX_MAGIC, INDEX_VERSION, self.interval, len(self.zxids),
+                                                self.records, self.last_zxid, self.max_time, self.end_offset))
+            for entry in zip(self.zxids, self.max_times, self.offsets):
+                file.write(INDEX_ENTRY_STRUCT.pack(*entry))
+
+    @classmethod
+    def read(cls, index_file):
+        with open(index_file, 'rb') as file:
+            data = file.read()
+        magic, version, interval, count, records, last_zxid, max_time, end_offset = \
+            INDEX_HEADER_STRUCT.unpack_from(data)
+        if magic != INDEX_MAGIC or version != INDEX_VERSION:
+            raise ValueError(f"'{index_file}' is not a transaction log index of version {INDEX_VERSION}.")
+        index = cls(interval)
+        index.records = records
+        index.last_zxid, index.max_time, index.end_offset = last_zxid, max_time, end_offset
+        entries_end = INDEX_HEADER_STRUCT.size + count * INDEX_ENTRY_STRUCT.size
+        entries = memoryview(data)[INDEX_HEADER_STRUCT.size:entries_end]
+        for zxid, time, offset in INDEX_ENTRY_STRUCT.iter_unpack(entries):
+            index.zxids.append(zxid)
+            index.max_times.append(time)
+            index.offsets.append(offset)
+        return index
+
+
+def get_index_file(storage_folder, log_file_name):
+    return os.path.join(storage_folder, INDEX_FOLDER, f'{os.path.basename(log_file_name)}{INDEX_FILE_SUFFIX}')
+
+
+def read_index(log_file, storage_folder=None):
+    """
+    Reads the index of a stored transaction log if it exists.
+    *Args:*\n
+        _log_file_ (str) - path to the log;\n
+        _storage_folder_ (str) - backup folder with the index, if the log is a copy placed elsewhere (optional);\n
+    *Returns:*\n
+        TransactionLogIndex - index of the log or None
+    """
+    index_file = get_index_file(storage_folder or os.path.dirname(log_file), log_file)
+    if not os.path.isfile(index_file):
+        return None
+    try:
+        return TransactionLogIndex.read(index_file)
+    except (OSError, ValueError, struct.error):
+        logging.warning(f"Index '{index_file}' can't be read, the log is scanned from the beginning.")
+        return None
+
+
+def read_transactions(log_file, from_zxid=None, to_zxid=None):
+    """
+    Yields transactions of a stored log with zxids in the given inclusive range as LazyTxn records. When the log
+    has an index, reading starts from the closest sampled record instead of the beginning of the file, and records
+    before the range are skipped by their headers without decoding.
+    """
+    index = read_index(log_file) if from_zxid is not None else None
+    with open(log_file, 'rb') as stream:
+        offset = index.find(from_zxid) if index else LOG_FILE_HEADER_STRUCT.size
+        for transaction in scan_transactions(stream, offset):
+            zxid = transaction.header.zxid
+            if to_zxid is not None and zxid > to_zxid:
+                return
+            if from_zxid is None or zxid >= from_zxid:
+                yield transaction
@@ -0,0 +1,187 @@
+# Copyright 2024-2025 NetCracker Technology Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import fcntl
+import json
+import logging
+import os
+from contextlib import contextmanager
+from os.path import join
+from shutil import copy2, rmtree
+
+# Snapshots and logs of incremental backups are kept next to the backups, outside of their folders, since backups
+# are evicted independently of each other while every backup needs the snapshot and all logs after it
+ARCHIVE_FOLDER = 'transactional-archive'
+WATERMARK_FILE = 'watermark.json'
+LOCK_FILE = '.lock'
+MANIFEST_FILE = 'manifest.json'
+MANIFEST_VERSION = 1
+
+
+class Watermark(object):
+    """
+    The last transaction stored in the archive and the chain it is stored in: the archived snapshot, the logs
+    with transactions after it in zxid order, and the number of backups that share the snapshot.
+    """
+
+    def __init__(self, chain, snapshot, zxid, logs, backups):
+        self.chain = chain
+        self.snapshot = snapshot
+        self.zxid = zxid
+        self.logs = logs
+        self.backups = backups
+
+    def to_json(self):
+        return {'chain': self.chain, 'snapshot': self.snapshot, 'zxid': self.zxid, 'logs': self.logs,
+                'backups': self.backups}
+
+    @classmethod
+    def from_json(cls, value):
+        return cls(value['chain'], value['snapshot'], value['zxid'], value['logs'], value['backups'])
+
+
+class Manifest(object):
+    """
+    Content of a transactional backup that is stored in the archive: the chain folder, the snapshot and the logs
+    to restore, and the range of zxids the backup covers.
+    """
+
+    def __init__(self, chain, snapshot, logs, first_zxid, last_zxid, archived):
+        self.chain = chain
+        self.snapshot = snapshot
+        self.logs = logs
+        self.first_zxid = first_zxid
+        self.last_zxid = last_zxid
+        # Files stored by the backup itself, the others are stored by previous backups of the chain
+        self.archived = archived
+
+    def to_json(self):
+        return {'version': MANIFEST_VERSION, 'chain': self.chain, 'snapshot': self.snapshot, 'logs': self.logs,
+                'first_zxid': hex(self.first_zxid), 'last_zxid': hex(self.last_zxid), 'archived': self.archived}
+
+    @classmethod
+    def from_json(cls, value):
+        if value.get('version') != MANIFEST_VERSION:
+            raise ValueError(f"Manifest version {value.get('version')} is not supported.")
+        return cls(value['chain'], value['snapshot'], value['logs'], int(value['first_zxid'], 16),
+                   int(value['last_zxid'], 16), value['archived'])
+
+
+def get_archive_folder(storage_folder):
+    return join(os.path.dirname(os.path.abspath(storage_folder)), ARCHIVE_FOLDER)
+
+
+def write_json(file_name, value):
+    # Written to a temporary file first, so an interrupted backup does not leave a truncated file
+    with open(f'{file_name}.tmp', 'w') as file:
+        json.dump(value, file, indent=2)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(f'{file_name}.tmp', file_name)
+
+
+def read_json(file_name):
+    with open(file_name) as file:
+        return json.load(file)
+
+
+def read_manifest(storage_folder):
+    """Returns the manifest of a backup, or None for a backup that has the snapshot and logs in its folder."""
+    manifest_file = join(storage_folder, MANIFEST_FILE)
+    if not os.path.isfile(manifest_file):
+        return None
+    return Manifest.from_json(read_json(manifest_file))
+
+
+def write_manifest(storage_folder, manifest):
+    write_json(join(storage_folder, MANIFEST_FILE), manifest.to_json())
+
+
+def read_watermark(archive_folder):
+    """Returns the watermark of the archive, or None when there is none or files it refers to are missing."""
+    watermark_file = join(archive_folder, WATERMARK_FILE)
+    if not os.path.isfile(watermark_file):
+        return None
+    try:
+        watermark = Watermark.from_json(read_json(watermark_file))
+    except (ValueError, KeyError) as e:
+        logging.warning(f"Watermark '{watermark_file}' can not be read: {e}.")
+        return None
+    chain_folder = join(archive_folder, watermark.chain)
+    missing = [file_name for file_name in [watermark.snapshot] + watermark.logs
+               if not os.path.isfile(join(chain_folder, file_name))]
+    if missing:
+        logging.warning(f"Files {', '.join(missing)} of archived chain '{watermark.chain}' are missing.")
+        return None
+    return watermark
+
+
+@contextmanager
+def archive_lock(archive_folder):
+    """Serializes changes of the archive by backups and the log shipper, which both move the watermark."""
+    with open(join(archive_folder, LOCK_FILE), 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def write_watermark(archive_folder, watermark):
+    write_json(join(archive_folder, WATERMARK_FILE), watermark.to_json())
+
+
+def remove_unreferenced_chains(archive_folder, watermark):
+    """
+    Removes chains that neither the watermark nor manifests of existing backups refer to, i.e. chains all
+    backups of which are evicted.
+    """
+    storage_root = os.path.dirname(archive_folder)
+    referenced = {watermark.chain} if watermark else set()
+    for backup_id in os.listdir(storage_root):
+        try:
+            manifest = read_manifest(join(storage_root, backup_id))
+        except (OSError, ValueError, KeyError) as e:
+            logging.warning(f"Manifest of backup '{backup_id}' can not be read, it is ignored: {e}.")
+            continue
+        if manifest:
+            referenced.add(manifest.chain)
+    for chain in os.listdir(archive_folder):
+        chain_folder = join(archive_folder, chain)
+        if os.path.isdir(chain_folder) and chain not in referenced:
+            rmtree(chain_folder)
+            logging.info(f"Archived chain '{chain}' is not used by any backup and is removed.")
+
+
+def copy_archived_files(storage_folder, manifest, directory_to, logs=None):
+    """
+    Copies the snapshot and logs of a backup from the archive to a directory.
+    *Args:*\n
+        _storage_folder_ (str) - folder of the backup;\n
+        _manifest_ (Manifest) - manifest of the backup;\n
+        _directory_to_ (str) - directory to copy files to;\n
+        _logs_ (list) - logs of the chain to copy instead of the logs of the backup (optional);\n
+    *Returns:*\n
+        str - chain folder with indexes of the copied logs
+    """
+    chain_folder = join(get_archive_folder(storage_folder), manifest.chain)
+    logs = manifest.logs if logs is None else logs
+    for file_name in [manifest.snapshot] + logs:
+        file_path = join(chain_folder, file_name)
+        if not os.path.isfile(file_path):
+            raise Exception(f"File '{file_name}' of the backup is missing in the archive '{chain_folder}'.")
+        copy2(file_path, directory_to)
+    logging.info(f"Snapshot and {len(logs)} transaction logs are copied from '{chain_folder}' "
+                 f"to '{directory_to}'.")
+    return chain_folder
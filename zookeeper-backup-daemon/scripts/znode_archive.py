@@ -0,0 +1,277 @@
+#!/usr/bin/python
+# Copyright 2024-2025 NetCracker Technology Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import os
+import struct
+import threading
+import zlib
+
+from parse_snapshot import StatPersisted, is_session_owner
+
+ARCHIVE_FILE = 'znodes.bin'
+ARCHIVE_MAGIC = b'ZKNA'
+ARCHIVE_VERSION = 1
+TRAILER_MAGIC = b'ZKNX'
+# Records are collected into blocks of about this size, each block is compressed on its own
+BLOCK_SIZE = 256 * 1024
+DEFAULT_COMPRESSION_LEVEL = 6
+
+# Magic, version and compression level, 0 for blocks that are not compressed
+ARCHIVE_HEADER_STRUCT = struct.Struct('>4s i i')
+# Stored size, size of the records and number of records of a block, a block of zero size ends the blocks
+BLOCK_HEADER_STRUCT = struct.Struct('>i i i')
+# Offset and number of records of a block in the index
+BLOCK_ENTRY_STRUCT = struct.Struct('>q i')
+# Offset of the index at the end of the file
+TRAILER_STRUCT = struct.Struct('>q 4s')
+INT_STRUCT = struct.Struct('>i')
+# czxid, mzxid, ctime, mtime, version, cversion, aversion, ephemeralOwner, pzxid and the ephemeral flag
+STAT_STRUCT = struct.Struct('>q q q q i i i q q ?')
+
+
+class ZnodeRecord(object):
+    __slots__ = ('path', 'data', 'stat', 'acls', 'ephemeral')
+
+    def __init__(self, path, data, stat, acls, ephemeral):
+        self.path = path
+        self.data = data
+        self.stat = stat
+        self.acls = acls
+        self.ephemeral = ephemeral
+
+
+def get_root_name(path):
+    """Returns the name of the root znode of the path, i.e. the database it is backed up and restored with."""
+    return path.strip('/').split('/', 1)[0]
+
+
+def pack_string(value):
+    encoded = value.encode('utf-8')
+    return INT_STRUCT.pack(len(encoded)) + encoded
+
+
+def pack_buffer(data):
+    return INT_STRUCT.pack(-1) if data is None else INT_STRUCT.pack(len(data)) + bytes(data)
+
+
+class ZnodeArchiveWriter(object):
+    """
+    Writer of znodes into one file instead of a directory per znode. Every znode is a length-prefixed record of
+    its path, raw data, stat, ACLs and ephemeral flag. Records are collected into blocks that are compressed with
+    zlib unless the level is 0, and the blocks are followed by an index of the blocks and of the blocks holding
+    znodes of every root znode. The file is written under a temporary name and renamed by finish(). Znodes are
+    stored in the order they are passed, so parents have to be stored before their children, which allows restore
+    to create znodes in one pass. Several threads can store znodes at once.
+    """
+    acls = True
+
+    def __init__(self, file_name, compression_level=DEFAULT_COMPRESSION_LEVEL):
+        self.file_name = file_name
+        self.compression_level = compression_level
+        self.file = open(f'{file_name}.partial', 'wb')
+        self.file.write(ARCHIVE_HEADER_STRUCT.pack(ARCHIVE_MAGIC, ARCHIVE_VERSION, compression_level))
+        self.lock = threading.Lock()
+        self.block = bytearray()
+        self.block_records = 0
+        self.block_roots = set()
+        # Offset and number of records of every written block
+        self.blocks = []
+        self.roots = {}
+        self.records = 0
+        self.finished = False
+
+    def store(self, path, data, stat, acls):
+        """
+        *Args:*\n
+            _path_ (str) - path of the znode;\n
+            _data_ (bytes) - data of the znode, None for null data;\n
+            _stat_ (StatPersisted) - stat of the znode;\n
+            _acls_ (tuple) - ACLs of the znode as (perms, scheme, id) tuples;\n
+        """
+        # Znodes given without the leading slash are walked by relative paths
+        path = f'/{path.strip("/")}'
+        record = b''.join([pack_string(path), pack_buffer(data), STAT_STRUCT.pack(
+            stat.czxid, stat.mzxid, stat.ctime, stat.mtime, stat.version, stat.cversion, stat.aversion,
+            stat.ephemeral_owner, stat.pzxid, is_session_owner(stat.ephemeral_owner)), INT_STRUCT.pack(len(acls))] +
+                          [INT_STRUCT.pack(perms) + pack_string(scheme) + pack_string(acl_id)
+                           for perms, scheme, acl_id in acls])
+        with self.lock:
+            self.block += INT_STRUCT.pack(len(record))
+            self.block += record
+            self.block_records += 1
+            self.block_roots.add(get_root_name(path))
+            if len(self.block) >= BLOCK_SIZE:
+                self.write_block()
+
+    def write_block(self):
+        if not self.block_records:
+            return
+        payload = zlib.compress(self.block, self.compression_level) if self.compression_level else self.block
+        block_number = len(self.blocks)
+        self.blocks.append((self.file.tell(), self.block_records))
+        self.file.write(BLOCK_HEADER_STRUCT.pack(len(payload), len(self.block), self.block_records))
+        self.file.write(payload)
+        for root in self.block_roots:
+            self.roots.setdefault(root, []).append(block_number)
+        self.records += self.block_records
+        self.block = bytearray()
+        self.block_records = 0
+        self.block_roots = set()
+
+    def finish(self):
+        with self.lock:
+            self.write_block()
+            self.file.write(BLOCK_HEADER_STRUCT.pack(0, 0, 0))
+            index_offset = self.file.tell()
+            index = [INT_STRUCT.pack(len(self.blocks))]
+            index.extend(BLOCK_ENTRY_STRUCT.pack(offset, records) for offset, records in self.blocks)
+            index.append(INT_STRUCT.pack(len(self.roots)))
+            for root, blocks in sorted(self.roots.items()):
+                index.append(pack_string(root) + INT_STRUCT.pack(len(blocks)))
+                index.append(struct.pack(f'>{len(blocks)}i', *blocks))
+            self.file.write(b''.join(index))
+            self.file.write(TRAILER_STRUCT.pack(index_offset, TRAILER_MAGIC))
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.file.close()
+            os.replace(f'{self.file_name}.partial', self.file_name)
+            self.finished = True
+
+    def close(self):
+        if not self.finished:
+            self.file.close()
+            os.remove(f'{self.file_name}.partial')
+
+
+class ZnodeArchiveIndex(object):
+
+    def __init__(self, blocks, roots):
+        # Offset and number of records of every block
+        self.blocks = blocks
+        # Numbers of blocks with znodes of every root znode
+        self.roots = roots
+
+
+def read_archive_header(file):
+    magic, version, compression_level = ARCHIVE_HEADER_STRUCT.unpack(file.read(ARCHIVE_HEADER_STRUCT.size))
+    if magic != ARCHIVE_MAGIC or version != ARCHIVE_VERSION:
+        raise ValueError(f"'{file.name}' is not a znode archive of version {ARCHIVE_VERSION}.")
+    return compression_level
+
+
+def read_archive_index(file_name):
+    with open(file_name, 'rb') as file:
+        read_archive_header(file)
+        file.seek(-TRAILER_STRUCT.size, os.SEEK_END)
+        index_offset, magic = TRAILER_STRUCT.unpack(file.read(TRAILER_STRUCT.size))
+        if magic != TRAILER_MAGIC:
+            raise ValueError(f"Znode archive '{file_name}' has no index, it is not written completely.")
+        file.seek(index_offset)
+        index = file.read()
+    offset = 0
+    count, = INT_STRUCT.unpack_from(index, offset)
+    offset += INT_STRUCT.size
+    blocks = []
+    for _ in range(count):
+        blocks.append(BLOCK_ENTRY_STRUCT.unpack_from(index, offset))
+        offset += BLOCK_ENTRY_STRUCT.size
+    count, = INT_STRUCT.unpack_from(index, offset)
+    offset += INT_STRUCT.size
+    roots = {}
+    for _ in range(count):
+        length, = INT_STRUCT.unpack_from(index, offset)
+        root = str(index[offset + INT_STRUCT.size:offset + INT_STRUCT.size + length], 'utf-8')
+        offset += INT_STRUCT.size + length
+        block_count, = INT_STRUCT.unpack_from(index, offset)
+        offset += INT_STRUCT.size
+        roots[root] = list(struct.unpack_from(f'>{block_count}i', index, offset))
+        offset += INT_STRUCT.size * block_count
+    return ZnodeArchiveIndex(blocks, roots)
+
+
+def read_block_records(block):
+    view = memoryview(block)
+    offset = 0
+    while offset < len(view):
+        length, = INT_STRUCT.unpack_from(view, offset)
+        offset += INT_STRUCT.size
+        yield decode_record(view[offset:offset + length])
+        offset += length
+
+
+def decode_record(record):
+    offset = 0
+
+    def read_buffer():
+        nonlocal offset
+        length, = INT_STRUCT.unpack_from(record, offset)
+        offset += INT_STRUCT.size
+        if length < 0:
+            return None
+        offset += length
+        return bytes(record[offset - length:offset])
+
+    path = str(read_buffer(), 'utf-8')
+    data = read_buffer()
+    *stat, ephemeral = STAT_STRUCT.unpack_from(record, offset)
+    offset += STAT_STRUCT.size
+    count, = INT_STRUCT.unpack_from(record, offset)
+    offset += INT_STRUCT.size
+    acls = []
+    for _ in range(count):
+        perms, = INT_STRUCT.unpack_from(record, offset)
+        offset += INT_STRUCT.size
+        acls.append((perms, str(read_buffer(), 'utf-8'), str(read_buffer(), 'utf-8')))
+    return ZnodeRecord(path, data, StatPersisted(*stat), tuple(acls), ephemeral)
+
+
+def read_znode_archive(file_name, roots=None):
+    """
+    Yields ZnodeRecord for every znode of the archive in the order they are stored, i.e. parents first, reading
+    the file sequentially. When roots are set, only blocks with znodes of these root znodes are read, other znodes
+    of these blocks are yielded as well.
+    """
+    block_offsets = None
+    if roots is not None:
+        index = read_archive_index(file_name)
+        numbers = sorted({number for root in roots for number in index.roots.get(root, [])})
+        block_offsets = [index.blocks[number][0] for number in numbers]
+    with open(file_name, 'rb') as file:
+        compression_level = read_archive_header(file)
+        position = 0
+        while block_offsets is None or position < len(block_offsets):
+            if block_offsets is not None:
+                file.seek(block_offsets[position])
+                position += 1
+            stored_size, size, _ = BLOCK_HEADER_STRUCT.unpack(file.read(BLOCK_HEADER_STRUCT.size))
+            if not stored_size:
+                return
+            block = file.read(stored_size)
+            if compression_level:
+                block = zlib.decompress(block)
+            if len(block) != size:
+                raise ValueError(f"Block of znode archive '{file_name}' at offset {file.tell() - stored_size} "
+                                 f"is truncated.")
+            yield from read_block_records(block)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Lists root znodes stored in a znode archive.')
+    parser.add_argument('archive', help=f'{ARCHIVE_FILE} of a hierarchical backup')
+    args = parser.parse_args()
+    for root_name in sorted(read_archive_index(args.archive).roots):
+        if root_name:
+            print(root_name)
@@ -0,0 +1,584 @@
+# Copyright 2024-2025 NetCracker Technology Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import sys
+import time
+from array import array
+
+from parse_snapshot import Snapshot, SnapshotOutputStream, StatPersisted, open_snapshot_file, END_OF_NODES, \
+    NODE_TAIL_STRUCT, SNAPSHOT_FILE_HEADER_STRUCT, SNAPSHOT_FILE_MAGIC, SNAPSHOT_FILE_VERSION, SNAPSHOT_DB_ID, \
+    CONTAINER_EPHEMERAL_OWNER, is_session_owner
+from parse_transaction_logs import Txn, EOS, LOG_FILE_HEADER_STRUCT, CREATE, CREATE2, CREATECONTAINER, \
+    CREATETTL, DELETE, DELETECONTAINER, SETDATA, RECONFIG, SETACL, MULTI
+from process_zookeeper_logs import get_zxid_from_file_name
+
+READ_BUFFER_SIZE = 1024 * 1024
+
+CREATE_TYPES = (CREATE, CREATE2, CREATECONTAINER, CREATETTL)
+DELETE_TYPES = (DELETE, DELETECONTAINER)
+SET_DATA_TYPES = (SETDATA, RECONFIG)
+
+# ACL reference ZooKeeper uses in snapshots for the open ACL, it is not stored in the ACL cache
+OPEN_ACL_REFERENCE = -1
+OPEN_ACL = ((31, 'world', 'anyone'),)
+
+NO_NODE = -1
+ROOT = 0
+EMPTY_SLOT = -1
+DELETED_SLOT = -2
+INITIAL_SLOTS = 1024
+
+# Every node is a row of int fields and a row of long fields in two flat arrays, indexed by the node id
+PARENT, NAME, FIRST_CHILD, NEXT_SIBLING, PREVIOUS_SIBLING, DATA_LENGTH, ACL, VERSION, CVERSION, AVERSION = range(10)
+DATA_OFFSET, CZXID, MZXID, CTIME, MTIME, EPHEMERAL_OWNER, PZXID = range(7)
+INT_FIELDS = 10
+LONG_FIELDS = 7
+
+# Replaced data is left in the shared buffer until garbage makes up this share of it
+DATA_GARBAGE_RATIO = 0.5
+DATA_COMPACTION_MIN_SIZE = 16 * 1024 * 1024
+
+
+def ttl_ephemeral_owner(ttl):
+    return (0xff << 56 | ttl) - (1 << 64)
+
+
+class StringTable(object):
+    """
+    Interned strings kept in one buffer and found through an open addressing hash table of their ids,
+    so a repeated path component is stored once and costs a 4-byte id per node that uses it.
+    """
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.offsets = array('q')
+        self.lengths = array('i')
+        self.hashes = array('q')
+        self.slots = array('i', [EMPTY_SLOT]) * INITIAL_SLOTS
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def get(self, string_id):
+        offset = self.offsets[string_id]
+        return bytes(self.buffer[offset:offset + self.lengths[string_id]])
+
+    def find_slot(self, value, value_hash):
+        slots, hashes = self.slots, self.hashes
+        mask = len(slots) - 1
+        slot = value_hash & mask
+        while True:
+            string_id = slots[slot]
+            if string_id == EMPTY_SLOT:
+                return slot
+            if hashes[string_id] == value_hash:
+                offset = self.offsets[string_id]
+                if self.buffer[offset:offset + self.lengths[string_id]] == value:
+                    return slot
+            slot = (slot + 1) & mask
+
+    def find(self, value):
+        return self.slots[self.find_slot(value, hash(value))]
+
+    def intern(self, value):
+        value_hash = hash(value)
+        slot = self.find_slot(value, value_hash)
+        string_id = self.slots[slot]
+        if string_id != EMPTY_SLOT:
+            return string_id
+        string_id = len(self.offsets)
+        self.offsets.append(len(self.buffer))
+        self.lengths.append(len(value))
+        self.hashes.append(value_hash)
+        self.buffer += value
+        self.slots[slot] = string_id
+        if string_id * 2 > len(self.slots):
+            self.resize()
+        return string_id
+
+    def resize(self):
+        slots = array('i', [EMPTY_SLOT]) * (len(self.slots) * 4)
+        mask = len(slots) - 1
+        for string_id, value_hash in enumerate(self.hashes):
+            slot = value_hash & mask
+            while slots[slot] != EMPTY_SLOT:
+                slot = (slot + 1) & mask
+            slots[slot] = string_id
+        self.slots = slots
+
+    def memory_usage(self):
+        return sum(sys.getsizeof(column) for column in (self.buffer, self.offsets, self.lengths, self.hashes,
+                                                         self.slots))
+
+
+class ZnodeTree(object):
+    """
+    In-memory tree of persistent znodes, which is loaded from a snapshot and brought up to date by replaying
+    transactions the same way ZooKeeper does on start. Snapshots are fuzzy, so the replay tolerates
+    transactions that are already applied: creation of an existing node and changes of a missing node are ignored.
+    Nodes bound to sessions are not kept, since they are neither backed up nor restored.
+
+    Millions of nodes have to fit into the memory of a backup pod, so there is no object per node. A node is
+    an integer id of a row in two flat arrays: int fields hold the parent, the interned name, links to the first
+    child and siblings, data length, the interned ACL and versions, long fields hold the offset of data in one
+    shared buffer and the rest of the stat. Children are found through an open addressing hash table keyed by
+    parent id and name id. A node takes about 110 bytes besides its data and the bytes of unique names.
+    Ids of deleted nodes are reused.
+    """
+
+    def __init__(self):
+        self.names = StringTable()
+        self.acls = []
+        self.acl_ids = {}
+        self.ints = array('i')
+        self.longs = array('q')
+        self.data = bytearray()
+        self.data_garbage = 0
+        self.free_ids = array('i')
+        self.child_slots = array('i', [EMPTY_SLOT]) * INITIAL_SLOTS
+        self.used_child_slots = 0
+        self.size = 1
+        # Zxid of the last applied transaction
+        self.zxid = 0
+        self.ints.extend((NO_NODE, self.names.intern(b''), NO_NODE, NO_NODE, NO_NODE, -1, 0, 0, 0, 0))
+        self.longs.extend((0,) * LONG_FIELDS)
+
+    def __len__(self):
+        return self.size
+
+    def intern_acl(self, acl):
+        key = tuple(acl)
+        acl_id = self.acl_ids.get(key)
+        if acl_id is None:
+            acl_id = self.acl_ids[key] = len(self.acls)
+            self.acls.append(key)
+        return acl_id
+
+    # Data buffer
+
+    def append_data(self, data):
+        """Appends data to the shared buffer, returns its offset and length, which is -1 for null data."""
+        if data is None:
+            return 0, -1
+        offset = len(self.data)
+        self.data += data
+        return offset, len(data)
+
+    def set_node_data(self, node, data):
+        row = node * INT_FIELDS
+        if self.ints[row + DATA_LENGTH] > 0:
+            self.data_garbage += self.ints[row + DATA_LENGTH]
+        self.longs[node * LONG_FIELDS + DATA_OFFSET], self.ints[row + DATA_LENGTH] = self.append_data(data)
+        if self.data_garbage > DATA_COMPACTION_MIN_SIZE and self.data_garbage > len(self.data) * DATA_GARBAGE_RATIO:
+            self.compact_data()
+
+    def compact_data(self):
+        data = bytearray()
+        for node in self.walk_ids(ROOT):
+            length = self.ints[node * INT_FIELDS + DATA_LENGTH]
+            if length > 0:
+                offset = self.longs[node * LONG_FIELDS + DATA_OFFSET]
+                self.longs[node * LONG_FIELDS + DATA_OFFSET] = len(data)
+                data += self.data[offset:offset + length]
+        self.data = data
+        self.data_garbage = 0
+
+    # Child table
+
+    def find_child_slot(self, parent, name_id):
+        """Returns the slot holding the child, or the first free slot on its probe sequence if there is no child."""
+        slots, ints = self.child_slots, self.ints
+        mask = len(slots) - 1
+        slot = hash((parent, name_id)) & mask
+        free_slot = None
+        while True:
+            node = slots[slot]
+            if node == EMPTY_SLOT:
+                return slot if free_slot is None else free_slot
+            if node == DELETED_SLOT:
+                if free_slot is None:
+                    free_slot = slot
+            elif ints[node * INT_FIELDS + PARENT] == parent and ints[node * INT_FIELDS + NAME] == name_id:
+                return slot
+            slot = (slot + 1) & mask
+
+    def find_child(self, parent, name_id):
+        node = self.child_slots[self.find_child_slot(parent, name_id)]
+        return node if node >= 0 else NO_NODE
+
+    def resize_child_slots(self):
+        # Deleted slots are dropped, the table is rebuilt from the parent and name fields
+        slots = array('i', [EMPTY_SLOT]) * max(INITIAL_SLOTS, 1 << (self.size * 4).bit_length())
+        mask = len(slots) - 1
+        ints = self.ints
+        for node in range(1, len(ints) // INT_FIELDS):
+            parent = ints[node * INT_FIELDS + PARENT]
+            if parent == NO_NODE:
+                continue
+            slot = hash((parent, ints[node * INT_FIELDS + NAME])) & mask
+            while slots[slot] != EMPTY_SLOT:
+                slot = (slot + 1) & mask
+            slots[slot] = node
+        self.child_slots = slots
+        self.used_child_slots = self.size - 1
+
+    # Tree operations
+
+    def get(self, path):
+        """Returns id of the node with the given path or None if there is no such node."""
+        node = ROOT
+        for name in split_path(path):
+            name_id = self.names.find(name.encode('utf-8'))
+            if name_id == EMPTY_SLOT:
+                return None
+            node = self.find_child(node, name_id)
+            if node == NO_NODE:
+                return None
+        return node
+
+    def add(self, parent, name, data=None, acl_id=0, stat=None):
+        """
+        Adds a child with the given name, data, ACL id and StatPersisted to the parent node.
+        *Returns:*\n
+            int - id of the new node or None if the parent has such a child already
+        """
+        name_id = self.names.intern(name.encode('utf-8'))
+        slot = self.find_child_slot(parent, name_id)
+        slots = self.child_slots
+        if slots[slot] >= 0:
+            return None
+        ints, longs = self.ints, self.longs
+        first_child = ints[parent * INT_FIELDS + FIRST_CHILD]
+        data_offset, data_length = self.append_data(data)
+        if stat is None:
+            int_row = (parent, name_id, NO_NODE, first_child, NO_NODE, data_length, acl_id, 0, 0, 0)
+            long_row = (data_offset, 0, 0, 0, 0, 0, 0)
+        else:
+            int_row = (parent, name_id, NO_NODE, first_child, NO_NODE, data_length, acl_id,
+                       stat.version, stat.cversion, stat.aversion)
+            long_row = (data_offset, stat.czxid, stat.mzxid, stat.ctime, stat.mtime, stat.ephemeral_owner, stat.pzxid)
+        if self.free_ids:
+            node = self.free_ids.pop()
+            ints[node * INT_FIELDS:(node + 1) * INT_FIELDS] = array('i', int_row)
+            longs[node * LONG_FIELDS:(node + 1) * LONG_FIELDS] = array('q', long_row)
+        else:
+            node = len(ints) // INT_FIELDS
+            ints.extend(int_row)
+            longs.extend(long_row)
+        if first_child != NO_NODE:
+            ints[first_child * INT_FIELDS + PREVIOUS_SIBLING] = node
+        ints[parent * INT_FIELDS + FIRST_CHILD] = node
+        if slots[slot] == EMPTY_SLOT:
+            self.used_child_slots += 1
+        slots[slot] = node
+        self.size += 1
+        if self.used_child_slots * 2 > len(slots):
+            self.resize_child_slots()
+        return node
+
+    def remove(self, node):
+        ints = self.ints
+        row = node * INT_FIELDS
+        previous_sibling, next_sibling = ints[row + PREVIOUS_SIBLING], ints[row + NEXT_SIBLING]
+        if previous_sibling != NO_NODE:
+            ints[previous_sibling * INT_FIELDS + NEXT_SIBLING] = next_sibling
+        else:
+            ints[ints[row + PARENT] * INT_FIELDS + FIRST_CHILD] = next_sibling
+        if next_sibling != NO_NODE:
+            ints[next_sibling * INT_FIELDS + PREVIOUS_SIBLING] = previous_sibling
+        for removed in list(self.walk_ids(node)):
+            row = removed * INT_FIELDS
+            self.child_slots[self.find_child_slot(ints[row + PARENT], ints[row + NAME])] = DELETED_SLOT
+            self.set_node_data(removed, None)
+            ints[row + PARENT] = NO_NODE
+            self.free_ids.append(removed)
+            self.size -= 1
+
+    def create(self, path, data, zxid=0, time_ms=0, acl=OPEN_ACL, ephemeral_owner=0, parent_cversion=-1):
+        parent_path, _, name = path.rpartition('/')
+        parent = self.get(parent_path)
+        if parent is None:
+            return False
+        node = self.add(parent, name, data, self.intern_acl(acl),
+                        StatPersisted(zxid, zxid, time_ms, time_ms, 0, 0, 0, ephemeral_owner, zxid))
+        if node is None:
+            return False
+        self.update_parent(parent, zxid, parent_cversion)
+        return True
+
+    def delete(self, path, zxid=0):
+        node = self.get(path)
+        if node is None or node == ROOT:
+            return False
+        parent = self.ints[node * INT_FIELDS + PARENT]
+        self.remove(node)
+        # As DataTree.deleteNode does, the cversion is left to the next create and the pzxid only moves forward
+        pzxid = parent * LONG_FIELDS + PZXID
+        self.longs[pzxid] = max(self.longs[pzxid], zxid)
+        return True
+
+    def update_parent(self, parent, zxid, cversion=-1):
+        """
+        Applies a child create to the parent the way DataTree.createNode does. Transactions past the zxid of a fuzzy
+        snapshot are applied again, so the cversion and pzxid are only set when the cversion moves forward.
+        """
+        row = parent * INT_FIELDS
+        if cversion == -1:
+            cversion = self.ints[row + CVERSION] + 1
+        if cversion > self.ints[row + CVERSION]:
+            self.ints[row + CVERSION] = cversion
+            self.longs[parent * LONG_FIELDS + PZXID] = zxid
+
+    def set_data(self, path, data, version, zxid=0, time_ms=0):
+        node = self.get(path)
+        if node is None:
+            return False
+        self.set_node_data(node, data)
+        self.ints[node * INT_FIELDS + VERSION] = version
+        self.longs[node * LONG_FIELDS + MZXID] = zxid
+        self.longs[node * LONG_FIELDS + MTIME] = time_ms
+        return True
+
+    def set_acl(self, path, acl, version):
+        node = self.get(path)
+        if node is None:
+            return False
+        self.ints[node * INT_FIELDS + ACL] = self.intern_acl(acl)
+        self.ints[node * INT_FIELDS + AVERSION] = version
+        return True
+
+    def apply(self, txn_type, entry, zxid, time_ms=0):
+        if txn_type in CREATE_TYPES:
+            if entry.ephemeral:
+                # The node itself is bound to a session, still its creation changes the parent
+                parent = self.get(entry.path.rpartition('/')[0])
+                if parent is not None:
+                    self.update_parent(parent, zxid, entry.parent_cversion)
+                return
+            owner = CONTAINER_EPHEMERAL_OWNER if txn_type == CREATECONTAINER else \
+                ttl_ephemeral_owner(entry.ttl) if txn_type == CREATETTL else 0
+            acl = [(acl.perms, acl.scheme, acl.id) for acl in entry.acls]
+            self.create(entry.path, copy_data(entry.data), zxid, time_ms, acl, owner, entry.parent_cversion)
+        elif txn_type in DELETE_TYPES:
+            self.delete(entry.path, zxid)
+        elif txn_type in SET_DATA_TYPES:
+            self.set_data(entry.path, copy_data(entry.data), entry.version, zxid, time_ms)
+        elif txn_type == SETACL:
+            self.set_acl(entry.path, [(acl.perms, acl.scheme, acl.id) for acl in entry.acls], entry.version)
+        elif txn_type == MULTI:
+            for sub_type, sub_entry in entry.txns:
+                self.apply(sub_type, sub_entry, zxid, time_ms)
+
+    # Node accessors
+
+    def parent(self, node):
+        return self.ints[node * INT_FIELDS + PARENT]
+
+    def name(self, node):
+        return str(self.names.get(self.ints[node * INT_FIELDS + NAME]), 'utf-8')
+
+    def path(self, node):
+        names = []
+        while node != ROOT:
+            names.append(self.name(node))
+            node = self.parent(node)
+        return '/' + '/'.join(reversed(names))
+
+    def get_data(self, node):
+        length = self.ints[node * INT_FIELDS + DATA_LENGTH]
+        if length < 0:
+            return None
+        offset = self.longs[node * LONG_FIELDS + DATA_OFFSET]
+        return bytes(self.data[offset:offset + length])
+
+    def get_acl(self, node):
+        return self.acls[self.ints[node * INT_FIELDS + ACL]]
+
+    def get_stat(self, node):
+        ints = self.ints[node * INT_FIELDS:(node + 1) * INT_FIELDS]
+        longs = self.longs[node * LONG_FIELDS:(node + 1) * LONG_FIELDS]
+        return StatPersisted(longs[CZXID], longs[MZXID], longs[CTIME], longs[MTIME], ints[VERSION], ints[CVERSION],
+                             ints[AVERSION], longs[EPHEMERAL_OWNER], longs[PZXID])
+
+    def set_root(self, data, acl_id, stat):
+        self.set_node_data(ROOT, data)
+        self.ints[ACL], self.ints[VERSION], self.ints[CVERSION], self.ints[AVERSION] = \
+            acl_id, stat.version, stat.cversion, stat.aversion
+        self.longs[CZXID:LONG_FIELDS] = array('q', (stat.czxid, stat.mzxid, stat.ctime, stat.mtime,
+                                                   stat.ephemeral_owner, stat.pzxid))
+
+    def children(self, node):
+        ints = self.ints
+        child = ints[node * INT_FIELDS + FIRST_CHILD]
+        while child != NO_NODE:
+            yield child
+            child = ints[child * INT_FIELDS + NEXT_SIBLING]
+
+    def walk_ids(self, node):
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(self.children(node))
+
+    def walk(self, path='/'):
+        """Yields path and data of the node with the given path and all its descendants, parents first."""
+        for path, node in self.walk_nodes(path):
+            yield path, self.get_data(node)
+
+    def walk_nodes(self, path='/'):
+        """Yields path and id of the node with the given path and all its descendants, parents first."""
+        node = self.get(path)
+        if node is None:
+            return
+        stack = [(path, node)]
+        while stack:
+            path, node = stack.pop()
+            yield path, node
+            prefix = '' if path == '/' else path
+            stack.extend((f'{prefix}/{self.name(child)}', child) for child in self.children(node))
+
+    def memory_usage(self):
+        """
+        *Returns:*\n
+            tuple - bytes taken by the tree structure including names, and bytes of the data buffer
+        """
+        structure = self.names.memory_usage() + sum(sys.getsizeof(column) for column in (
+            self.ints, self.longs, self.child_slots, self.free_ids))
+        return structure, sys.getsizeof(self.data)
+
+
+def split_path(path):
+    return [name for name in path.split('/') if name]
+
+
+def copy_data(data):
+    # Decoded transactions refer to the buffer of their record, the tree keeps its own copy
+    return bytes(data) if data is not None else None
+
+
+def write_snapshot(tree, stream, dbid=SNAPSHOT_DB_ID):
+    """
+    Writes the tree in the snapshot format of ZooKeeper: the file header, an empty session table, the ACL cache
+    and nodes parents first, sealed with Adler-32 of the written bytes. The tree has no sessions, so the snapshot
+    has neither sessions nor ephemeral nodes. The digest is not written, ZooKeeper verifies it only when present.
+    """
+    output = SnapshotOutputStream(stream)
+    output.pack(SNAPSHOT_FILE_HEADER_STRUCT, SNAPSHOT_FILE_MAGIC, SNAPSHOT_FILE_VERSION, dbid)
+    output.write_int(0)
+    # The open ACL is referred to by a reserved reference, other ACLs are referred to by their id plus one
+    references = [OPEN_ACL_REFERENCE if acl == OPEN_ACL else acl_id + 1 for acl_id, acl in enumerate(tree.acls)]
+    output.write_int(sum(1 for reference in references if reference != OPEN_ACL_REFERENCE))
+    for reference, acl in zip(references, tree.acls):
+        if reference == OPEN_ACL_REFERENCE:
+            continue
+        output.write_long(reference)
+        output.write_int(len(acl))
+        for perms, scheme, acl_id in acl:
+            output.write_int(perms)
+            output.write_string(scheme)
+            output.write_string(acl_id)
+    ints, longs = tree.ints, tree.longs
+    stack = [('', ROOT)]
+    while stack:
+        path, node = stack.pop()
+        row, long_row = node * INT_FIELDS, node * LONG_FIELDS
+        output.write_string(path)
+        output.write_buffer(tree.get_data(node))
+        output.pack(NODE_TAIL_STRUCT, references[ints[row + ACL]], longs[long_row + CZXID], longs[long_row + MZXID],
+                    longs[long_row + CTIME], longs[long_row + MTIME], ints[row + VERSION], ints[row + CVERSION],
+                    ints[row + AVERSION], longs[long_row + EPHEMERAL_OWNER], longs[long_row + PZXID])
+        stack.extend((f'{path}/{tree.name(child)}', child) for child in tree.children(node))
+    output.write_string(END_OF_NODES)
+    output.write_seal()
+    output.flush()
+
+
+def load_snapshot(tree, snapshot_file):
+    with open_snapshot_file(snapshot_file) as stream:
+        snapshot = Snapshot(stream)
+        acl_ids = {reference: tree.intern_acl(acl) for reference, acl in snapshot.acls.items()}
+        acl_ids[OPEN_ACL_REFERENCE] = tree.intern_acl(OPEN_ACL)
+        # Nodes are serialized parents first, so the parent of a node is found among the last visited ancestors
+        ancestors = []
+        for node in snapshot.nodes():
+            if not node.path:
+                tree.set_root(node.data, acl_ids[node.acl], node.stat)
+                ancestors = [('', ROOT)]
+                continue
+            if is_session_owner(node.stat.ephemeral_owner):
+                continue
+            parent_path, _, name = node.path.rpartition('/')
+            while ancestors and ancestors[-1][0] != parent_path:
+                ancestors.pop()
+            parent = ancestors[-1][1] if ancestors else tree.get(parent_path)
+            if parent is None:
+                continue
+            added = tree.add(parent, name, node.data, acl_ids[node.acl], node.stat)
+            if added is not None:
+                ancestors.append((node.path, added))
+
+
+def replay_transaction_log(tree, log_file, after_zxid, until_zxid=None, strict=False):
+    """
+    Applies transactions of the log with zxids greater than after_zxid, and up to until_zxid if it is set,
+    to the tree. A partly written last record of a log copied from a running server ends the log, unless strict
+    is set.
+    *Returns:*\n
+        int - zxid of the last applied transaction or after_zxid if none is applied
+    """
+    last_zxid = after_zxid
+    with open(log_file, 'rb', buffering=READ_BUFFER_SIZE) as stream:
+        stream.seek(LOG_FILE_HEADER_STRUCT.size)
+        while True:
+            try:
+                transaction = Txn(stream, strict)
+            except EOS:
+                break
+            header = transaction.header
+            if header.zxid <= after_zxid:
+                continue
+            if until_zxid is not None and header.zxid > until_zxid:
+                break
+            tree.apply(header.type, transaction.entry, header.zxid, header.time)
+            last_zxid = header.zxid
+    return last_zxid
+
+
+def build_znode_tree(snapshot_file, transaction_logs, until_zxid=None, strict=False):
+    """
+    Builds the tree of persistent znodes from the snapshot and transaction logs that continue it.
+    *Args:*\n
+        _snapshot_file_ (str) - path to the snapshot;\n
+        _transaction_logs_ (list) - paths to the transaction logs sorted by zxid;\n
+        _until_zxid_ (int) - zxid of the last transaction to apply (optional);\n
+        _strict_ (bool) - whether a partly written last record of a log is an error, e.g. for archived logs;\n
+    *Returns:*\n
+        ZnodeTree - tree as of the last transaction of the logs
+    """
+    started = time.perf_counter()
+    tree = ZnodeTree()
+    load_snapshot(tree, snapshot_file)
+    logging.info(f"Snapshot '{snapshot_file}' is loaded, {len(tree)} znodes "
+                 f"in {time.perf_counter() - started:.3f}s.")
+    last_zxid = get_zxid_from_file_name(snapshot_file)
+    for log_file in transaction_logs:
+        last_zxid = replay_transaction_log(tree, log_file, last_zxid, until_zxid, strict)
+    tree.zxid = last_zxid
+    structure, data = tree.memory_usage()
+    logging.info(f'Transactions are replayed up to zxid 0x{last_zxid:x}, {len(tree)} znodes '
+                 f'in {time.perf_counter() - started:.3f}s, the tree takes {structure} bytes '
+                 f'({structure // max(len(tree), 1)} per znode) and {data} bytes of data.')
+    return tree
@@ -3,9 +3,12 @@ set -x
 
 vault=$1
 
-if [ ! -f ${vault}/znodes.zip ];
+if [ -f ${vault}/znodes.bin ];
+then
+    python3 /opt/zookeeper/scripts/znode_archive.py ${vault}/znodes.bin;
+elif [ ! -f ${vault}/znodes.zip ];
 then
     ls ${vault};
 else
     unzip -l ${vault}/znodes.zip | awk '{ if($4 ~ /^[^\/]+\/$/) print substr($4, 1, length($4)-1)}';
-fi
\ No newline at end of file
+fi
@@ -0,0 +1,164 @@
+#!/usr/bin/python
+# Copyright 2024-2025 NetCracker Technology Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import json
+import logging
+import mmap
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+from generate_transaction_logs import add_generator_arguments, generator_from_arguments
+from parse_transaction_logs import Txn, EOS, LOG_FILE_HEADER_STRUCT, verify_transaction_log, scan_transactions
+from process_zookeeper_logs import filter_and_store_transaction_log, get_zxid_from_file_name, \
+    TRANSACTION_LOG_FILE_PATTERN
+
+BENCHMARKS = ('filter', 'filter_verify', 'parse', 'scan_headers', 'verify')
+
+
+def run_filter(segments, storage_folder, verify=False):
+    records = 0
+    for segment in segments:
+        records += filter_and_store_transaction_log(segment, storage_folder, verify).records
+    return records
+
+
+def run_parse(segments, storage_folder):
+    records = 0
+    for segment in segments:
+        with open(segment, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as log:
+            with memoryview(log) as view:
+                offset = LOG_FILE_HEADER_STRUCT.size
+                try:
+                    while True:
+                        txn = Txn.from_buffer(view, offset)
+                        offset += txn.size
+                        records += 1
+                except EOS:
+                    pass
+                # Decoded records hold views of the mapping, it can't be closed while they are alive
+                txn = None
+    return records
+
+
+def run_scan_headers(segments, storage_folder):
+    records = 0
+    for segment in segments:
+        with open(segment, 'rb') as file:
+            for _ in scan_transactions(file):
+                records += 1
+    return records
+
+
+def run_verify(segments, storage_folder):
+    records = 0
+    for segment in segments:
+        with open(segment, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as log:
+            with memoryview(log) as view:
+                records += verify_transaction_log(view)
+    return records
+
+
+def run_benchmark(name, segments):
+    """
+    Runs one benchmark over all segments. It is executed in a fresh worker process,
+    so the peak resident set size reported by the kernel belongs to this benchmark only.
+    """
+    logging.getLogger().setLevel(logging.WARNING)
+    with tempfile.TemporaryDirectory() as storage_folder:
+        started = time.perf_counter()
+        if name == 'filter':
+            records = run_filter(segments, storage_folder)
+        elif name == 'filter_verify':
+            records = run_filter(segments, storage_folder, verify=True)
+        else:
+            records = globals()[f'run_{name}'](segments, storage_folder)
+        seconds = time.perf_counter() - started
+    size = sum(os.path.getsize(segment) for segment in segments)
+    return {
+        'records': records,
+        'bytes': size,
+        'seconds': round(seconds, 4),
+        'records_per_sec': round(records / seconds, 1) if seconds else 0.0,
+        'mb_per_sec': round(size / 1024 / 1024 / seconds, 2) if seconds else 0.0,
+        # ru_maxrss is in kilobytes on Linux
+        'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+def run_benchmarks(segments, benchmarks, repeat):
+    results = {}
+    for name in benchmarks:
+        runs = []
+        for _ in range(repeat):
+            with ProcessPoolExecutor(max_workers=1) as executor:
+                runs.append(executor.submit(run_benchmark, name, segments).result())
+        best = min(runs, key=lambda run: run['seconds'])
+        results[name] = dict(best, runs=[run['seconds'] for run in runs])
+        logging.info(f"{name}: {best['records_per_sec']} records/s, {best['mb_per_sec']} MB/s, "
+                     f"peak RSS {best['peak_rss_kb']} KB.")
+    return results
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='[%(asctime)s][%(levelname)s] %(message)s')
+    parser = argparse.ArgumentParser(
+        description='Measures throughput and memory of transaction log processing on synthetic logs.')
+    parser.add_argument('--logs', help='folder with existing log segments, they are generated when it is not set')
+    parser.add_argument('--benchmarks', default=','.join(BENCHMARKS),
+                        help=f'comma separated benchmarks to run: {", ".join(BENCHMARKS)}')
+    parser.add_argument('--repeat', type=int, default=3, help='runs of each benchmark, the fastest one is reported')
+    parser.add_argument('--output', help='file to write JSON results to, they are printed when it is not set')
+    add_generator_arguments(parser)
+    args = parser.parse_args()
+
+    benchmarks = [name.strip() for name in args.benchmarks.split(',')]
+    unknown = set(benchmarks) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f'unknown benchmarks: {", ".join(sorted(unknown))}')
+
+    with tempfile.TemporaryDirectory() as generated_folder:
+        if args.logs:
+            segments = sorted((os.path.join(args.logs, name) for name in os.listdir(args.logs)
+                               if TRANSACTION_LOG_FILE_PATTERN.match(name)), key=get_zxid_from_file_name)
+        else:
+            segments = generator_from_arguments(args).write_segments(
+                generated_folder, args.records, args.segment_size * 1024 * 1024, args.padding)
+        report = {
+            'generator': None if args.logs else {key: value for key, value in vars(args).items()
+                                                 if key not in ('logs', 'benchmarks', 'repeat', 'output')},
+            'environment': {
+                'python': platform.python_version(),
+                'implementation': platform.python_implementation(),
+                'machine': platform.machine(),
+                'cpus': os.cpu_count(),
+            },
+            'segments': len(segments),
+            'results': run_benchmarks(segments, benchmarks, args.repeat),
+        }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(output + '\n')
+    else:
+        print(output)
@@ -0,0 +1,212 @@
+#!/usr/bin/python
+# Copyright 2024-2025 NetCracker Technology Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import argparse
+import logging
+import os
+import random
+import sys
+import zlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+from parse_transaction_logs import SESSIONCREATE, SESSIONCLOSE, ERROR, CREATE, CREATE2, CREATECONTAINER, \
+    CREATETTL, DELETE, SETDATA, SETACL, CHECK, MULTI, END_OF_STREAM, END_OF_RECORD, LOG_FILE_MAGIC, \
+    LOG_FILE_HEADER_STRUCT, TXN_PREFIX_STRUCT, TXN_HEADER_STRUCT, INT_STRUCT, LONG_STRUCT, BOOL_STRUCT
+
+DEFAULT_MIX = 'create=20,setdata=40,delete=10,setacl=2,session=15,error=3,create2=5,container=2,ttl=3'
+DIGEST_VERSION = 2
+ZXID_EPOCH = 1 << 32
+NO_NODE = -101
+
+
+def encode_string(value):
+    data = value.encode('utf-8')
+    return INT_STRUCT.pack(len(data)) + data
+
+
+def encode_buffer(data):
+    return INT_STRUCT.pack(len(data)) + data
+
+
+def encode_acls():
+    return INT_STRUCT.pack(1) + INT_STRUCT.pack(31) + encode_string('world') + encode_string('anyone')
+
+
+class TransactionLogGenerator(object):
+    """
+    Produces a stream of valid ZooKeeper transaction records with a configurable opcode mix,
+    payload size distribution, share of multi transactions and share of ephemeral creates.
+    Paths that are deleted or updated exist at that moment, so the logs can also be replayed.
+    """
+
+    def __init__(self, mix=DEFAULT_MIX, payload_median=128, payload_sigma=1.5, payload_max=1024 * 1024,
+                 multi_fraction=0.1, multi_size=4, ephemeral_ratio=0.3, digest=True, seed=1):
+        self.random = random.Random(seed)
+        self.operations, self.weights = self.parse_mix(mix)
+        self.payload_median = payload_median
+        self.payload_sigma = payload_sigma
+        self.payload_max = payload_max
+        self.multi_fraction = multi_fraction
+        self.multi_size = multi_size
+        self.ephemeral_ratio = ephemeral_ratio
+        self.digest = digest
+        self.zxid = ZXID_EPOCH
+        self.time = 1700000000000
+        self.sessions = [0x1000000000000000]
+        self.persistent = []
+        self.parents = set()
+        self.nodes = 0
+
+    @staticmethod
+    def parse_mix(mix):
+        operations, weights = [], []
+        for item in mix.split(','):
+            name, weight = item.split('=')
+            operations.append(name.strip())
+            weights.append(float(weight))
+        return operations, weights
+
+    def payload(self):
+        size = min(int(self.random.lognormvariate(0, self.payload_sigma) * self.payload_median), self.payload_max)
+        # Payload is drawn from the seeded generator, so the same seed produces the same logs
+        return self.random.getrandbits(8 * size).to_bytes(size, 'big') if size else b''
+
+    def new_path(self):
+        self.nodes += 1
+        parent = self.random.choice(self.persistent) if self.persistent and self.random.random() < 0.5 else ''
+        self.parents.add(parent)
+        return f'{parent}/node{self.nodes}'
+
+    def create(self, txn_type=CREATE):
+        path = self.new_path()
+        ephemeral = txn_type in (CREATE, CREATE2) and self.random.random() < self.ephemeral_ratio
+        body = encode_string(path) + encode_buffer(self.payload()) + encode_acls()
+        if txn_type == CREATECONTAINER:
+            body += INT_STRUCT.pack(0)
+        elif txn_type == CREATETTL:
+            body += INT_STRUCT.pack(0) + LONG_STRUCT.pack(60000)
+        else:
+            body += BOOL_STRUCT.pack(1 if ephemeral else 0) + INT_STRUCT.pack(0)
+        if not ephemeral:
+            self.persistent.append(path)
+        return txn_type, body
+
+    def operation(self, name):
+        if name == 'session':
+            if len(self.sessions) > 1 and self.random.random() < 0.5:
+                self.sessions.remove(self.random.choice(self.sessions[1:]))
+                return SESSIONCLOSE, b''
+            self.sessions.append(self.sessions[-1] + 1)
+            return SESSIONCREATE, INT_STRUCT.pack(30000)
+        if name == 'error':
+            return ERROR, INT_STRUCT.pack(NO_NODE)
+        if name in ('create2', 'container', 'ttl'):
+            return self.create({'create2': CREATE2, 'container': CREATECONTAINER, 'ttl': CREATETTL}[name])
+        if not self.persistent or name == 'create':
+            return self.create()
+        if name == 'delete':
+            # Only nodes that never had children are deleted, so every delete would succeed on replay
+            position = self.random.randrange(len(self.persistent))
+            if self.persistent[position] in self.parents:
+                return self.create()
+            return DELETE, encode_string(self.persistent.pop(position))
+        path = self.random.choice(self.persistent)
+        if name == 'setacl':
+            return SETACL, encode_string(path) + encode_acls() + INT_STRUCT.pack(1)
+        return SETDATA, encode_string(path) + encode_buffer(self.payload()) + INT_STRUCT.pack(1)
+
+    def multi(self):
+        operations = []
+        for _ in range(self.random.randint(2, self.multi_size)):
+            choice = self.random.random()
+            if choice < 0.5 or not self.persistent:
+                operations.append(self.create())
+            elif choice < 0.8:
+                operations.append(self.operation('setdata'))
+            else:
+                operations.append((CHECK, encode_string(self.random.choice(self.persistent)) + INT_STRUCT.pack(1)))
+        body = INT_STRUCT.pack(len(operations))
+        for txn_type, data in operations:
+            body += INT_STRUCT.pack(txn_type) + encode_buffer(data)
+        return MULTI, body
+
+    def next_record(self):
+        if self.random.random() < self.multi_fraction:
+            txn_type, body = self.multi()
+        else:
+            txn_type, body = self.operation(self.random.choices(self.operations, self.weights)[0])
+        self.zxid += 1
+        self.time += self.random.randint(0, 20)
+        session = self.random.choice(self.sessions)
+        data = TXN_HEADER_STRUCT.pack(session, self.zxid & 0xffffffff, self.zxid, self.time, txn_type) + body
+        if self.digest:
+            data += INT_STRUCT.pack(DIGEST_VERSION) + LONG_STRUCT.pack(self.random.getrandbits(63))
+        return TXN_PREFIX_STRUCT.pack(zlib.adler32(data), len(data)) + data + END_OF_RECORD
+
+    def write_segments(self, directory, records, segment_size=64 * 1024 * 1024, padding=0):
+        """
+        Writes records into log.<zxid> segments of about segment_size bytes, each ended with END_OF_STREAM
+        and optionally padded with zeros as ZooKeeper preallocates log files.
+        *Returns:*\n
+            list - paths to written segments
+        """
+        segments = []
+        written = 0
+        while written < records:
+            path = os.path.join(directory, f'log.{self.zxid + 1:x}')
+            with open(path, 'wb') as file:
+                size = file.write(LOG_FILE_HEADER_STRUCT.pack(LOG_FILE_MAGIC, 2, 0))
+                while written < records and size < segment_size:
+                    size += file.write(self.next_record())
+                    written += 1
+                file.write(END_OF_STREAM + bytes(padding))
+            segments.append(path)
+            logging.info(f"Segment '{path}' of {size} bytes is written, {written} records in total.")
+        return segments
+
+
+def add_generator_arguments(parser):
+    parser.add_argument('--records', type=int, default=100000, help='number of transactions to generate')
+    parser.add_argument('--segment-size', type=int, default=64, help='size of a log segment, MB')
+    parser.add_argument('--padding', type=int, default=0, help='zero bytes appended after the end of stream')
+    parser.add_argument('--mix', default=DEFAULT_MIX,
+                        help='weights of single operations: create, create2, container, ttl, setdata, delete, '
+                             'setacl, session, error')
+    parser.add_argument('--payload-median', type=int, default=128, help='median size of data payload, bytes')
+    parser.add_argument('--payload-sigma', type=float, default=1.5, help='sigma of lognormal payload sizes')
+    parser.add_argument('--payload-max', type=int, default=1024 * 1024, help='maximum payload size, bytes')
+    parser.add_argument('--multi-fraction', type=float, default=0.1, help='share of multi transactions')
+    parser.add_argument('--multi-size', type=int, default=4, help='maximum number of operations in a multi')
+    parser.add_argument('--ephemeral-ratio', type=float, default=0.3, help='share of ephemeral creates')
+    parser.add_argument('--no-digest', action='store_true', help='do not append digests to records')
+    parser.add_argument('--seed', type=int, default=1)
+
+
+def generator_from_arguments(args):
+    return TransactionLogGenerator(args.mix, args.payload_median, args.payload_sigma, args.payload_max,
+                                   args.multi_fraction, args.multi_size, args.ephemeral_ratio,
+                                   not args.no_digest, args.seed)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='[%(asctime)s][%(levelname)s] %(message)s')
+    parser = argparse.ArgumentParser(description='Generates synthetic ZooKeeper transaction log segments.')
+    parser.add_argument('folder')
+    add_generator_arguments(parser)
+    args = parser.parse_args()
+    os.makedirs(args.folder, exist_ok=True)
+    generator_from_arguments(args).write_segments(args.folder, args.records, args.segment_size * 1024 * 1024,
+                                                  args.padding)